@@ -1,588 +1,663 @@
-# import necessary python libraries/packages
-import io
-import os
-import uuid
-import json
-import streamlit as st
-from dotenv import load_dotenv
-from openai import AzureOpenAI
-#from utils import display_messages, calculate_cost, send_prompt_to_assistant
-import openai
-import time
-
-
-
-
-def upload_to_openai(filepath):
-    """Upload a file to OpenAI and return its file ID."""
-    with open(filepath, "rb") as file:
-        response = client.files.create(file=file, purpose="assistants")
-    return response
-
-def calculate_cost(prompt_tokens, completion_tokens):
-    """Calculate the cost based on GPT-4o token usage."""
-    # Cost rates:
-    gpt4_input_rate = 2.50 / 1_000_000  # $2.50 per 1 million input tokens
-    gpt4_output_rate = 7.50 / 1_000_000  # $10.00 per 1 million output tokens
-
-    # Calculate cost based on the tokens used
-    input_cost = prompt_tokens * gpt4_input_rate
-    output_cost = completion_tokens * gpt4_output_rate
-    
-    return input_cost + output_cost
-
-# Helper function to ensure no duplicate messages are appended
-def is_message_duplicate(message, messages):
-    """Check if the message is already in the session state."""
-    for existing_message in messages:
-        if existing_message["role"] == message["role"] and existing_message["content"] == message["content"]:
-            return True
-    return False
-
-# Helper function to display all messages (user, assistant, system), ensuring no duplication
-def display_messages(messages):
-    """Display all messages (user, assistant, system), but only once."""
-    displayed_messages = set()  # Keep track of displayed messages to avoid duplicates
-    for message in messages:
-        if message.get("content") and (message["role"], message["content"]) not in displayed_messages:
-            with st.chat_message(message["role"]):  # Role determines message type
-                st.markdown(f'<p style="font-size: 16px;">{message["content"]}</p>', unsafe_allow_html=True)
-            displayed_messages.add((message["role"], message["content"]))  # Mark message as displayed
-            
-
-
-# Load environment variables from .env file
-#load_dotenv(dotenv_path='.env')
-
-# Set up proxy environment variables to access external websites
-#os.environ['http_proxy'] = os.getenv('HTTP_PROXY')
-#os.environ['https_proxy'] = os.getenv('HTTP_PROXY')
-
-# Initialize the AzureOpenAI client
-client = AzureOpenAI(
-    api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-    api_version=os.getenv('API_VERSION'),
-    azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT')
-)
-
-# Set the page title for the whole app
-st.set_page_config(
-    page_title="Dokument Review",
-    page_icon="📚",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Top expandable bar for instructions (collapsed by default)
-with st.expander("Einführung & Anweisungen", expanded=False):
-    st.markdown("""
-        # Willkommen beim **Dokumenten-Review-Tool**! 🎉
-
-        Dieses Tool hilft Ihnen dabei, Dokumente mithilfe eines KI-assistierten Überprüfungsprozesses zu analysieren. Sie können verschiedene Kriterien wie Geheimhaltungsstufe, Unterlagenklasse, Dateiformat und viele andere überprüfen lassen. Laden Sie Ihre Dateien hoch, und lassen Sie die KI die Prüfung automatisch durchführen.
-
-        ## So funktioniert's:
-
-        1. **Datei hochladen**:
-            - Gehen Sie in der **Sidebar** und laden Sie eine Datei hoch, die Sie überprüfen möchten (z. B. PDF, TXT, CSV, DOCX, XLSX).
-        
-        2. **Bereits hochgeladene Dateien**:
-            - Unter **"Hochgeladene Dateien"** sehen Sie alle Dokumente, die bereits hochgeladen wurden.
-            - Wenn Sie eines der hochgeladenen Dokumente zur Überprüfung auswählen möchten, klicken Sie einfach auf den Dateinamen. Das ausgewählte Dokument wird dann **grün** hervorgehoben, um anzuzeigen, dass es für die Überprüfung bereit ist.
-            - Wenn Sie die Auswahl des Dokuments aufheben möchten, klicken Sie erneut auf den Dateinamen, und die Auswahl wird zurückgesetzt (die Farbe wird wieder **grau**).
-        
-        3. **Kriterien auswählen**:
-            - Sie können wählen, welche Kriterien Sie überprüfen möchten. Die verfügbaren Prüfungen sind:
-                - **Geheimhaltungsstufe**, **Unterlagenklasse**, **Dateiformat**
-                - **Freigeber**, **Verantwortlichkeiten**
-                - **Änderungshistorie**,**Status, Version und Baseline**, **Namenskonvention**
-            - Die Prüfungen werden automatisch im Hintergrund durch die KI ausgeführt. Sie erhalten die **Antwort des Assistenten** direkt, ohne dass Sie sich um die Details der Ausführung kümmern müssen.
-        
-        4. **Ergebnisse und Visualisierungen**:
-            - Alle geprüften Kriterien werden auf der **linken Seite** angezeigt. Jedes Kriterium wird entweder mit **grün** (i.O.) oder **rot** (n.i.O.) markiert, je nachdem, ob das Kriterium erfüllt wurde.
-            - Unter der Visualisierung wird angezeigt, wie viele **Token** für die Eingabe und Ausgabe verbraucht wurden, sowie die **Kosten** für die verwendeten Tokens (Input und Output).
-
-        5. **Weitere Funktionen**:
-            - **Chat löschen**: Sie können den Chat jederzeit löschen, um eine neue Sitzung zu starten.
-            - **Ergebnisse herunterladen**: Wenn die Überprüfung abgeschlossen ist, können Sie den **Bericht** der KI in Form einer **Textdatei** herunterladen, die alle Ergebnisse der Prüfung enthält.
-
-        6. **Chat-Funktion**:
-            - In der **Chat-Leiste** können Sie direkt mit dem Assistenten kommunizieren. Sie können Fragen stellen oder zusätzliche Informationen anfordern, und der Assistent wird Ihnen antworten.
-
-        ## Wichtige Hinweise:
-        - Wenn Sie nach der **KM ID** gefragt werden, stellen Sie sicher, dass Sie diese angeben, da sie für den Start der Überprüfung erforderlich ist.
-        - Die **Kriterien** werden automatisch generiert und im Hintergrund abgearbeitet. Sie erhalten die endgültige Antwort des Assistenten ohne weitere Eingriffe.
-        - Alle Ergebnisse und Statusanzeigen werden live aktualisiert, sodass Sie den Fortschritt der Überprüfung in Echtzeit verfolgen können.
-    """, unsafe_allow_html=True)
-
-# Add title with custom font size
-st.markdown(
-    """
-    <h1 style="text-align: left; font-size: 48px;">📚🔍 <i>Dokumenten-Review mit LLM</i> 🤖💬</h1>
-    """, 
-    unsafe_allow_html=True
-)
-
-# --- Initial Setup for Azure OpenAI Service ---
-
-# Import the assistants using the assistant IDs (Assistant were already created in Azure OpenAI Service)
-assistant_id = "asst_UZ1evOoGrkD8D1IKOmik22z6"
-
-security_bot = "asst_B5yqh4UUKlCKva3I7bvQOd7k"
-
-chat_bot = "asst_EprYp6OVLH3WNcaWZbORPOfr"
-
-vorgaben_bot = "asst_tOMJq7dsqHY5i1a1q7NnvzSu"
-
-# Retrieve the list of all vector stores
-vector_stores = client.beta.vector_stores.list()
-
-# Check if "dokumen-review" exists in the list of vector stores
-vector_store_name = "dokument review"
-vector_store = None
-
-# Search for the vector store in the list
-for store in vector_stores.data:
-    if store.name == vector_store_name:
-        vector_store = store
-        break
-
-# If the vector store doesn't exist, create it
-if vector_store is None:
-    vector_store = client.beta.vector_stores.create(name=vector_store_name)
-# Main content area with two columns
-col2, col3 = st.columns([2, 1])  # Center (for chatbox) and Right (for visualizations)
-with col3:
-    st.subheader("Visualisierung der geprüften Kriterien:")
-    
-# --- Initial Setup for Interface with Streamlit ---
-def initialize_session_state():
-    """Initializes session state variables if not already set."""
-    if "thread_id" not in st.session_state:
-        thread = client.beta.threads.create()
-        st.session_state.thread_id = thread.id
-
-    if "session_id" not in st.session_state:
-        st.session_state.session_id = str(uuid.uuid4())
-
-    if "messages" not in st.session_state: 
-        st.session_state.messages = []
-        
-        message = {"role": "assistant", "content": """Willkommen in der Dokumenten-Review-App! Wie kann ich Ihnen heute behilflich sein ?
-                      Falls Sie ein Dokument nach bestimmten formalen Kriterien überprüfen lassen möchten, teilen Sie mir bitte die KM-ID mit."""}
-        
-        st.session_state.messages.append(message)
-        with col2:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-                
-
-    
-    if "file_id_list" not in st.session_state:
-        st.session_state.file_id_list = []
-        
-    if 'file_id_map' not in st.session_state:
-        st.session_state.file_id_map = {}
-        
-    if 'current_assistant_id' not in st.session_state:        
-        st.session_state.current_assistant_id = assistant_id
-
-    # Initialize token usage and total cost if they don't exist
-    if 'token_usage' not in st.session_state:
-        st.session_state.token_usage = 0  # Initialize token usage to 0
-    
-    if 'total_cost' not in st.session_state:
-        st.session_state.total_cost = 0.0  # Initialize total cost to 0.0
-        
-    # Initialize session state to keep track of uploaded files and selected criteria
-    if 'criteria_selected' not in st.session_state:
-        st.session_state.uploaded_files = []  # Store uploaded file names
-        st.session_state.file_buttons = {}  # To store the state (color) of file buttons
-        
-    # Initialize criteria status in session state if it doesn't already exist
-    if "criteria_status" not in st.session_state:
-        st.session_state.criteria_status = {
-            0: "lightgray",  # Geheimhaltungsstufe
-            1: "lightgray",  # Unterlagenklasse
-            2: "lightgray",   # Dateiformat
-            3: "lightgray",  # Freigeber
-            4: "lightgray"  # Verantwortlichkeit
-    }
-
-initialize_session_state()
-
-
-
-# Define the criteria and their corresponding prompts
-criteria = [
-    {"name": "Geheimhaltungsstufe", "prompt": "Jetzt nur die Geheimhaltungsstufe prüfen. Als Antwort nur schreiben Geheimhaltungsstufe: i.O oder Geheimhaltungsstufe: n.i.O"},
-    {"name": "Unterlagenklasse", "prompt": "Jetzt nur die Unterlagenklasse prüfen. Als Antwort nur schreiben Unterlagenklasse: i.O oder Unterlagenklasse: n.i.O"},
-    {"name": "Dateiformat", "prompt": "Jetzt nur Dateiformat prüfen. Als Antwort nur schreiben Dateiformat: i.O oder Dateiformat: n.i.O"},
-    {"name": "Freigeber", "prompt": "Jetzt nur die Aufgabe zur Überprüfung des Freigebers. Antwort muss zusammengefasst werden. Bitte fügen Sie in Ihrer Antwort „i.O“ oder „n.i.O“ ein."},
-    {"name": "Verantwortlichkeit", "prompt": "Jetzt nur die Aufgabe zur Überprüfung der Verantwortlichkeiten. Antwort muss zusammengefasst werden. Bitte fügen Sie in Ihrer Antwort „i.O“ oder „n.O“ ein."},
-    {"name": "Änderungshistorie Notwendigkeit", "prompt": "Jetzt nur die Aufgabe der Notwendigkeit der Änderungshistorie-Überprüfung gemäß Schritte in der Anleitung durchführen."},
-    {"name": "Änderungshistorie Vollständigkeit", "prompt": "Jetzt nur die Aufgabe der Vollständigkeit der Änderungshistorie-Überprüfung gemäß Schritte in der Anleitung durchführen."},
-    {"name": "Version und Status", "prompt": "Jetzt nur die aktuelle Version und Status des Review-Dokuments mir zeigen."},
-    {"name": "Versionsprüfung", "prompt": "Jetzt nur Prüfung der Version. Anleitung nicht zurückgeben."},
-    {"name": "Statusprüfung", "prompt": "Jetzt Prüfung vom Status."},
-    {"name": "Baseline-Prüfung", "prompt": "Jetzt nur Baseline-Prüfung. "},
-    {"name": "Namenskonvention", "prompt": "Jetzt nur die Aufgabe der Namenskonvention-Überprüfung durchführen. "}
-]
-
-# Define a function to update criteria status and display immediately
-def update_criteria_status(index, response):
-    # Update the criteria status based on the response
-    if "n.i.O" in response:
-        st.session_state.criteria_status[index] = "red"
-    elif "i.O" in response:
-        st.session_state.criteria_status[index] = "green"
-    else:
-        st.session_state.criteria_status[index] = "lightgray"  # Default when no valid response
-    
-    # Directly update the status visualization immediately after each check
-    background_color = st.session_state.criteria_status[index]
-    text_color = "white" if background_color == "green" or "red" else "black"
-
-    with col3:
-        #st.subheader("Visualisierung der geprüften Kriterien:")
-        # Display the updated status for each criterion directly in col3
-        st.markdown(f'''
-            <div style="background-color:{background_color}; color:{text_color}; padding: 10px; border-radius: 5px; font-size:20px; margin-bottom: 10px;">
-                {criteria[index]["name"]}
-            </div>
-        ''', unsafe_allow_html=True)
-
-def send_prompt_to_assistant(prompt_text, assistant_id= st.session_state.current_assistant_id, display=True):
-    """Send a prompt to the assistant, extract token usage, calculate the cost, and update the chat with the response."""
-    # Ensure the assistant ID is set correctly in session state
-    if st.session_state.current_assistant_id is None:
-        st.error("Bitte wählen Sie zuerst einen Assistant.")
-        return
-
-    # Send the prompt to the assistant
-    client.beta.threads.messages.create(
-        thread_id=st.session_state.thread_id,
-        role="user",
-        content=prompt_text
-    )
-
-    run = client.beta.threads.runs.create(
-        thread_id=st.session_state.thread_id,
-        assistant_id=st.session_state.current_assistant_id,
-    )
-
-    # Poll for the run to complete and retrieve the assistant's messages
-    while run.status != 'completed':
-        time.sleep(1)
-        run = client.beta.threads.runs.retrieve(
-            thread_id=st.session_state.thread_id,
-            run_id=run.id
-        )
-
-    # Access token usage directly from the run object
-    usage_data = run.usage if hasattr(run, 'usage') else None
-
-    if usage_data:
-        token_usage = usage_data.total_tokens  # Extract total tokens used
-        prompt_tokens = usage_data.prompt_tokens
-        completion_tokens = usage_data.completion_tokens
-    else:
-        token_usage = 0  # Default if no usage data is available
-        prompt_tokens = completion_tokens = 0
-
-    st.session_state.token_usage += token_usage  # Increment the total tokens used
-
-    # Calculate the cost based on token usage
-    cost = calculate_cost(prompt_tokens, completion_tokens)
-    st.session_state.total_cost += cost  # Increment the total cost
-
-    # Retrieve all messages in the thread
-    messages = client.beta.threads.messages.list(
-        thread_id=st.session_state.thread_id
-    )
-
-    # Avoid appending duplicate assistant messages
-    assistant_messages_for_run = [
-        message for message in messages if message.run_id == run.id and message.role == "assistant"
-    ]
-
-    # Prepare the response text from assistant's message
-    response = ""
-    for message in assistant_messages_for_run:
-        text_content = message.content[0].text.value if message.content else ''
-
-        # Only append if the message is not already in session state
-        if not is_message_duplicate({"role": "assistant", "content": text_content}, st.session_state.messages):
-            st.session_state.messages.append({"role": "assistant", "content": text_content})
-
-        response = text_content  # Assuming the last message is the response
-
-    # Display all messages at once if 'display' is True
-    if display:
-        display_messages(st.session_state.messages)
-
-    return response  # Return the response content
-
-# Sidebar for controls (on the left)
-with st.sidebar:
-    st.title("📝Was möchten Sie tun ?")
-    st.write("")  # Adds one empty line
-    st.write("")  # Adds one empty line
-    # Display the subheader with an info icon beside it
-    st.markdown("""
-        <h2 style="display:inline;">🔍Datei durchsuchen:</h2>
-        <span style="cursor: pointer; font-size: 20px; margin-left: 10px;" title="Sie können Datei lokal durchsuchen und in der App hochladen.">
-            ℹ️
-        </span>
-    """, unsafe_allow_html=True)
-    # File uploader added to the sidebar
-    uploaded_file = st.file_uploader("Laden Sie bitte eine Datei hoch:", type=["txt", "csv", "pdf", "xlsx","docx"])
-
-    # When a file is uploaded, add it to the session state
-    if uploaded_file is not None:
-        file_name = uploaded_file.name
-        if file_name not in st.session_state.uploaded_files:
-            st.session_state.uploaded_files.append(file_name)
-            st.session_state.file_buttons[file_name] = "lightgray"  # Default color for the file button
-
-    # Display uploaded files with clickable buttons
-    # Display the subheader with an info icon beside it
-    st.write("")  # Adds one empty line
-    st.markdown("""
-        <h2 style="display:inline;">📂Hochgeladene Dateien:</h2>
-        <span style="cursor: pointer; font-size: 20px; margin-left: 10px;" title="Sie können hier die hochgeladenen Dateien sehen. 
-        Wenn Sie auf den Dateinamen klicken, wird die Datei dem Assistenten für ein formales Review zur Verfügung gestellt.
-        DM-Plan_Tabelle wude schon für Sie hochgeladen.">
-            ℹ️
-        </span>
-    """, unsafe_allow_html=True)
-    # Special case for DM-Plan_Tabelle.xlsx, display as green background text without button
-    st.markdown(f'''
-        <div style="background-color:green; color:white; padding: 10px; border-radius: 5px; font-size:18px; margin-bottom: 10px;">
-            DM-Plan_Tabelle.xlsx
-        </div>
-    ''', unsafe_allow_html=True)
-    for file_name in st.session_state.uploaded_files:
-        # Check if the button is clicked
-        if st.button(file_name, key=file_name, use_container_width=True):
-            # Handle when the file button is clicked, and it's not in use (lightgray)
-            if st.session_state.file_buttons[file_name] == "lightgray":
-                # Change the color to green after clicking
-                st.session_state.file_buttons[file_name] = "green"
-                            # Then send the check criteria prompt
-                prompt = """Das Artefakt wurde aktualisiert. Bitte löschen und vergessen Sie 
-                alle zuvor bewerteten Kriterien und setzen Sie alle vorherigen Bewertungen zurück. Sie müssen erstaml das neue Artefakt öffnen
-                und fagen Sie nochmal nach der KM ID, um eine Prüfung zu starten."""
-                with col2:
-                    response = send_prompt_to_assistant(prompt, display = False)
-                    
-                # Save the file locally when clicked
-                with open(file_name, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
-                # Upload the file to OpenAI when clicked
-                file = upload_to_openai(file_name)
-                st.session_state.file_id_list.append(file.id)  # Store the file ID in session state
-
-                # Store the relationship between file_name and file_id in the dictionary
-                st.session_state.file_id_map[file_name] = file.id
-
-                # Update the vector store with the new file
-                batch_add = client.beta.vector_stores.file_batches.create(
-                    vector_store_id=vector_store.id,
-                    file_ids=[file.id]
-                )
-                time.sleep(1)
-
-                # Update the assistant with the new file search tool resource
-                assistant = client.beta.assistants.update(
-                    assistant_id=assistant_id,
-                    tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}}
-                )
-
-            # Handle when the button is clicked again and is already green (file in use)
-            else:
-                st.session_state.file_buttons[file_name] = "lightgray"  # Revert button color to light gray
-
-                # Retrieve the file_id associated with the file_name from the file_id_map
-                file_id_to_remove = st.session_state.file_id_map.get(file_name)
-
-                if file_id_to_remove:
-                    # Use the API method to delete a file from the vector store
-                    response = client.beta.vector_stores.files.delete(                            
-                        vector_store_id=vector_store.id,
-                        file_id=file_id_to_remove
-                    )
-         
-        # Display file button with dynamic color (green or lightgray)
-        st.markdown(f'''
-            <div style="background-color:{st.session_state.file_buttons[file_name]}; color:white; padding: 10px; border-radius: 5px; font-size:18px; margin-bottom: 10px;">
-                {file_name}
-            </div>
-        ''', unsafe_allow_html=True)
-    st.write("")  # Adds one empty line       
-    st.subheader("✔️ Welche Kriterien wollen Sie prüfen:")
-    
-
-    # Show the first button for the first process
-    if st.button("1️⃣ Prüfung Geheimhaltungsstufe, Unterlagenklasse, Dateiformat"):
-        st.session_state.current_assistant_id = security_bot
-        with col2:
-            # Send initial prompt directly without KM ID
-            initial_prompt = """KM ID: SUP1_001; jetzt nur den ersten Schritt durchführen: Review-Dokument: QS-Plan_probe.docx ist schon im Vektorspeicher vorhanden."""
-            response = send_prompt_to_assistant(initial_prompt, st.session_state.current_assistant_id, False)
-
-            # Check each criterion and update the status based on response
-            G_prompt = criteria[0]["prompt"]
-            G_response = send_prompt_to_assistant(G_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(0, G_response)
-
-            U_prompt = criteria[1]["prompt"]
-            U_response = send_prompt_to_assistant(U_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(1, U_response)
-
-            D_prompt = criteria[2]["prompt"]
-            D_response = send_prompt_to_assistant(D_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(2, D_response)
-
-            # Ask the final question after all criteria checks are done
-            last_prompt = """jetzt eine zusammenfassungstabelle mit allen fragen und Erklärung und Begründung. In """
-            final_response = send_prompt_to_assistant(last_prompt, st.session_state.current_assistant_id)
-            
-    if st.button("2️⃣ Prüfung Namenskonvention, Status, Änderungshistorie, Baseline, Versionen"):
-        st.session_state.current_assistant_id = vorgaben_bot
-        with col2:
-            # Send initial prompt directly without KM ID
-            initial_prompt = """KM ID: SUP1_001; EcoRair_SUP.8_KM-Plan.pdf und Review-Dokument (QS-Plan_probe.docx) sind schon im Vektorspeicher vorhanden. """
-            response = send_prompt_to_assistant(initial_prompt, st.session_state.current_assistant_id, False)
-
-            # Check each criterion and update the status based on response
-            A_prompt = criteria[5]["prompt"]
-            A_response = send_prompt_to_assistant(A_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(5, A_response)
-
-            B_prompt = criteria[6]["prompt"]
-            B_response = send_prompt_to_assistant(B_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(6, B_response)
-
-            C_prompt = criteria[7]["prompt"]
-            C_response = send_prompt_to_assistant(C_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(7, C_response)
-            
-            D_prompt = criteria[8]["prompt"]
-            D_response = send_prompt_to_assistant(D_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(8, D_response)
-
-            E_prompt = criteria[9]["prompt"]
-            E_response = send_prompt_to_assistant(E_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(9, E_response)
-            
-            F_prompt = criteria[10]["prompt"]
-            F_response = send_prompt_to_assistant(F_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(10, F_response)
-            
-            G_prompt = criteria[11]["prompt"]
-            G_response = send_prompt_to_assistant(G_prompt, st.session_state.current_assistant_id, False)
-            update_criteria_status(11, G_response)
-            # Ask the final question after all criteria checks are done
-            last_prompt = """jetzt nur eine zusammenfassungstabelle mit allen fragen und Erklärung und Begründung."""
-            final_response = send_prompt_to_assistant(last_prompt, st.session_state.current_assistant_id)
-    # Show the second button for the second process
-    if st.button("3️⃣ Prüfung Freigeber, Verantwortlichkeit"):
-        # Proceed only if KM ID is removed
-        st.session_state.current_assistant_id = chat_bot
-        with col2:
-            # Send initial prompt directly without KM ID
-            initial_prompt = """KM ID: SUP1_001; ECORAIR_MAN.3_SEMP.pdf und Review-Dokument (QS_Plan_probe.docx) sind schon im Vektorspeicher vorhanden."""
-            response = send_prompt_to_assistant(initial_prompt, st.session_state.current_assistant_id, False)
-            
-            # Check each criterion and update the status based on response
-            G_prompt = criteria[3]["prompt"]
-            G_response = send_prompt_to_assistant(G_prompt, st.session_state.current_assistant_id)
-            update_criteria_status(3, G_response)
-
-            U_prompt = criteria[4]["prompt"]
-            U_response = send_prompt_to_assistant(U_prompt, st.session_state.current_assistant_id)
-            update_criteria_status(4, U_response)
-    
-    st.write("")  # Adds one empty line
-    st.subheader("🛠️ Weitere Funktionen:")
-        
-    # Clear chat button
-    if st.button("Chat Löschen"):
-        st.session_state.messages.clear()
-        
-    # Collect the assistant's messages
-    assistant_messages = [
-        message["content"] for message in st.session_state.messages
-    ]
-
-    # Check if there are any messages to download
-    if assistant_messages:
-        # Format messages as plain text
-        messages_text = "\n\n".join(assistant_messages)
-        
-        # Create a BytesIO object for downloading the messages as a file
-        message_file = io.BytesIO()
-        message_file.write(messages_text.encode())
-        message_file.seek(0)  # Reset the pointer to the beginning of the file
-        
-        # Provide the download button for the user
-        st.download_button(
-            label="Ergebnisse Herunterladen",
-            data=message_file,
-            file_name="Bericht.txt",  # Name of the file to be downloaded
-            mime="text/plain"  # MIME type for text files
-        )
-    else:
-        st.warning("Kein Bericht zum Herunterladen.")
-
-# Center Column (the main chatbox in the middle)
-with col2:   
-    # Chat input for the user
-    if prompt := st.chat_input("Deine Nachricht"):
-        # Add user message to the state and display it
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        #with st.chat_message("user"):
-        #    st.markdown(prompt)
-        
-        res = send_prompt_to_assistant(prompt)
-
-# Right Column (for visualizations and criteria selection stacked one under another)
-
-    #criteria = ["Geheimhaltungsstufe", "Unterlagenklasse", "Dateiformat"]
-    #for i, criterion in enumerate(criteria):
-    #    background_color = st.session_state.criteria_status[i] = "lightgray"
-    #    text_color = "black"
-        
-    #    st.markdown(f'''
-    #        <div style="background-color:{background_color}; color:{text_color}; padding: 10px; border-radius: 5px; font-size:20px; margin-bottom: 10px;">
-    #            {criterion}
-    #        </div>
-    #    ''', unsafe_allow_html=True) 
-
-with col3:  
-    # Display token usage and cost information with improved formatting
-    st.subheader("Token-Nutzung und Kosten")
-
-    # Display total token usage and total cost with nice formatting
-    token_usage = st.session_state.token_usage
-    total_cost = st.session_state.total_cost
-
-    # Format the token usage and cost to make it clearer and more readable
-    st.markdown(f"""
-    <div style="background-color:#f0f0f5; padding: 15px; border-radius: 10px; font-size: 16px; margin-bottom: 15px;">
-        <strong>Gesamt verwendete Token:</strong> <span style="font-weight: bold; font-size: 18px;">{token_usage}</span>
-    </div>
-
-    <div style="background-color:#e6f7ff; padding: 15px; border-radius: 10px; font-size: 16px; margin-bottom: 15px;">
-        <strong>Gesamtkosten:</strong> <span style="font-weight: bold; font-size: 18px;">€{total_cost:.4f}</span>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.subheader("Zusätzliche Infos")
-
-    st.markdown("""
-    - Diese Anwendung nutzt Azure OpenAI für die Dokumentenprüfung. Weitere Infos: https://learn.microsoft.com/en-us/azure/ai-services/openai/concepts/assistants
-    - Das Frontend wurde mit Streamlit entwickelt. Mehr erfahren: https://streamlit.io/
-    - Die Nutzung basiert auf Tokens, Kosten variieren je nach Modell. Details: https://openai.com/api/pricing/
-    """, unsafe_allow_html=True)
+# import necessary python libraries/packages
+import uuid
+import json
+import streamlit as st
+from dotenv import load_dotenv
+#from utils import display_messages, calculate_cost, send_prompt_to_assistant
+import openai
+import pandas as pd
+from resources import (
+    get_client, get_vector_store, get_assistant, get_review_runner, get_document_index, invalidate_vector_store
+)
+from verdict_cache import combined_hash
+from telemetry import load_records, to_csv, LATENCY_BUCKETS
+from thread_manager import CHAT_TRUNCATION_STRATEGY
+from ingestion import batch_succeeded
+from message_log import MessageLog
+from report import ReportBuilder, REPORT_FORMATS
+from criteria import criteria, review_groups, assistant_names
+from review import ReviewSession
+from document_metadata import extract_metadata
+from local_retrieval import answer_question, CHAT_DEPLOYMENT
+
+
+
+
+# Helper function to ensure no duplicate messages are appended
+def is_message_duplicate(message, messages):
+    """Check if the message is already in the session state (a set lookup in the MessageLog)."""
+    return message in messages
+
+# Helper function to display all messages (user, assistant, system), ensuring no duplication
+def display_messages(messages):
+    """Display the messages (user, assistant, system) that are not on the page yet in this script run, each only once."""
+    for message in messages.take_unrendered(st.session_state.script_run):
+        if message.get("content"):
+            with st.chat_message(message["role"]):  # Role determines message type
+                st.markdown(f'<p style="font-size: 16px;">{message["content"]}</p>', unsafe_allow_html=True)
+            
+
+
+# Load environment variables from .env file
+#load_dotenv(dotenv_path='.env')
+
+# Set up proxy environment variables to access external websites
+#os.environ['http_proxy'] = os.getenv('HTTP_PROXY')
+#os.environ['https_proxy'] = os.getenv('HTTP_PROXY')
+
+# Get the AzureOpenAI client (created once per process, not on every rerun)
+client = get_client()
+
+# Set the page title for the whole app
+st.set_page_config(
+    page_title="Dokument Review",
+    page_icon="📚",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Top expandable bar for instructions (collapsed by default)
+with st.expander("Einführung & Anweisungen", expanded=False):
+    st.markdown("""
+        # Willkommen beim **Dokumenten-Review-Tool**! 🎉
+
+        Dieses Tool hilft Ihnen dabei, Dokumente mithilfe eines KI-assistierten Überprüfungsprozesses zu analysieren. Sie können verschiedene Kriterien wie Geheimhaltungsstufe, Unterlagenklasse, Dateiformat und viele andere überprüfen lassen. Laden Sie Ihre Dateien hoch, und lassen Sie die KI die Prüfung automatisch durchführen.
+
+        ## So funktioniert's:
+
+        1. **Datei hochladen**:
+            - Gehen Sie in der **Sidebar** und laden Sie eine Datei hoch, die Sie überprüfen möchten (z. B. PDF, TXT, CSV, DOCX, XLSX).
+        
+        2. **Bereits hochgeladene Dateien**:
+            - Unter **"Hochgeladene Dateien"** sehen Sie alle Dokumente, die bereits hochgeladen wurden.
+            - Wenn Sie eines der hochgeladenen Dokumente zur Überprüfung auswählen möchten, klicken Sie einfach auf den Dateinamen. Das ausgewählte Dokument wird dann **grün** hervorgehoben, um anzuzeigen, dass es für die Überprüfung bereit ist.
+            - Wenn Sie die Auswahl des Dokuments aufheben möchten, klicken Sie erneut auf den Dateinamen, und die Auswahl wird zurückgesetzt (die Farbe wird wieder **grau**).
+        
+        3. **Kriterien auswählen**:
+            - Sie können wählen, welche Kriterien Sie überprüfen möchten. Die verfügbaren Prüfungen sind:
+                - **Geheimhaltungsstufe**, **Unterlagenklasse**, **Dateiformat**
+                - **Freigeber**, **Verantwortlichkeiten**
+                - **Änderungshistorie**,**Status, Version und Baseline**, **Namenskonvention**
+            - Die Prüfungen werden automatisch im Hintergrund durch die KI ausgeführt. Sie erhalten die **Antwort des Assistenten** direkt, ohne dass Sie sich um die Details der Ausführung kümmern müssen.
+        
+        4. **Ergebnisse und Visualisierungen**:
+            - Alle geprüften Kriterien werden auf der **linken Seite** angezeigt. Jedes Kriterium wird entweder mit **grün** (i.O.) oder **rot** (n.i.O.) markiert, je nachdem, ob das Kriterium erfüllt wurde.
+            - Unter der Visualisierung wird angezeigt, wie viele **Token** für die Eingabe und Ausgabe verbraucht wurden, sowie die **Kosten** für die verwendeten Tokens (Input und Output).
+
+        5. **Weitere Funktionen**:
+            - **Chat löschen**: Sie können den Chat jederzeit löschen, um eine neue Sitzung zu starten.
+            - **Ergebnisse herunterladen**: Wenn die Überprüfung abgeschlossen ist, können Sie den **Bericht** der KI in Form einer **Textdatei** herunterladen, die alle Ergebnisse der Prüfung enthält.
+
+        6. **Chat-Funktion**:
+            - In der **Chat-Leiste** können Sie direkt mit dem Assistenten kommunizieren. Sie können Fragen stellen oder zusätzliche Informationen anfordern, und der Assistent wird Ihnen antworten.
+
+        ## Wichtige Hinweise:
+        - Wenn Sie nach der **KM ID** gefragt werden, stellen Sie sicher, dass Sie diese angeben, da sie für den Start der Überprüfung erforderlich ist.
+        - Die **Kriterien** werden automatisch generiert und im Hintergrund abgearbeitet. Sie erhalten die endgültige Antwort des Assistenten ohne weitere Eingriffe.
+        - Alle Ergebnisse und Statusanzeigen werden live aktualisiert, sodass Sie den Fortschritt der Überprüfung in Echtzeit verfolgen können.
+    """, unsafe_allow_html=True)
+
+# Add title with custom font size
+st.markdown(
+    """
+    <h1 style="text-align: left; font-size: 48px;">📚🔍 <i>Dokumenten-Review mit LLM</i> 🤖💬</h1>
+    """, 
+    unsafe_allow_html=True
+)
+
+# --- Initial Setup for Azure OpenAI Service ---
+
+# Import the assistants using the assistant IDs (Assistant were already created in Azure OpenAI Service)
+assistant_id = "asst_UZ1evOoGrkD8D1IKOmik22z6"
+
+# Number of recent runs shown in the telemetry panel
+TELEMETRY_PANEL_RUNS = 500
+
+# Seconds between two looks at the running reviews
+REVIEW_POLL_SECONDS = 1.0
+
+# Review document and KM ID used by the three review buttons
+review_document = "QS-Plan_probe.docx"
+review_km_id = "SUP1_001"
+
+# Get the "dokument review" vector store (looked up or created once and cached across reruns and sessions)
+vector_store_name = "dokument review"
+vector_store = get_vector_store(vector_store_name)
+# Main content area with two columns
+col2, col3 = st.columns([2, 1])  # Center (for chatbox) and Right (for visualizations)
+with col3:
+    st.subheader("Visualisierung der geprüften Kriterien:")
+    
+# --- Initial Setup for Interface with Streamlit ---
+def initialize_session_state():
+    """Initializes session state variables if not already set."""
+    # Thread, attached vector stores and token usage of this browser session
+    if "review_session" not in st.session_state:
+        st.session_state.review_session = ReviewSession(client, vector_store.id)
+        # The vector store is attached to the session's thread, not to the shared assistant
+        st.session_state.review_session.new_thread()
+
+    # The shared vector store is looked up again after it was deleted, the session follows it
+    st.session_state.review_session.vector_store_id = vector_store.id
+
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
+
+    # Counts the script runs, the message log renders each message once per run
+    st.session_state.script_run = st.session_state.get("script_run", 0) + 1
+
+    if "messages" not in st.session_state: 
+        st.session_state.messages = MessageLog()
+        
+        message = {"role": "assistant", "content": """Willkommen in der Dokumenten-Review-App! Wie kann ich Ihnen heute behilflich sein ?
+                      Falls Sie ein Dokument nach bestimmten formalen Kriterien überprüfen lassen möchten, teilen Sie mir bitte die KM-ID mit."""}
+        
+        st.session_state.messages.append(message)
+        with col2:
+            display_messages(st.session_state.messages)
+                
+
+    
+    # Chat messages and verdicts for the download, serialized on request
+    if "report" not in st.session_state:
+        st.session_state.report = ReportBuilder()
+
+    if "file_id_list" not in st.session_state:
+        st.session_state.file_id_list = []
+        
+    if 'file_id_map' not in st.session_state:
+        st.session_state.file_id_map = {}
+
+    # Content hash of every selected file, part of the verdict cache key
+    if 'file_hash_map' not in st.session_state:
+        st.session_state.file_hash_map = {}
+
+    # Locally extracted metadata (properties, headers/footers, change history) of every selected file
+    if 'document_metadata' not in st.session_state:
+        st.session_state.document_metadata = {}
+
+    # Local search index (chunks) of every selected file, for the local chat
+    if 'document_indexes' not in st.session_state:
+        st.session_state.document_indexes = {}
+        
+    if 'current_assistant_id' not in st.session_state:        
+        st.session_state.current_assistant_id = assistant_id
+
+    # Duration and tokens of the reviews in this session
+    if 'review_stats' not in st.session_state:
+        st.session_state.review_stats = []
+
+    # Reviews running in the background and the criteria that have a tile
+    if 'review_jobs' not in st.session_state:
+        st.session_state.review_jobs = []
+
+    if 'reviewed_criteria' not in st.session_state:
+        st.session_state.reviewed_criteria = []
+        
+    # Initialize session state to keep track of uploaded files and selected criteria
+    if 'criteria_selected' not in st.session_state:
+        st.session_state.uploaded_files = []  # Store uploaded file names
+        st.session_state.uploaded_file_data = {}  # File name: the uploaded file (an in-memory buffer)
+        st.session_state.file_buttons = {}  # To store the state (color) of file buttons
+        
+    # Initialize criteria status in session state if it doesn't already exist
+    if "criteria_status" not in st.session_state:
+        st.session_state.criteria_status = {
+            0: "lightgray",  # Geheimhaltungsstufe
+            1: "lightgray",  # Unterlagenklasse
+            2: "lightgray",   # Dateiformat
+            3: "lightgray",  # Freigeber
+            4: "lightgray"  # Verantwortlichkeit
+    }
+
+initialize_session_state()
+
+
+
+# Define a function to display the status tile of a criterion
+def show_criterion_tile(index):
+    # The color comes from the parsed verdict (lightgray while pending or without a valid verdict)
+    background_color = st.session_state.criteria_status.get(index, "lightgray")
+    text_color = "white" if background_color == "green" or "red" else "black"
+
+    st.markdown(f'''
+        <div style="background-color:{background_color}; color:{text_color}; padding: 10px; border-radius: 5px; font-size:20px; margin-bottom: 10px;">
+            {criteria[index]["name"]}
+        </div>
+    ''', unsafe_allow_html=True)
+
+def verdict_cache_scope():
+    """Document hash and model for the verdict cache of the current assistant, None if no document is selected."""
+    selected_hashes = [
+        file_hash for file_name, file_hash in st.session_state.file_hash_map.items()
+        if st.session_state.file_buttons.get(file_name) == "green"
+    ]
+    if not selected_hashes:
+        return None
+    assistant = get_assistant(st.session_state.current_assistant_id)
+    return combined_hash(selected_hashes), assistant.model
+
+def send_prompt_to_assistant(prompt_text, assistant_id= st.session_state.current_assistant_id, display=True,
+                             criterion="Chat", **run_params):
+    """Send a prompt to the assistant, extract token usage, calculate the cost, and update the chat with the response.
+
+    criterion labels the run in the telemetry and run_params are passed on to the run
+    (e.g. the truncation_strategy for chat prompts).
+    """
+    # Ensure the assistant ID is set correctly in session state
+    if st.session_state.current_assistant_id is None:
+        st.error("Bitte wählen Sie zuerst einen Assistant.")
+        return
+
+    # Show the conversation so far, the new answer is streamed below it
+    on_text = None
+    if display:
+        display_messages(st.session_state.messages)
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+        streamed_text = []
+
+        def on_text(text):
+            streamed_text.append(text)
+            placeholder.markdown(f'<p style="font-size: 16px;">{"".join(streamed_text)}</p>', unsafe_allow_html=True)
+
+    # Send the prompt and run the assistant, the session adds the token usage and returns the new messages
+    assistant_messages_for_run, run = st.session_state.review_session.send(
+        prompt_text,
+        st.session_state.current_assistant_id,
+        on_text=on_text,
+        criterion=criterion,
+        **run_params
+    )
+
+    if run.status != "completed":
+        st.error(f"Der Assistant hat die Anfrage nicht abgeschlossen (Status: {run.status}).")
+
+    # Prepare the response text from assistant's message
+    response = ""
+    for text_content in assistant_messages_for_run:
+        # Only append if the message is not already in session state
+        if not is_message_duplicate({"role": "assistant", "content": text_content}, st.session_state.messages):
+            st.session_state.messages.append({"role": "assistant", "content": text_content})
+
+        response = text_content  # Assuming the last message is the response
+
+    # Replace the streamed text with the final answer (also covers the polling fallback)
+    if display:
+        placeholder.markdown(f'<p style="font-size: 16px;">{response}</p>', unsafe_allow_html=True)
+        st.session_state.messages.mark_rendered(st.session_state.script_run)  # The answer is on the page already
+
+    return response  # Return the response content
+
+def selected_document_indexes():
+    """Local search indexes of the selected files that have readable text."""
+    return [
+        index for file_name, index in st.session_state.document_indexes.items()
+        if index is not None and st.session_state.file_buttons.get(file_name) == "green"
+    ]
+
+def send_prompt_locally(prompt_text):
+    """Answer a chat prompt from the best matching chunks of the selected files, without an assistant run."""
+    display_messages(st.session_state.messages)
+    with st.chat_message("assistant"):
+        with st.spinner("Suche in den ausgewählten Dokumenten ..."):
+            # The prompt is the last message already, the history is what came before it
+            response, completion = answer_question(
+                client, prompt_text, selected_document_indexes(), history=st.session_state.messages[:-1]
+            )
+        st.markdown(f'<p style="font-size: 16px;">{response}</p>', unsafe_allow_html=True)
+
+    st.session_state.review_session.usage.add(completion)
+    st.session_state.messages.append({"role": "assistant", "content": response})
+    st.session_state.messages.mark_rendered(st.session_state.script_run)  # The answer is on the page already
+    return response
+
+def selected_document_metadata():
+    """Metadata of the review document, None unless exactly one file is selected."""
+    selected = [file_name for file_name, color in st.session_state.file_buttons.items() if color == "green"]
+    if len(selected) != 1:
+        return None
+    return st.session_state.document_metadata.get(selected[0])
+
+def start_review(review_group):
+    """Submit the review of the group to the worker pool and return at once."""
+    # Send the review context directly without asking for the KM ID
+    runner = get_review_runner()
+    job = runner.create_job(
+        st.session_state.review_session,
+        review_group,
+        km_id=review_km_id,
+        document=review_document,
+        metadata=selected_document_metadata(),
+        fused=st.session_state.fused_mode,
+        cache_scope=verdict_cache_scope(),
+        bypass_cache=st.session_state.bypass_verdict_cache,
+    )
+    runner.submit(job)
+    st.session_state.review_jobs.append(job)
+
+    # The tiles of the group turn gray until the new verdicts arrive
+    for index in job.criteria_indices:
+        st.session_state.criteria_status[index] = "lightgray"
+        if index not in st.session_state.reviewed_criteria:
+            st.session_state.reviewed_criteria.append(index)
+
+def merge_review_job(job):
+    """Add the results of a finished review to the chat history and thread, the token totals and the review stats."""
+    # The verdicts come in criteria order for the chat history and the report, the usage goes to the session
+    results = []
+    for index, verdict in get_review_runner().collect(st.session_state.review_session, job):
+        results.append(verdict.to_text())
+        st.session_state.report.add_verdict(verdict, document=job.document, km_id=job.km_id)
+    if job.summary:
+        results.append(job.summary)
+    if job.error:
+        results.append(f"Die Prüfung {job.name} ist fehlgeschlagen: {job.error}")
+
+    for text in results:
+        message = {"role": "assistant", "content": text}
+        if not is_message_duplicate(message, st.session_state.messages):
+            st.session_state.messages.append(message)
+
+    # The review ran on threads of its own, post the results to the chat thread so the follow-up questions
+    # can refer to them (unless a new document was selected meanwhile)
+    review_session = st.session_state.review_session
+    if results and job.thread_id is not None and job.thread_id == review_session.thread_id:
+        review_session.post("\n\n".join(results))
+
+    runs = job.runs()
+    st.session_state.review_stats.append({
+        "Modus": "kombiniert" if job.fused else "einzeln",
+        "Kriterien": len(job.criteria_indices),
+        "Dauer (s)": round(job.duration, 1),
+        "Input-Token": sum(run.usage.prompt_tokens for run in runs if run.usage),
+        "Token gesamt": sum(run.usage.total_tokens for run in runs if run.usage),
+    })
+
+def show_review_jobs():
+    """Show the criteria tiles and the progress of the running reviews, merge the finished ones."""
+    finished = False
+    for job in list(st.session_state.review_jobs):
+        active = job.active  # Read before the verdicts, a finished job already holds all of them
+        verdicts = job.verdicts()
+        for index, verdict in verdicts.items():
+            st.session_state.criteria_status[index] = verdict.color
+
+        if active:
+            st.progress(
+                len(verdicts) / len(job.criteria_indices),
+                text=f"{job.name}: {len(verdicts)} von {len(job.criteria_indices)} Kriterien geprüft"
+            )
+        else:
+            merge_review_job(job)
+            st.session_state.review_jobs.remove(job)
+            finished = True
+
+    for index in st.session_state.reviewed_criteria:
+        show_criterion_tile(index)
+
+    if finished:
+        # Rerun the whole app, so the chat, the token totals and the report show the results
+        st.session_state.show_review_results = True
+        st.rerun()
+
+# Sidebar for controls (on the left)
+with st.sidebar:
+    st.title("📝Was möchten Sie tun ?")
+    st.write("")  # Adds one empty line
+    st.write("")  # Adds one empty line
+    # Display the subheader with an info icon beside it
+    st.markdown("""
+        <h2 style="display:inline;">🔍Datei durchsuchen:</h2>
+        <span style="cursor: pointer; font-size: 20px; margin-left: 10px;" title="Sie können Datei lokal durchsuchen und in der App hochladen.">
+            ℹ️
+        </span>
+    """, unsafe_allow_html=True)
+    # File uploader added to the sidebar
+    uploaded_file = st.file_uploader("Laden Sie bitte eine Datei hoch:", type=["txt", "csv", "pdf", "xlsx","docx"])
+
+    # When a file is uploaded, add it to the session state
+    if uploaded_file is not None:
+        file_name = uploaded_file.name
+        # Kept per name, the uploader only holds the latest file when an earlier one is clicked
+        st.session_state.uploaded_file_data[file_name] = uploaded_file
+        if file_name not in st.session_state.uploaded_files:
+            st.session_state.uploaded_files.append(file_name)
+            st.session_state.file_buttons[file_name] = "lightgray"  # Default color for the file button
+
+    # Display uploaded files with clickable buttons
+    # Display the subheader with an info icon beside it
+    st.write("")  # Adds one empty line
+    st.markdown("""
+        <h2 style="display:inline;">📂Hochgeladene Dateien:</h2>
+        <span style="cursor: pointer; font-size: 20px; margin-left: 10px;" title="Sie können hier die hochgeladenen Dateien sehen. 
+        Wenn Sie auf den Dateinamen klicken, wird die Datei dem Assistenten für ein formales Review zur Verfügung gestellt.
+        DM-Plan_Tabelle wude schon für Sie hochgeladen.">
+            ℹ️
+        </span>
+    """, unsafe_allow_html=True)
+    # Special case for DM-Plan_Tabelle.xlsx, display as green background text without button
+    st.markdown(f'''
+        <div style="background-color:green; color:white; padding: 10px; border-radius: 5px; font-size:18px; margin-bottom: 10px;">
+            DM-Plan_Tabelle.xlsx
+        </div>
+    ''', unsafe_allow_html=True)
+    for file_name in st.session_state.uploaded_files:
+        # Check if the button is clicked
+        if st.button(file_name, key=file_name, use_container_width=True):
+            # Handle when the file button is clicked, and it's not in use (lightgray)
+            if st.session_state.file_buttons[file_name] == "lightgray":
+                # Change the color to green after clicking
+                st.session_state.file_buttons[file_name] = "green"
+
+                # Start a fresh thread for the new artifact instead of asking the assistant to forget the old one,
+                # so the earlier reviews don't count as input tokens anymore
+                review_session = st.session_state.review_session
+                review_session.new_thread()
+
+                # Upload the file only if the same content was not uploaded before (by any session)
+                file_data = st.session_state.uploaded_file_data[file_name]
+                file_id, file_hash = review_session.upload(file_name, file_data)
+
+                # Update the vector store with the new file, unless it is already indexed there
+                if not review_session.is_indexed(file_hash):
+                    # Wait until the file is indexed, so the review doesn't start on a half-indexed file
+                    progress_bar = st.progress(0.0, text="Datei wird im Vektorspeicher indexiert ...")
+                    def show_progress(processed, total):
+                        progress_bar.progress(processed / max(total, 1), text=f"Indexiert: {processed} von {total} Dateien")
+
+                    try:
+                        batch_add = review_session.index_file(file_id, file_hash, on_progress=show_progress)
+                    except openai.NotFoundError:
+                        # The cached vector store was deleted in the meantime, look it up again
+                        invalidate_vector_store()
+                        vector_store = get_vector_store(vector_store_name)
+                        review_session.vector_store_id = vector_store.id
+                        batch_add = review_session.index_file(file_id, file_hash, on_progress=show_progress)
+                    progress_bar.empty()
+                    indexed = batch_succeeded(batch_add)
+                else:
+                    indexed = True
+
+                if indexed:
+                    review_session.hold_file(file_id)  # Kept in the shared vector store while this session reviews it
+                    st.session_state.file_id_list.append(file_id)  # Store the file ID in session state
+
+                    # Store the relationship between file_name and file_id in the dictionary
+                    st.session_state.file_id_map[file_name] = file_id
+                    st.session_state.file_hash_map[file_name] = file_hash
+                    st.session_state.document_metadata[file_name] = extract_metadata(file_name, file_data.getbuffer())
+                    st.session_state.document_indexes[file_name] = get_document_index(file_hash, file_name, file_data.getvalue())
+
+                    # Attach the vector store to this session's thread (no request if it is attached already)
+                    review_session.attach_to_thread()
+                else:
+                    # The file can't be reviewed, it is not kept for the review or attached
+                    st.error(f"Die Datei konnte nicht indexiert werden (Status: {batch_add.status}).")
+                    st.session_state.file_buttons[file_name] = "lightgray"
+
+            # Handle when the button is clicked again and is already green (file in use)
+            else:
+                st.session_state.file_buttons[file_name] = "lightgray"  # Revert button color to light gray
+
+                # Retrieve the file_id associated with the file_name from the file_id_map
+                file_id_to_remove = st.session_state.file_id_map.get(file_name)
+
+                if file_id_to_remove:
+                    # Remove the file from the vector store unless other sessions review it (the uploaded file is kept)
+                    st.session_state.review_session.remove_file(file_id_to_remove)
+         
+        # Display file button with dynamic color (green or lightgray)
+        st.markdown(f'''
+            <div style="background-color:{st.session_state.file_buttons[file_name]}; color:white; padding: 10px; border-radius: 5px; font-size:18px; margin-bottom: 10px;">
+                {file_name}
+            </div>
+        ''', unsafe_allow_html=True)
+    st.write("")  # Adds one empty line       
+    st.subheader("✔️ Welche Kriterien wollen Sie prüfen:")
+    st.toggle(
+        "Kombinierter Modus",
+        key="fused_mode",
+        help="Alle Kriterien einer Prüfung werden in einem einzigen Lauf des Assistenten geprüft (weniger Token, kürzere Laufzeit)."
+    )
+    st.checkbox(
+        "Cache umgehen",
+        key="bypass_verdict_cache",
+        help="Ergebnisse früherer Prüfungen desselben Dokuments nicht wiederverwenden, sondern neu prüfen lassen."
+    )
+    st.toggle(
+        "Lokale Suche im Chat",
+        key="local_chat",
+        disabled=CHAT_DEPLOYMENT is None,
+        help="Chat-Fragen werden mit den passenden Abschnitten der ausgewählten Dokumente beantwortet, "
+             "ohne Assistant-Lauf und file_search (schneller und weniger Token)."
+    )
+    
+
+    # Show one button per review group, the review runs in the background (the chat stays usable)
+    for review_group in review_groups:
+        running = any(job.name == review_group["name"] for job in st.session_state.review_jobs)
+        if st.button(review_group["button"], disabled=running):
+            st.session_state.current_assistant_id = review_group["assistant_id"]
+            start_review(review_group)
+
+    st.write("")  # Adds one empty line
+    st.subheader("🛠️ Weitere Funktionen:")
+        
+    # Clear chat button
+    if st.button("Chat Löschen"):
+        st.session_state.messages.clear()
+        st.session_state.report.clear()
+        
+    # Only the messages added since the last run are appended to the report
+    report = st.session_state.report
+    report.sync_messages(st.session_state.messages)
+
+    # Check if there is anything to download
+    if not report.empty:
+        report_format = st.selectbox("Berichtsformat", list(REPORT_FORMATS), key="report_format")
+        extension, mime = REPORT_FORMATS[report_format]
+
+        # The report is serialized on request, and again only after new results came in
+        if report.is_built(report_format) or st.button("Bericht erstellen"):
+            st.download_button(
+                label="Ergebnisse Herunterladen",
+                data=report.build(report_format),
+                file_name=f"Bericht.{extension}",  # Name of the file to be downloaded
+                mime=mime
+            )
+    else:
+        st.warning("Kein Bericht zum Herunterladen.")
+
+# Center Column (the main chatbox in the middle)
+with col2:   
+    # Show the chat history once after a review finished in the background
+    if st.session_state.pop("show_review_results", False):
+        display_messages(st.session_state.messages)
+
+    # Chat input for the user
+    if prompt := st.chat_input("Deine Nachricht"):
+        # Add user message to the state and display it
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        #with st.chat_message("user"):
+        #    st.markdown(prompt)
+        
+        if st.session_state.local_chat and selected_document_indexes():
+            res = send_prompt_locally(prompt)
+        else:
+            res = send_prompt_to_assistant(prompt, truncation_strategy=CHAT_TRUNCATION_STRATEGY)
+
+# Right Column (for visualizations and criteria selection stacked one under another)
+
+    #criteria = ["Geheimhaltungsstufe", "Unterlagenklasse", "Dateiformat"]
+    #for i, criterion in enumerate(criteria):
+    #    background_color = st.session_state.criteria_status[i] = "lightgray"
+    #    text_color = "black"
+        
+    #    st.markdown(f'''
+    #        <div style="background-color:{background_color}; color:{text_color}; padding: 10px; border-radius: 5px; font-size:20px; margin-bottom: 10px;">
+    #            {criterion}
+    #        </div>
+    #    ''', unsafe_allow_html=True) 
+
+with col3:  
+    # Criteria tiles, refreshed on their own while reviews are running
+    st.fragment(run_every=REVIEW_POLL_SECONDS if st.session_state.review_jobs else None)(show_review_jobs)()
+
+    # Display token usage and cost information with improved formatting
+    st.subheader("Token-Nutzung und Kosten")
+
+    # Display total token usage and total cost with nice formatting
+    token_usage = st.session_state.review_session.usage.total_tokens
+    total_cost = st.session_state.review_session.usage.cost
+
+    # Format the token usage and cost to make it clearer and more readable
+    st.markdown(f"""
+    <div style="background-color:#f0f0f5; padding: 15px; border-radius: 10px; font-size: 16px; margin-bottom: 15px;">
+        <strong>Gesamt verwendete Token:</strong> <span style="font-weight: bold; font-size: 18px;">{token_usage}</span>
+    </div>
+
+    <div style="background-color:#e6f7ff; padding: 15px; border-radius: 10px; font-size: 16px; margin-bottom: 15px;">
+        <strong>Gesamtkosten:</strong> <span style="font-weight: bold; font-size: 18px;">€{total_cost:.4f}</span>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Compare duration and tokens of the reviews (single runs vs. combined mode)
+    if st.session_state.review_stats:
+        st.subheader("Letzte Prüfungen")
+        st.table(st.session_state.review_stats[-5:])
+
+    # Latency of the recorded runs, to see which criteria and assistants dominate latency and cost.
+    # A toggle and not an expander: an expander's body runs on every rerun even when it is collapsed
+    if st.toggle("Laufzeit-Telemetrie anzeigen", key="show_telemetry"):
+        records = load_records(limit=TELEMETRY_PANEL_RUNS)
+        if records:
+            frame = pd.DataFrame(records)
+            frame["Assistant"] = frame["assistant_id"].map(lambda assistant: assistant_names.get(assistant, assistant))
+            frame["Laufzeit"] = pd.cut(
+                frame["run_seconds"],
+                bins=[0, *LATENCY_BUCKETS, float("inf")],
+                labels=[f"bis {bucket} s" for bucket in LATENCY_BUCKETS] + [f"über {LATENCY_BUCKETS[-1]} s"]
+            )
+            st.bar_chart(frame.groupby(["Laufzeit", "Assistant"], observed=False).size().unstack(fill_value=0))
+            st.dataframe(
+                frame.groupby("criterion")[["queue_seconds", "time_to_first_token", "run_seconds", "prompt_tokens", "completion_tokens"]]
+                .mean()
+                .round(1)
+            )
+            st.download_button(
+                label="Telemetrie als CSV",
+                data=to_csv(records),
+                file_name="run_metrics.csv",
+                mime="text/csv"
+            )
+        else:
+            st.write("Noch keine Läufe aufgezeichnet.")
+    
+    st.subheader("Zusätzliche Infos")
+
+    st.markdown("""
+    - Diese Anwendung nutzt Azure OpenAI für die Dokumentenprüfung. Weitere Infos: https://learn.microsoft.com/en-us/azure/ai-services/openai/concepts/assistants
+    - Das Frontend wurde mit Streamlit entwickelt. Mehr erfahren: https://streamlit.io/
+    - Die Nutzung basiert auf Tokens, Kosten variieren je nach Modell. Details: https://openai.com/api/pricing/
+    """, unsafe_allow_html=True)
@@ -0,0 +1,251 @@
+"""Asynchronous version of the review pipeline for the AsyncAzureOpenAI client.
+
+The helpers mirror the synchronous ones (upload, vector store ingestion, run engine,
+criteria scheduler) but wait with asyncio instead of threads and time.sleep, so one
+process can drive many uploads and runs at the same time. Create the client with
+client_factory.create_async_client inside the event loop that uses it; its gateway
+shares the rate limiter with the synchronous clients.
+"""
+import asyncio
+import time
+
+import httpx
+import openai
+
+from ingestion import BATCH_TERMINAL_STATUSES, INGESTION_TIMEOUT_SECONDS
+from run_engine import TERMINAL_STATUSES
+from telemetry import record_run
+
+# Upper bound of runs per review that are active at the same time
+MAX_CONCURRENT_RUNS = 8
+
+# Set to False once the deployment rejected a response_format, so later runs don't try again
+_response_format_supported = True
+
+
+async def upload_file(client, file_name, data):
+    """Upload the file content (bytes or a file object) and return the file object."""
+    return await client.files.create(file=(file_name, data), purpose="assistants")
+
+
+async def get_vector_store(client, name):
+    """Return the vector store with the given name, create it if it doesn't exist."""
+    page = await client.beta.vector_stores.list(limit=100)
+    for store in page.data:
+        if store.name == name:
+            return store
+    return await client.beta.vector_stores.create(name=name)
+
+
+async def wait_for_file_batch(client, vector_store_id, batch, on_progress=None,
+                              initial_interval=0.25, max_interval=3.0, backoff=1.5,
+                              timeout=INGESTION_TIMEOUT_SECONDS):
+    """Poll a file batch with backoff until the vector store finished indexing its files.
+
+    Same contract as ingestion.wait_for_file_batch.
+    """
+    interval = initial_interval
+    deadline = time.monotonic() + timeout
+    while True:
+        if on_progress is not None:
+            counts = batch.file_counts
+            on_progress(counts.completed + counts.failed + counts.cancelled, counts.total)
+
+        if batch.status in BATCH_TERMINAL_STATUSES or time.monotonic() > deadline:
+            return batch
+
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+        batch = await client.beta.vector_stores.file_batches.retrieve(
+            vector_store_id=vector_store_id,
+            batch_id=batch.id
+        )
+
+
+async def add_files_to_vector_store(client, vector_store_id, file_ids, on_progress=None):
+    """Add the files to the vector store and wait until they are indexed, return the last batch object."""
+    batch = await client.beta.vector_stores.file_batches.create(
+        vector_store_id=vector_store_id,
+        file_ids=list(file_ids)
+    )
+    return await wait_for_file_batch(client, vector_store_id, batch, on_progress=on_progress)
+
+
+async def remove_file_from_vector_store(client, vector_store_id, file_id):
+    """Remove the file from the vector store (the uploaded file itself is kept)."""
+    await client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+
+
+async def poll_run(client, thread_id, run, initial_interval=0.25, max_interval=2.0, backoff=1.5, stats=None):
+    """Poll a run with adaptive backoff until it reaches a terminal status."""
+    interval = initial_interval
+    while run.status not in TERMINAL_STATUSES:
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+        run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+        if stats is not None:
+            stats["poll_count"] = stats.get("poll_count", 0) + 1
+    return run
+
+
+async def stream_run(client, thread_id, assistant_id, on_text=None, stats=None, **run_params):
+    """Start a run with the streaming API and pass every text delta to on_text as it arrives."""
+    started = time.monotonic()
+    async with client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        **run_params
+    ) as stream:
+        try:
+            async for text in stream.text_deltas:
+                if stats is not None and stats.get("time_to_first_token") is None:
+                    stats["time_to_first_token"] = time.monotonic() - started
+                if on_text is not None:
+                    on_text(text)
+            run = await stream.get_final_run()
+        except httpx.TransportError:
+            # The connection broke off while reading (timeout, reset), the run goes on at the service
+            run = stream.current_run
+            if run is None:
+                raise  # The run wasn't created yet
+
+    # The stream can end early (e.g. dropped connection), so finish the run by polling
+    if run.status not in TERMINAL_STATUSES:
+        run = await poll_run(client, thread_id, run, stats=stats)
+    return run
+
+
+async def execute_run(client, thread_id, assistant_id, on_text=None, use_streaming=True, metrics=None, **run_params):
+    """Run the assistant on the thread and return the finished run object.
+
+    Same contract as run_engine.execute_run.
+    """
+    started = time.monotonic()
+    stats = {"poll_count": 0, "time_to_first_token": None, "streamed": False}
+
+    run = None
+    if use_streaming:
+        try:
+            run = await stream_run(client, thread_id, assistant_id, on_text=on_text, stats=stats, **run_params)
+            stats["streamed"] = True
+        except openai.BadRequestError:
+            run = None  # Streaming is not supported by this deployment / API version
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError, httpx.TransportError):
+            # The stream broke off, create the run again (the gateway resumes it if it was started)
+            run = None
+
+    if run is None:
+        run = await client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, **run_params)
+        run = await poll_run(client, thread_id, run, stats=stats)
+
+    # Our assistants have no function tools, a run waiting for tool outputs would block the thread
+    if run.status == "requires_action":
+        run = await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        run = await poll_run(client, thread_id, run, stats=stats)
+
+    if metrics is not None:
+        stats["run_seconds"] = time.monotonic() - started
+        # SQLite is blocking, keep it off the event loop
+        await asyncio.to_thread(record_run, run, assistant_id, stats, **metrics)
+    return run
+
+
+async def fetch_run_messages(client, thread_id, run_id, after=None, limit=20):
+    """Fetch the assistant messages of a run that are newer than the message ID 'after'.
+
+    Returns the messages (oldest first) and the cursor for the next call.
+    """
+    params = {"thread_id": thread_id, "run_id": run_id, "order": "asc", "limit": limit}
+    if after is not None:
+        params["after"] = after
+    page = await client.beta.threads.messages.list(**params)
+    messages = [message for message in page.data if message.role == "assistant"]
+    cursor = messages[-1].id if messages else after
+    return messages, cursor
+
+
+async def send_prompt(client, thread_id, assistant_id, prompt_text, after=None, on_text=None, criterion="Chat",
+                      **run_params):
+    """Send a prompt to the assistant on the thread and return (response, run, cursor).
+
+    The async counterpart of the apps' send_prompt_to_assistant without the Streamlit
+    parts: on_text receives the streamed text, after/cursor is the last message seen.
+    """
+    await client.beta.threads.messages.create(thread_id=thread_id, role="user", content=prompt_text)
+    run = await execute_run(
+        client, thread_id, assistant_id, on_text=on_text, metrics={"criterion": criterion}, **run_params
+    )
+    messages, cursor = await fetch_run_messages(client, thread_id, run.id, after=after)
+    response = ""
+    for message in messages:
+        if message.content:
+            response = message.content[0].text.value  # The last message is the answer
+    return response, run, cursor
+
+
+async def run_criterion(client, assistant_id, context_prompt, criterion_prompt, tool_resources=None,
+                        response_format=None, metrics=None, tools=None):
+    """Check a single criterion on its own thread and return the answer text and the finished run.
+
+    Same arguments as criteria_scheduler.run_criterion.
+    """
+    global _response_format_supported
+    thread = await client.beta.threads.create(
+        messages=[
+            {"role": "user", "content": context_prompt},
+            {"role": "user", "content": criterion_prompt},
+        ],
+        **({"tool_resources": tool_resources} if tool_resources else {})
+    )
+    run_params = {"tools": tools} if tools else {}
+    try:
+        run = None
+        if response_format is not None and _response_format_supported:
+            try:
+                run = await execute_run(
+                    client, thread.id, assistant_id, use_streaming=False, metrics=metrics, response_format=response_format,
+                    **run_params
+                )
+            except openai.BadRequestError:
+                # Structured outputs are not available for this model / tool combination
+                _response_format_supported = False
+        if run is None:
+            run = await execute_run(client, thread.id, assistant_id, use_streaming=False, metrics=metrics, **run_params)
+
+        messages, _ = await fetch_run_messages(client, thread.id, run.id)
+        response = ""
+        for message in messages:
+            if message.content:
+                response = message.content[0].text.value
+        return response, run
+    finally:
+        try:
+            await client.beta.threads.delete(thread_id=thread.id)
+        except Exception:
+            pass
+
+
+async def run_criteria_concurrently(client, assistant_id, context_prompt, criteria_prompts, tool_resources=None,
+                                    response_format=None, criterion_names=None, tools=None,
+                                    max_concurrency=MAX_CONCURRENT_RUNS):
+    """Check several criteria at the same time and return [(index, response, run)] in criteria order.
+
+    Same arguments as criteria_scheduler.run_criteria_parallel; a semaphore keeps at most
+    max_concurrency runs active instead of a thread per criterion. A criterion whose run
+    raised is returned with run None and the error as response.
+    """
+    criterion_names = criterion_names or {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def check(index, prompt):
+        async with semaphore:
+            try:
+                response, run = await run_criterion(
+                    client, assistant_id, context_prompt, prompt, tool_resources, response_format,
+                    {"criterion": criterion_names.get(index, str(index))}, tools
+                )
+            except Exception as error:
+                response, run = f"{type(error).__name__}: {error}", None
+        return index, response, run
+
+    return await asyncio.gather(*(check(index, prompt) for index, prompt in criteria_prompts))
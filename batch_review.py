@@ -0,0 +1,161 @@
+"""Headless batch review of the documents listed in a manifest.
+
+Usage:
+    python batch_review.py manifest.csv --output review_results.jsonl --workers 4
+
+The manifest is a CSV file with the columns "path" and "km_id" (or a JSONL file
+with the same keys). One JSON line with the verdicts is written per document.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from client_factory import create_client
+from criteria import review_groups
+from criteria_scheduler import MAX_PARALLEL_CRITERIA
+from document_metadata import extract_metadata
+from dm_plan import DMPlanTable
+from ingestion import batch_succeeded
+from review import ReviewSession, ReviewRunner, Usage
+from upload_cache import forget_vector_store
+
+# Documents reviewed at the same time (each one runs its criteria in parallel as well)
+DEFAULT_DOCUMENT_WORKERS = 4
+
+
+def read_manifest(path):
+    """Read the documents (path and KM ID) of a CSV or JSONL manifest."""
+    with open(path, encoding="utf-8", newline="") as manifest:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in manifest if line.strip()]
+        else:
+            rows = list(csv.DictReader(manifest))
+    return [{"path": row["path"], "km_id": row["km_id"]} for row in rows]
+
+
+def _add_verdict(result, index, verdict):
+    result["criteria"].append({
+        "index": index,
+        "name": verdict.criterion,
+        "status": verdict.status,
+        "reasoning": verdict.reasoning,
+        "evidence": verdict.evidence,
+    })
+
+
+def review_document(client, entry, group_indices, criteria_workers=MAX_PARALLEL_CRITERIA, fused=False, dm_plan=None):
+    """Review one document with the selected review groups and return the result record.
+
+    With fused=True all criteria of a review group are checked in a single run, which also
+    writes the group's summary table. dm_plan (a DMPlanTable) adds the requirements of
+    the KM ID to the prompts and the local checks.
+    """
+    started = time.monotonic()
+    document = os.path.basename(entry["path"])
+    result = {
+        "path": entry["path"],
+        "km_id": entry["km_id"],
+        "criteria": [],
+    }
+
+    session = None
+    try:
+        with open(entry["path"], "rb") as document_file:
+            data = document_file.read()
+        metadata = extract_metadata(document, data)
+
+        # Every document gets its own vector store, so concurrent reviews never see each other's files
+        vector_store = client.beta.vector_stores.create(
+            name=f"batch review {document}",
+            expires_after={"anchor": "last_active_at", "days": 1}
+        )
+        session = ReviewSession(client, vector_store.id)
+        file_id, file_hash = session.upload(document, data)
+        result["file_id"] = file_id
+        batch = session.index_file(file_id, file_hash)
+        if not batch_succeeded(batch):
+            raise RuntimeError(f"indexing the document failed (status: {batch.status})")
+
+        # The criteria run on threads of their own, the session needs none
+        runner = ReviewRunner(client, dm_plan=dm_plan, max_parallel_criteria=criteria_workers)
+        for group_index in group_indices:
+            job = runner.run(runner.create_job(
+                session, review_groups[group_index], entry["km_id"], document, metadata,
+                fused=fused, vector_store_ids=[vector_store.id], summary=fused
+            ))
+            for index, verdict in runner.collect(session, job):
+                _add_verdict(result, index, verdict)
+            if job.error:
+                raise RuntimeError(job.error)
+            if job.summary:
+                result.setdefault("summaries", []).append({"group": job.name, "table": job.summary})
+
+        result["criteria"].sort(key=lambda criterion: criterion["index"])
+    except Exception as error:
+        # One broken document must not stop the whole sweep
+        result["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        if session is not None:
+            try:
+                client.beta.vector_stores.delete(vector_store_id=session.vector_store_id)
+            except Exception:
+                pass  # Expires on its own after one day
+            if "file_id" in result:
+                # The store is gone, a later review of the same content must not skip the indexing
+                forget_vector_store(result["file_id"], session.vector_store_id)
+
+    usage = session.usage if session is not None else Usage()
+    result["usage"] = {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+    result["duration_seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Review the documents of a manifest without the Streamlit UI.")
+    parser.add_argument("manifest", help="CSV or JSONL file with the columns/keys 'path' and 'km_id'")
+    parser.add_argument("--output", default="review_results.jsonl", help="JSONL file for the results")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DOCUMENT_WORKERS,
+                        help="documents reviewed at the same time")
+    parser.add_argument("--criteria-workers", type=int, default=MAX_PARALLEL_CRITERIA,
+                        help="criteria checked at the same time per document")
+    parser.add_argument("--groups", default="1,2,3", help="review groups (the app's buttons) to run, e.g. '1,3'")
+    parser.add_argument("--fused", action="store_true", help="check all criteria of a group in a single run")
+    args = parser.parse_args(argv)
+
+    load_dotenv(dotenv_path='.env')
+    client = create_client()
+    dm_plan = DMPlanTable()
+    entries = read_manifest(args.manifest)
+    group_indices = [int(group) - 1 for group in args.groups.split(",")]
+
+    failed = 0
+    with open(args.output, "w", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(review_document, client, entry, group_indices, args.criteria_workers, args.fused, dm_plan)
+            for entry in entries
+        ]
+        # Results are written by this thread only, as soon as a document is done
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            failed += "error" in result
+            status = f"error: {result['error']}" if "error" in result else "done"
+            print(f"[{done}/{len(entries)}] {result['path']}: {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Offline end-to-end benchmark of the review flows and the chat against the mock backend.
+
+Usage:
+    python benchmark.py --repeat 3 --run-latency 0.5 --json benchmark.json
+
+Every review group (the app's buttons) is reviewed in the separate mode and in the
+combined mode, followed by a short chat. Wall time, API calls, runs and tokens are
+reported per flow, so performance regressions show up without a network.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+# The benchmark must never read or fill the caches and the telemetry of the real apps,
+# so the SQLite files go to a scratch directory before the modules read their paths
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="review_benchmark_")
+for _variable, _file_name in (
+    ("UPLOAD_CACHE_PATH", "upload_cache.sqlite3"),
+    ("VERDICT_CACHE_PATH", "verdict_cache.sqlite3"),
+    ("METRICS_PATH", "run_metrics.sqlite3"),
+):
+    os.environ[_variable] = os.path.join(_SCRATCH_DIR, _file_name)
+
+from batch_review import review_document  # noqa: E402
+from criteria import review_groups  # noqa: E402
+from ingestion import wait_for_file_batch  # noqa: E402
+from local_retrieval import answer_question, build_index  # noqa: E402
+from mock_openai import MockAzureOpenAI, MockConfig  # noqa: E402
+from run_engine import execute_run, fetch_run_messages  # noqa: E402
+from thread_manager import CHAT_TRUNCATION_STRATEGY, create_thread, retire_thread  # noqa: E402
+
+BENCHMARK_DOCUMENT = "QS-Plan_probe.docx"
+BENCHMARK_KM_ID = "SUP1_001"
+
+CHAT_PROMPTS = [
+    "Welche Version hat das Review-Dokument?",
+    "Wer ist als Freigeber eingetragen?",
+    "Gibt es Abweichungen zum DM-Plan?",
+    "Fasse die Änderungshistorie zusammen.",
+]
+
+
+def _usage_totals(runs):
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for run in runs:
+        if run.usage:
+            usage["prompt_tokens"] += run.usage.prompt_tokens
+            usage["completion_tokens"] += run.usage.completion_tokens
+            usage["total_tokens"] += run.usage.total_tokens
+    return usage
+
+
+def measure(client, action):
+    """Run action() and return its wall time, the API calls it made and the token usage it returned."""
+    calls_before = client.calls.copy()
+    started = time.monotonic()
+    usage = action()
+    seconds = time.monotonic() - started
+    calls = client.calls - calls_before
+    return {
+        "seconds": seconds,
+        "api_calls": sum(calls.values()),
+        "runs": calls["beta.threads.runs.create"] + calls["beta.threads.runs.stream"],
+        "calls": dict(calls),
+        **usage,
+    }
+
+
+def review_flow(client, document_path, group_index, fused):
+    """One click on a review button, as the batch review runs it."""
+    result = review_document(client, {"path": document_path, "km_id": BENCHMARK_KM_ID}, [group_index], fused=fused)
+    if "error" in result:
+        raise RuntimeError(f"review group {group_index + 1} failed: {result['error']}")
+    return result["usage"]
+
+
+def chat_flow(client, document_path, prompts=CHAT_PROMPTS):
+    """A chat session about the review document on a thread with the vector store attached."""
+    with open(document_path, "rb") as document:
+        file = client.files.create(file=(BENCHMARK_DOCUMENT, document.read()), purpose="assistants")
+    vector_store = client.beta.vector_stores.create(name="benchmark chat")
+    batch = client.beta.vector_stores.file_batches.create(vector_store_id=vector_store.id, file_ids=[file.id])
+    wait_for_file_batch(client, vector_store.id, batch)
+
+    attached = {}
+    thread_id = create_thread(client, [vector_store.id], attached)
+    cursor = None
+    runs = []
+    try:
+        for prompt in prompts:
+            client.beta.threads.messages.create(thread_id=thread_id, role="user", content=prompt)
+            run = execute_run(
+                client, thread_id, review_groups[2]["assistant_id"], on_text=lambda text: None,
+                metrics={"criterion": "Chat"}, truncation_strategy=CHAT_TRUNCATION_STRATEGY
+            )
+            _, cursor = fetch_run_messages(client, thread_id, run.id, after=cursor)
+            runs.append(run)
+    finally:
+        retire_thread(client, thread_id, attached)
+        client.beta.vector_stores.delete(vector_store_id=vector_store.id)
+        client.files.delete(file_id=file.id)
+    return _usage_totals(runs)
+
+
+def local_chat_flow(client, document_path, prompts=CHAT_PROMPTS):
+    """The same chat session answered from the local index through Chat Completions."""
+    with open(document_path, "rb") as document:
+        index = build_index(BENCHMARK_DOCUMENT, document.read())
+    history = []
+    completions = []
+    for prompt in prompts:
+        response, completion = answer_question(client, prompt, [index], history=history, deployment="benchmark")
+        history += [{"role": "user", "content": prompt}, {"role": "assistant", "content": response}]
+        completions.append(completion)
+    return _usage_totals(completions)
+
+
+def write_document(path, paragraphs=600):
+    """A minimal DOCX with a change history and some pages of text."""
+    namespace = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+    def paragraph(text):
+        return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+    def row(*cells):
+        return "<w:tr>" + "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in cells) + "</w:tr>"
+
+    body = [paragraph("QS-Plan Version 1.1")]
+    body.append(f"<w:tbl>{row('Version', 'Datum', 'Änderung')}{row('1.0', '01.01.2024', 'Erstellt')}"
+                f"{row('1.1', '01.02.2024', 'Freigabe')}</w:tbl>")
+    body += [
+        paragraph(f"Abschnitt {number}: Der Freigeber prüft die Unterlagenklasse, den Status und die Baseline "
+                  f"des Dokuments gemäß DM-Plan, Kapitel {number % 12}.")
+        for number in range(paragraphs)
+    ]
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", f"<w:document {namespace}><w:body>{''.join(body)}</w:body></w:document>")
+
+
+def run_benchmark(config, repeat=1):
+    """Run every flow repeat times on one mock backend and return one summary row per flow."""
+    client = MockAzureOpenAI(config)
+    document_path = os.path.join(_SCRATCH_DIR, BENCHMARK_DOCUMENT)
+    write_document(document_path)
+
+    flows = []
+    for group_index, review_group in enumerate(review_groups):
+        for fused in (False, True):
+            mode = "kombiniert" if fused else "einzeln"
+            flows.append((
+                f"Prüfung {group_index + 1} ({mode})",
+                lambda group_index=group_index, fused=fused: review_flow(client, document_path, group_index, fused)
+            ))
+    flows.append(("Chat", lambda: chat_flow(client, document_path)))
+    flows.append(("Chat (lokale Suche)", lambda: local_chat_flow(client, document_path)))
+
+    rows = []
+    for name, action in flows:
+        samples = [measure(client, action) for _ in range(repeat)]
+        # The median hides the first upload of the document, which later reviews find in the upload cache
+        row = dict(samples[-1])
+        row["flow"] = name
+        row["seconds"] = statistics.median(sample["seconds"] for sample in samples)
+        rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    """Readable table of the benchmark results."""
+    header = f"{'Ablauf':<26}{'Dauer (s)':>10}{'API-Aufrufe':>13}{'Runs':>6}{'Input-Token':>13}{'Token gesamt':>14}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['flow']:<26}{row['seconds']:>10.2f}{row['api_calls']:>13}{row['runs']:>6}"
+            f"{row['prompt_tokens']:>13}{row['total_tokens']:>14}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Benchmark the review flows and the chat against the offline mock backend.")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per flow, the median wall time is reported")
+    parser.add_argument("--request-latency", type=float, default=defaults.request_latency,
+                        help="seconds every API call takes")
+    parser.add_argument("--run-latency", type=float, default=defaults.run_latency,
+                        help="seconds an assistant run is in progress")
+    parser.add_argument("--ingestion-latency", type=float, default=defaults.ingestion_latency,
+                        help="seconds until a file batch is indexed")
+    parser.add_argument("--retrieval-tokens", type=int, default=defaults.retrieval_tokens,
+                        help="input tokens file_search adds to every run")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        request_latency=args.request_latency,
+        run_latency=args.run_latency,
+        ingestion_latency=args.ingestion_latency,
+        retrieval_tokens=args.retrieval_tokens,
+    )
+    rows = run_benchmark(config, repeat=args.repeat)
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(rows, output, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
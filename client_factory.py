@@ -0,0 +1,65 @@
+# Construction of the Azure OpenAI client, without any Streamlit dependency
+import importlib.util
+import os
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+from gateway import AsyncGateway, Gateway, shared_rate_limiter
+
+# Connection pool of the process: parallel criteria of several reviews plus the chat sessions
+MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY_SECONDS = 60
+
+# Connecting should be quick, reading waits for streamed runs and writing for large uploads
+TIMEOUT = httpx.Timeout(connect=5.0, read=120.0, write=120.0, pool=30.0)
+
+# HTTP/2 multiplexes the parallel requests over few connections, it needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _connection_limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _client_settings():
+    return {
+        "api_key": os.getenv('AZURE_OPENAI_API_KEY'),
+        "api_version": os.getenv('API_VERSION'),
+        "azure_endpoint": os.getenv('AZURE_OPENAI_ENDPOINT'),
+        "timeout": TIMEOUT,
+    }
+
+
+def create_client():
+    """Create an AzureOpenAI client from the environment variables.
+
+    Create it once per process (resources.get_client), so the pooled TLS connections are reused.
+    All calls go through the gateway (shared rate limits, retries), so the SDK's own retries are off.
+    """
+    client = AzureOpenAI(
+        **_client_settings(),
+        max_retries=0,
+        http_client=DefaultHttpxClient(limits=_connection_limits(), timeout=TIMEOUT, http2=HTTP2_AVAILABLE)
+    )
+    return Gateway(client, shared_rate_limiter())
+
+
+
+def create_async_client():
+    """Create an AsyncAzureOpenAI client with the same connection pool settings and gateway.
+
+    The pool belongs to the event loop the client is used in, so create one per loop.
+    The rate limiter is the process-wide one, the async and the synchronous calls share the quotas.
+    """
+    client = AsyncAzureOpenAI(
+        **_client_settings(),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(limits=_connection_limits(), timeout=TIMEOUT, http2=HTTP2_AVAILABLE)
+    )
+    return AsyncGateway(client, shared_rate_limiter())
@@ -0,0 +1,245 @@
+# Review criteria, the assistants that check them and the review groups behind the three review buttons
+import json
+import re
+from dataclasses import dataclass
+
+# Assistants for the review groups (Assistant were already created in Azure OpenAI Service)
+security_bot = "asst_B5yqh4UUKlCKva3I7bvQOd7k"
+
+chat_bot = "asst_EprYp6OVLH3WNcaWZbORPOfr"
+
+vorgaben_bot = "asst_tOMJq7dsqHY5i1a1q7NnvzSu"
+
+# Readable names of the assistants for telemetry and exports
+assistant_names = {security_bot: "security_bot", chat_bot: "chat_bot", vorgaben_bot: "vorgaben_bot"}
+
+# Appended to a single criterion prompt, the answer is one JSON verdict (see VERDICT_RESPONSE_FORMAT)
+VERDICT_INSTRUCTION = (
+    " Antworte nur mit einem JSON-Objekt mit den Feldern criterion (Name des Kriteriums), "
+    "status (\"i.O\", \"n.i.O\" oder \"unklar\"), reasoning (Begründung in höchstens zwei Sätzen) "
+    "und evidence (kurze Fundstelle im Dokument)."
+)
+
+# Define the criteria and their corresponding prompts
+criteria = [
+    {"name": "Geheimhaltungsstufe", "prompt": "Jetzt nur die Geheimhaltungsstufe prüfen."},
+    {"name": "Unterlagenklasse", "prompt": "Jetzt nur die Unterlagenklasse prüfen."},
+    {"name": "Dateiformat", "prompt": "Jetzt nur Dateiformat prüfen."},
+    {"name": "Freigeber", "prompt": "Jetzt nur die Aufgabe zur Überprüfung des Freigebers."},
+    {"name": "Verantwortlichkeit", "prompt": "Jetzt nur die Aufgabe zur Überprüfung der Verantwortlichkeiten."},
+    {"name": "Änderungshistorie Notwendigkeit", "prompt": "Jetzt nur die Aufgabe der Notwendigkeit der Änderungshistorie-Überprüfung gemäß Schritte in der Anleitung durchführen."},
+    {"name": "Änderungshistorie Vollständigkeit", "prompt": "Jetzt nur die Aufgabe der Vollständigkeit der Änderungshistorie-Überprüfung gemäß Schritte in der Anleitung durchführen."},
+    {"name": "Version und Status", "prompt": "Jetzt nur die aktuelle Version und Status des Review-Dokuments prüfen, Version und Status in reasoning angeben."},
+    {"name": "Versionsprüfung", "prompt": "Jetzt nur Prüfung der Version. Anleitung nicht zurückgeben."},
+    {"name": "Statusprüfung", "prompt": "Jetzt Prüfung vom Status."},
+    {"name": "Baseline-Prüfung", "prompt": "Jetzt nur Baseline-Prüfung."},
+    {"name": "Namenskonvention", "prompt": "Jetzt nur die Aufgabe der Namenskonvention-Überprüfung durchführen."}
+]
+
+# Criteria that build on the answer of the one before, they are checked in this order on one thread
+criterion_chains = [
+    [7, 8, 9],  # Version und Status, Versionsprüfung, Statusprüfung
+    [5, 6],  # Änderungshistorie Notwendigkeit, Änderungshistorie Vollständigkeit
+]
+
+# Possible verdict states ("unklar" when the assistant can't decide)
+VERDICT_STATUSES = ("i.O", "n.i.O", "unklar")
+
+# JSON schema for the structured output of a single criterion
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "criterion": {"type": "string"},
+        "status": {"type": "string", "enum": list(VERDICT_STATUSES)},
+        "reasoning": {"type": "string"},
+        "evidence": {"type": "string"},
+    },
+    "required": ["criterion", "status", "reasoning", "evidence"],
+    "additionalProperties": False,
+}
+
+# response_format for runs that check a single criterion
+VERDICT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "verdict", "strict": True, "schema": VERDICT_SCHEMA},
+}
+
+# Appended to the fused prompt, the answer holds the verdicts of all criteria and the summary table
+FUSED_INSTRUCTION = (
+    "Antworte nur mit einem JSON-Objekt mit den Feldern verdicts (Liste mit einem Urteil je Kriterium, "
+    "jeweils mit criterion, status (\"i.O\", \"n.i.O\" oder \"unklar\"), reasoning (höchstens zwei Sätze) "
+    "und evidence (kurze Fundstelle)) und summary_table."
+)
+
+# Structured output of a fused run: all verdicts plus the summary table in one answer
+FUSED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "review",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdicts": {"type": "array", "items": VERDICT_SCHEMA},
+                "summary_table": {"type": "string"},
+            },
+            "required": ["verdicts", "summary_table"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# The review groups behind the buttons: assistant, context prompt (filled with KM ID and document name), criteria and summary prompt.
+# context_step: the context prompt asks for a first step of its own, the criteria build on its answer
+review_groups = [
+    {
+        "name": "Geheimhaltungsstufe, Unterlagenklasse, Dateiformat",
+        "button": "1️⃣ Prüfung Geheimhaltungsstufe, Unterlagenklasse, Dateiformat",
+        "assistant_id": security_bot,
+        "context_prompt": "KM ID: {km_id}; jetzt nur den ersten Schritt durchführen: Review-Dokument: {document} ist schon im Vektorspeicher vorhanden.",
+        "context_step": True,
+        "criteria": [0, 1, 2],
+        "summary_prompt": "jetzt eine zusammenfassungstabelle mit allen fragen und Erklärung und Begründung. In ",
+    },
+    {
+        "name": "Namenskonvention, Status, Änderungshistorie, Baseline, Versionen",
+        "button": "2️⃣ Prüfung Namenskonvention, Status, Änderungshistorie, Baseline, Versionen",
+        "assistant_id": vorgaben_bot,
+        "context_prompt": "KM ID: {km_id}; EcoRair_SUP.8_KM-Plan.pdf und Review-Dokument ({document}) sind schon im Vektorspeicher vorhanden. ",
+        "context_step": False,
+        "criteria": [5, 6, 7, 8, 9, 10, 11],
+        "summary_prompt": "jetzt nur eine zusammenfassungstabelle mit allen fragen und Erklärung und Begründung.",
+    },
+    {
+        "name": "Freigeber, Verantwortlichkeit",
+        "button": "3️⃣ Prüfung Freigeber, Verantwortlichkeit",
+        "assistant_id": chat_bot,
+        "context_prompt": "KM ID: {km_id}; ECORAIR_MAN.3_SEMP.pdf und Review-Dokument ({document}) sind schon im Vektorspeicher vorhanden.",
+        "context_step": False,
+        "criteria": [3, 4],
+        "summary_prompt": None,
+    },
+]
+
+
+@dataclass
+class Verdict:
+    """The parsed answer of the assistant for one criterion."""
+    criterion: str
+    status: str  # One of VERDICT_STATUSES
+    reasoning: str = ""
+    evidence: str = ""
+
+    @property
+    def color(self):
+        """Background color of the criterion tile."""
+        return {"i.O": "green", "n.i.O": "red"}.get(self.status, "lightgray")
+
+    def to_text(self):
+        """Readable form for the chat and the report."""
+        text = f"{self.criterion}: {self.status}"
+        if self.reasoning:
+            text += f" – {self.reasoning}"
+        if self.evidence:
+            text += f" (Fundstelle: {self.evidence})"
+        return text
+
+
+# Fallback for free-text answers: negative verdicts (also the old "n.O") are checked before "i.O"
+_NEGATIVE_PATTERN = re.compile(r"n\.\s?(i\.\s?)?O\b|nicht\s+i\.\s?O\b")
+_POSITIVE_PATTERN = re.compile(r"\bi\.\s?O\b")
+
+
+def criterion_prompt(index):
+    """Prompt for checking a single criterion on its own."""
+    return criteria[index]["prompt"] + VERDICT_INSTRUCTION
+
+
+def fused_prompt(criteria_indices, summary_prompt=None, known_verdicts=()):
+    """Build one prompt that asks for all the criteria (and the summary table) in a single run.
+
+    known_verdicts are the Verdicts of the group's criteria decided without the assistant,
+    the summary table includes them.
+    """
+    lines = ["Prüfe jetzt nacheinander die folgenden Kriterien:"]
+    for number, index in enumerate(criteria_indices, 1):
+        lines.append(f"{number}. {criteria[index]['name']}: {criteria[index]['prompt']}")
+    if summary_prompt:
+        if known_verdicts:
+            results = "; ".join(verdict.to_text() for verdict in known_verdicts)
+            lines.append(f"Bereits geprüft (nicht erneut prüfen, aber in die summary_table aufnehmen): {results}")
+        lines.append(f"summary_table: {summary_prompt}")
+    else:
+        lines.append("summary_table leer lassen.")
+    lines.append(FUSED_INSTRUCTION)
+    return "\n".join(lines)
+
+
+def _load_json(response):
+    """Return the JSON object in the answer (also inside a markdown code block), or None."""
+    text = response.strip()
+    if text.startswith("```"):
+        # Answers in a markdown code block
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _verdict_from_data(criterion, data):
+    status = data.get("status")
+    return Verdict(
+        criterion=criterion,
+        status=status if status in VERDICT_STATUSES else "unklar",
+        reasoning=str(data.get("reasoning", "")),
+        evidence=str(data.get("evidence", "")),
+    )
+
+
+def parse_verdict(criterion, response):
+    """Parse the assistant's answer for a criterion into a Verdict.
+
+    Structured (JSON) answers are read directly. Free-text answers, e.g. from deployments
+    without structured output support, fall back to recognizing i.O / n.i.O in the text.
+    """
+    data = _load_json(response)
+    if data is not None:
+        return _verdict_from_data(criterion, data)
+
+    if _NEGATIVE_PATTERN.search(response):
+        status = "n.i.O"
+    elif _POSITIVE_PATTERN.search(response):
+        status = "i.O"
+    else:
+        status = "unklar"
+    return Verdict(criterion=criterion, status=status, reasoning=response.strip())
+
+
+def failed_verdict(criterion, error):
+    """Verdict of a criterion whose run failed, error is the description of the exception."""
+    return Verdict(criterion=criterion, status="unklar", reasoning=f"Die Prüfung ist fehlgeschlagen: {error}")
+
+
+def parse_fused_review(criteria_indices, response):
+    """Parse the answer of a fused run into {index: Verdict} and the summary table.
+
+    Verdicts are matched to the criteria by name, then by position. Criteria without
+    a verdict in the answer get the status "unklar".
+    """
+    data = _load_json(response) or {}
+    answers = [answer for answer in data.get("verdicts", []) if isinstance(answer, dict)]
+    by_name = {str(answer.get("criterion", "")).strip().lower(): answer for answer in answers}
+    names = {criteria[index]["name"].lower() for index in criteria_indices}
+    # Answers with an unknown criterion name are assigned in order to the criteria without a match
+    unmatched = iter([answer for answer in answers if str(answer.get("criterion", "")).strip().lower() not in names])
+
+    verdicts = {}
+    for index in criteria_indices:
+        name = criteria[index]["name"]
+        answer = by_name.get(name.lower()) or next(unmatched, None)
+        verdicts[index] = _verdict_from_data(name, answer) if answer else Verdict(criterion=name, status="unklar")
+
+    summary_table = str(data.get("summary_table", "")) if data else response
+    return verdicts, summary_table
@@ -0,0 +1,161 @@
+# Parallel execution of independent review criteria
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+from run_engine import execute_run, fetch_run_messages
+
+# Upper bound of criteria that run at the same time (one thread and one run each)
+MAX_PARALLEL_CRITERIA = 4
+
+# Set to False once the deployment rejected a response_format, so later runs don't try again
+_response_format_supported = True
+
+
+def _context_messages(context_prompt, context_answer=None):
+    """The first messages of a criterion thread: the review context and, if known, the answer to its first step."""
+    messages = [{"role": "user", "content": context_prompt}]
+    if context_answer:
+        messages.append({"role": "assistant", "content": context_answer})
+    return messages
+
+
+def run_criteria_chain(client, assistant_id, messages, steps, tool_resources=None, response_format=None, tools=None):
+    """Check criteria that build on each other in order on one thread.
+
+    messages start the thread (e.g. the review context), steps is a list of (prompt,
+    metrics, known_response) tuples. A step with a known response (decided from the
+    document metadata or cached) is added to the thread as answered, the others are run.
+    Yields (response, run) for every step that was run, in order; the thread is deleted
+    at the end.
+    """
+    global _response_format_supported
+    messages = list(messages)
+    run_params = {"tools": tools} if tools else {}
+    thread = None
+    try:
+        for prompt, metrics, known_response in steps:
+            messages.append({"role": "user", "content": prompt})
+            if known_response is not None:
+                messages.append({"role": "assistant", "content": known_response})
+                continue
+
+            if thread is None:
+                # A thread only allows one active run, so every chain gets its own thread,
+                # created with the messages up to the first run
+                thread = client.beta.threads.create(
+                    messages=messages,
+                    **({"tool_resources": tool_resources} if tool_resources else {})
+                )
+            else:
+                for message in messages:
+                    client.beta.threads.messages.create(thread_id=thread.id, **message)
+            messages = []
+
+            run = None
+            if response_format is not None and _response_format_supported:
+                try:
+                    run = execute_run(
+                        client, thread.id, assistant_id, use_streaming=False, metrics=metrics,
+                        response_format=response_format, **run_params
+                    )
+                except openai.BadRequestError:
+                    # Structured outputs are not available for this model / tool combination,
+                    # the prompt asks for JSON anyway and the answer is parsed leniently
+                    _response_format_supported = False
+            if run is None:
+                run = execute_run(client, thread.id, assistant_id, use_streaming=False, metrics=metrics, **run_params)
+
+            run_messages, _ = fetch_run_messages(client, thread.id, run.id)
+            response = ""
+            for message in run_messages:
+                if message.content:
+                    response = message.content[0].text.value  # The last message is the answer
+            yield response, run
+    finally:
+        # The thread is not needed anymore once the answers are read
+        if thread is not None:
+            try:
+                client.beta.threads.delete(thread_id=thread.id)
+            except Exception:
+                pass
+
+
+def run_criterion(client, assistant_id, context_prompt, criterion_prompt, tool_resources=None, response_format=None,
+                  metrics=None, tools=None, context_answer=None):
+    """Check a single criterion on its own thread and return the answer text and the finished run.
+
+    metrics are the telemetry labels of the run, e.g. {"criterion": "Dateiformat"}, tools
+    replace the assistant's tools for the run and context_answer is the answer to the
+    first step the context prompt asks for.
+    """
+    # The thread is seeded with the review context (KM ID, review document) and the criterion prompt
+    [(response, run)] = run_criteria_chain(
+        client, assistant_id, _context_messages(context_prompt, context_answer), [(criterion_prompt, metrics, None)],
+        tool_resources, response_format, tools
+    )
+    return response, run
+
+
+def _check_chain(client, assistant_id, messages, chain, tool_resources, response_format, tools):
+    """Worker: check the chain of (index, prompt, metrics, known_response), return [(index, response, run)]."""
+    indices = [index for index, _, _, known_response in chain if known_response is None]
+    results = []
+    try:
+        steps = [(prompt, metrics, known_response) for _, prompt, metrics, known_response in chain]
+        for response, run in run_criteria_chain(client, assistant_id, messages, steps, tool_resources, response_format, tools):
+            results.append((indices[len(results)], response, run))
+    except Exception as error:
+        # The later criteria of the chain build on the failed one, they fail with it
+        results += [(index, f"{type(error).__name__}: {error}", None) for index in indices[len(results):]]
+    return results
+
+
+def run_criteria_parallel(client, assistant_id, context_prompt, criteria_prompts, tool_resources=None,
+                          response_format=None, criterion_names=None, tools=None, max_workers=MAX_PARALLEL_CRITERIA,
+                          chains=(), known_responses=None, context_answer=None):
+    """Check several criteria at the same time.
+
+    criteria_prompts is a list of (index, prompt) tuples, tool_resources are attached to
+    every criterion thread (e.g. the vector store with the review document) and
+    response_format asks for a structured answer (e.g. VERDICT_RESPONSE_FORMAT).
+    criterion_names maps the indexes to the names used in the run telemetry, tools replace
+    the assistant's tools for the runs.
+    known_responses ({index: answer}) are the criteria answered without a run (from the
+    document metadata or the cache), they are not run again. The criteria of a chain (e.g.
+    criteria.criterion_chains) build on each other and are checked in order on one
+    thread, with the known answers of the chain in between. context_answer is the answer
+    to the first step the context prompt asks for, every thread starts with it. Only
+    independent criteria and chains run in parallel.
+    Yields (index, response, run) in the order the criteria finish, so the caller can
+    update the UI as verdicts arrive. A criterion whose run raised is yielded with run
+    None and the error as response, the other criteria keep running.
+    The worker threads never touch the Streamlit session, the caller merges the results.
+    """
+    criterion_names = criterion_names or {}
+    known_responses = known_responses or {}
+    prompts = dict(criteria_prompts)
+
+    def step(index):
+        metrics = {"criterion": criterion_names.get(index, str(index))}
+        return index, prompts[index], metrics, known_responses.get(index)
+
+    groups = []
+    chained = set()
+    for chain in chains:
+        chain = [index for index in chain if index in prompts]
+        chained.update(chain)
+        if any(index not in known_responses for index in chain):
+            groups.append([step(index) for index in chain])
+    groups += [
+        [step(index)] for index, _ in criteria_prompts if index not in chained and index not in known_responses
+    ]
+
+    messages = _context_messages(context_prompt, context_answer)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_check_chain, client, assistant_id, messages, group, tool_resources, response_format, tools)
+            for group in groups
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
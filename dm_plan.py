@@ -0,0 +1,162 @@
+"""Memory-mapped lookup table of the DM-Plan, indexed by KM ID.
+
+The workbook (DM_PLAN_PATH) is converted once into one numpy file per column in
+DM_PLAN_CACHE_DIR: the KM IDs sorted, every other column in the same row order.
+The files are opened memory-mapped, a lookup is a binary search plus one read per
+column. The table is rebuilt when the workbook's size or modification time changes.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+
+from document_metadata import workbook_rows
+
+DM_PLAN_PATH = os.getenv("DM_PLAN_PATH", "DM-Plan_Tabelle.xlsx")
+DM_PLAN_CACHE_DIR = os.getenv("DM_PLAN_CACHE_DIR", ".dm_plan_cache")
+
+# Header of the key column, e.g. "KM ID", "KM-ID" or "KM_ID"
+_KM_ID_HEADER_PATTERN = re.compile(r"^\s*KM[\s_-]*ID\s*$", re.IGNORECASE)
+
+_MANIFEST = "manifest.json"
+
+
+def _find_table(sheets):
+    """Header and data rows of the first sheet with a KM ID column."""
+    for rows in sheets.values():
+        for position, row in enumerate(rows):
+            if any(_KM_ID_HEADER_PATTERN.match(cell) for cell in row):
+                return row, rows[position + 1:]
+    raise ValueError("Keine Spalte 'KM ID' im DM-Plan gefunden.")
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_atomically(path, write):
+    """Write the file under a temporary name and rename it, so other processes never see it half written."""
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            write(temp_file)
+        os.replace(temp_path, path)
+    except PermissionError:
+        _remove_quietly(temp_path)
+        if not os.path.exists(path):
+            raise
+        # Windows: another process built the same version and has the file mapped, it is complete
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+
+
+def build_table(workbook_path, cache_dir):
+    """Convert the workbook into the column files and the manifest in cache_dir."""
+    with open(workbook_path, "rb") as workbook:
+        header, rows = _find_table(workbook_rows(workbook.read()))
+
+    key_column = next(position for position, cell in enumerate(header) if _KM_ID_HEADER_PATTERN.match(cell))
+    columns = [(position, name) for position, name in enumerate(header) if name and position != key_column]
+    rows = [row + [""] * (len(header) - len(row)) for row in rows if len(row) > key_column and row[key_column]]
+    rows.sort(key=lambda row: row[key_column])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(workbook_path)
+    # New file names per workbook version, other processes may still have the old files mapped
+    version = stat.st_mtime_ns
+    files = {}
+    for position, name in [(key_column, "KM ID"), *columns]:
+        file_name = f"column_{position}_{version}.npy"
+        # Fixed-width strings, so the column can be memory-mapped (object arrays can't)
+        values = np.array([row[position] for row in rows], dtype=str)
+        _write_atomically(os.path.join(cache_dir, file_name), lambda column_file: np.save(column_file, values))
+        files[name] = file_name
+
+    manifest = {
+        "workbook": os.path.abspath(workbook_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "key": files.pop("KM ID"),
+        "columns": files,
+    }
+    # The manifest is written last, a half-built table is never used
+    data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+    _write_atomically(os.path.join(cache_dir, _MANIFEST), lambda manifest_file: manifest_file.write(data))
+
+    for file_name in os.listdir(cache_dir):
+        if file_name.startswith("column_") and not file_name.endswith(f"_{version}.npy"):
+            _remove_quietly(os.path.join(cache_dir, file_name))  # Still mapped (Windows): removed after the next change
+    return manifest
+
+
+class DMPlanTable:
+    """KM ID lookups in the converted DM-Plan, kept in sync with the workbook."""
+
+    def __init__(self, workbook_path=DM_PLAN_PATH, cache_dir=DM_PLAN_CACHE_DIR):
+        self.workbook_path = workbook_path
+        self.cache_dir = cache_dir
+        self._table = None  # (manifest, keys, {column: values}), replaced as a whole
+        self._lock = threading.Lock()
+
+    def _is_current(self, manifest, stat):
+        return (
+            manifest is not None
+            and manifest["workbook"] == os.path.abspath(self.workbook_path)
+            and manifest["size"] == stat.st_size
+            and manifest["mtime_ns"] == stat.st_mtime_ns
+        )
+
+    def _load(self):
+        """Return the mapped table, rebuilt first if the workbook changed. None without a workbook."""
+        try:
+            stat = os.stat(self.workbook_path)
+        except FileNotFoundError:
+            return None
+        table = self._table
+        if table is not None and self._is_current(table[0], stat):
+            return table  # One stat call per lookup, the arrays stay mapped
+
+        with self._lock:
+            try:
+                with open(os.path.join(self.cache_dir, _MANIFEST), encoding="utf-8") as manifest_file:
+                    manifest = json.load(manifest_file)
+            except (FileNotFoundError, ValueError):
+                manifest = None
+            if not self._is_current(manifest, stat):
+                manifest = build_table(self.workbook_path, self.cache_dir)
+
+            keys = np.load(os.path.join(self.cache_dir, manifest["key"]), mmap_mode="r")
+            columns = {
+                name: np.load(os.path.join(self.cache_dir, file_name), mmap_mode="r")
+                for name, file_name in manifest["columns"].items()
+            }
+            self._table = (manifest, keys, columns)
+        return self._table
+
+    def lookup(self, km_id):
+        """The DM-Plan row of the KM ID as {column: value} (empty values left out), None if unknown."""
+        table = self._load() if km_id else None
+        if table is None:
+            return None
+        _, keys, columns = table
+        km_id = km_id.strip()
+        position = int(np.searchsorted(keys, km_id))
+        if position >= len(keys) or keys[position] != km_id:
+            return None
+        return {name: str(column[position]) for name, column in columns.items() if column[position]}
+
+
+def dm_plan_prompt(km_id, row):
+    """Sentence with the DM-Plan requirements for the prompt, "" without a row."""
+    if not row:
+        return ""
+    values = "; ".join(f"{name}: {value}" for name, value in row.items())
+    return f"Vorgaben laut DM-Plan für KM ID {km_id}: {values}."
@@ -0,0 +1,393 @@
+"""Local extraction of document metadata and deterministic answers for the mechanical criteria.
+
+The uploaded bytes are parsed directly: OOXML files (docx, xlsx, pptx) are zip archives with
+the document properties, headers/footers and the body as XML, PDFs carry an Info
+dictionary. Criteria that only compare such facts are answered here in milliseconds,
+answer_locally returns None for everything that needs the assistant.
+"""
+import io
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from xml.etree import ElementTree
+
+from criteria import Verdict
+
+_NAMESPACES = {
+    "w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "op": "http://schemas.openxmlformats.org/officeDocument/2006/custom-properties",
+    "ep": "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+}
+
+# Zip member that identifies the kind of OOXML document
+_OOXML_FORMATS = {"word/document.xml": "docx", "xl/workbook.xml": "xlsx", "ppt/presentation.xml": "pptx"}
+
+_PDF_INFO_PATTERN = re.compile(rb"/(Title|Author|Subject|Keywords|Creator|Producer|CreationDate|ModDate)\s*\(([^)]*)\)")
+
+# "Stand" is followed by a date, not a version, and a date after "Version" etc. isn't one either
+_VERSION_PATTERN = re.compile(
+    r"\b(?:Version|Ausgabe|Rev\.?)\s*[:.]?\s*[vV]?(?!\d{1,2}\.\d{1,2}\.\d{4}\b)(\d+(?:\.\d+)+|\d+)\b", re.IGNORECASE
+)
+_FILE_NAME_VERSION_PATTERN = re.compile(r"(?:^|[_\-\s])[vV](\d+(?:[._]\d+)*)(?=$|[_\-\s.])")
+_STATUS_PATTERN = re.compile(r"\bStatus\s*[:.]?\s*([A-Za-zÄÖÜäöüß][\w\- ]{1,30}?)\s*(?:$|[|;,/\n])", re.IGNORECASE)
+
+# Header cells that mark the change history table of a document
+_HISTORY_HEADER_PATTERN = re.compile(r"änderung|aenderung|change|histor|revision", re.IGNORECASE)
+
+
+@dataclass
+class DocumentMetadata:
+    """Facts about an uploaded document that can be read without the assistant."""
+    file_name: str
+    extension: str  # Lower case without the dot, e.g. "docx"
+    size: int
+    detected_format: str  # Format of the content: docx, xlsx, pptx, pdf, text or unknown
+    properties: dict = field(default_factory=dict)  # Core, extended and custom document properties
+    headers: list = field(default_factory=list)
+    footers: list = field(default_factory=list)
+    change_history: list = field(default_factory=list)  # Rows of the change history table as {column: value}
+
+    def version_sources(self):
+        """The document version as found in each place, {source: version}."""
+        sources = {}
+        match = _FILE_NAME_VERSION_PATTERN.search(os.path.splitext(self.file_name)[0])
+        if match:
+            sources["Dateiname"] = match.group(1).replace("_", ".")
+        for name in ("Version", "Dokumentversion", "version"):
+            if self.properties.get(name):
+                sources["Dokumenteigenschaften"] = str(self.properties[name]).lstrip("vV")
+                break
+        for source, texts in (("Kopfzeile", self.headers), ("Fußzeile", self.footers)):
+            for text in texts:
+                match = _VERSION_PATTERN.search(text)
+                if match:
+                    sources[source] = match.group(1)
+                    break
+        latest = self.latest_history_version()
+        if latest:
+            sources["Änderungshistorie"] = latest
+        return sources
+
+    def status(self):
+        """The document status from the properties or the headers/footers, or None."""
+        for name in ("contentStatus", "Status", "Dokumentstatus"):
+            if self.properties.get(name):
+                return str(self.properties[name]).strip()
+        for text in self.headers + self.footers:
+            match = _STATUS_PATTERN.search(text)
+            if match:
+                return match.group(1).strip()
+        return None
+
+    def history_versions(self):
+        """The versions listed in the change history table, in table order."""
+        return [
+            value.strip().lstrip("vV")
+            for row in self.change_history for column, value in row.items()
+            if re.search(r"version|index|rev", column, re.IGNORECASE) and value.strip()
+        ]
+
+    def latest_history_version(self):
+        """Highest version in the change history table (newest first or last), or None."""
+        versions = [version for version in self.history_versions() if version_key(version) is not None]
+        return max(versions, key=version_key, default=None)
+
+
+def version_key(version):
+    """Comparable form of a version number, "1", "1.0" and "v1.0.0" all give (1,). None if it isn't one."""
+    match = re.fullmatch(r"[vV]?(\d+(?:[._]\d+)*)", str(version).strip())
+    if not match:
+        return None
+    parts = [int(part) for part in re.split(r"[._]", match.group(1))]
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+def _text(element, namespace="w"):
+    return "".join(node.text or "" for node in element.iter(f"{{{_NAMESPACES[namespace]}}}t"))
+
+
+def _paragraphs(element):
+    return [text for text in (_text(paragraph) for paragraph in element.iter(f"{{{_NAMESPACES['w']}}}p")) if text.strip()]
+
+
+def _read_xml(archive, name):
+    try:
+        return ElementTree.fromstring(archive.read(name))
+    except (KeyError, ElementTree.ParseError):
+        return None
+
+
+def _properties(archive):
+    properties = {}
+    core = _read_xml(archive, "docProps/core.xml")
+    if core is not None:
+        for element in core:
+            if element.text and element.text.strip():
+                properties[element.tag.rsplit("}", 1)[-1]] = element.text.strip()
+    app = _read_xml(archive, "docProps/app.xml")
+    if app is not None:
+        for element in app:
+            if element.text and element.text.strip():
+                properties[element.tag.rsplit("}", 1)[-1]] = element.text.strip()
+    custom = _read_xml(archive, "docProps/custom.xml")
+    if custom is not None:
+        for element in custom.iter(f"{{{_NAMESPACES['op']}}}property"):
+            values = [child.text for child in element if child.text]
+            if element.get("name") and values:
+                properties[element.get("name")] = values[0].strip()
+    return properties
+
+
+def _change_history(document):
+    """Rows of the first table whose header row looks like a change history."""
+    for table in document.iter(f"{{{_NAMESPACES['w']}}}tbl"):
+        rows = [
+            [" ".join(_paragraphs(cell)).strip() for cell in row.iter(f"{{{_NAMESPACES['w']}}}tc")]
+            for row in table.iter(f"{{{_NAMESPACES['w']}}}tr")
+        ]
+        if not rows:
+            continue
+        header = rows[0]
+        is_history = any(_HISTORY_HEADER_PATTERN.search(cell) for cell in header) or (
+            any(re.search(r"version", cell, re.IGNORECASE) for cell in header)
+            and any(re.search(r"datum|date", cell, re.IGNORECASE) for cell in header)
+        )
+        if is_history:
+            return [dict(zip(header, row)) for row in rows[1:] if any(cell for cell in row)]
+    return []
+
+
+def _read_ooxml(metadata, archive):
+    names = archive.namelist()
+    metadata.properties = _properties(archive)
+    if metadata.detected_format == "docx":
+        for name in sorted(names):
+            if re.fullmatch(r"word/(header|footer)\d*\.xml", name):
+                part = _read_xml(archive, name)
+                if part is not None:
+                    text = " ".join(_paragraphs(part))
+                    (metadata.headers if "header" in name else metadata.footers).append(text)
+        document = _read_xml(archive, "word/document.xml")
+        if document is not None:
+            metadata.change_history = _change_history(document)
+    elif metadata.detected_format == "xlsx":
+        # Excel keeps the print headers/footers with "&" format codes in every sheet
+        for name in sorted(names):
+            if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", name):
+                sheet = _read_xml(archive, name)
+                if sheet is None:
+                    continue
+                for tag, texts in (("oddHeader", metadata.headers), ("oddFooter", metadata.footers)):
+                    for element in sheet.iter(f"{{{_NAMESPACES['x']}}}{tag}"):
+                        if element.text:
+                            texts.append(re.sub(r"&[A-Z]|&\"[^\"]*\"|&\d+", " ", element.text).strip())
+
+
+def extract_metadata(file_name, data):
+    """Parse the bytes of an uploaded file (DOCX, XLSX, PPTX, PDF or text) into DocumentMetadata."""
+    data = bytes(data)
+    metadata = DocumentMetadata(
+        file_name=file_name,
+        extension=os.path.splitext(file_name)[1].lower().lstrip("."),
+        size=len(data),
+        detected_format="unknown",
+    )
+    if data.startswith(b"%PDF"):
+        metadata.detected_format = "pdf"
+        for key, value in _PDF_INFO_PATTERN.findall(data):
+            metadata.properties.setdefault(key.decode(), value.decode("latin-1").strip())
+    elif data.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                names = set(archive.namelist())
+                metadata.detected_format = next(
+                    (kind for member, kind in _OOXML_FORMATS.items() if member in names), "unknown"
+                )
+                _read_ooxml(metadata, archive)
+        except zipfile.BadZipFile:
+            pass
+    elif b"\x00" not in data[:8192]:
+        # Any 8-bit encoding (UTF-8, cp1252, ...), binary formats have NUL bytes early on
+        metadata.detected_format = "text"
+    return metadata
+
+
+def _pdf_text(data):
+    try:
+        from pypdf import PdfReader  # Optional, PDFs have no text without it
+    except ImportError:
+        return ""
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception:
+        return ""  # Damaged or encrypted PDF, the document gets no local index
+
+
+def document_text(file_name, data):
+    """The plain text of an uploaded file, one paragraph per line ("" if it can't be read)."""
+    data = bytes(data)
+    if data.startswith(b"%PDF"):
+        return _pdf_text(data)
+    if not data.startswith(b"PK\x03\x04"):
+        return data.decode("utf-8", errors="replace")
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        return ""
+    with archive:
+        names = sorted(archive.namelist())
+        if "word/document.xml" in names:
+            document = _read_xml(archive, "word/document.xml")
+            return "\n".join(_paragraphs(document)) if document is not None else ""
+        lines = []
+        if "xl/sharedStrings.xml" in names:
+            strings = _read_xml(archive, "xl/sharedStrings.xml")
+            if strings is not None:
+                lines = [_text(item, "x") for item in strings.iter(f"{{{_NAMESPACES['x']}}}si")]
+        for name in names:
+            if re.fullmatch(r"ppt/slides/slide\d+\.xml", name):
+                slide = _read_xml(archive, name)
+                if slide is not None:
+                    lines.append(_text(slide, "a"))
+        return "\n".join(line for line in lines if line.strip())
+
+
+def _column_number(cell_reference):
+    """Zero-based column of a cell reference like "C12"."""
+    number = 0
+    for letter in re.match(r"[A-Z]+", cell_reference).group():
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number - 1
+
+
+def workbook_rows(data):
+    """The rows of every worksheet of an xlsx file as {sheet part name: [[cell text, ...], ...]}."""
+    sheets = {}
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as archive:
+        names = archive.namelist()
+        shared_strings = []
+        strings = _read_xml(archive, "xl/sharedStrings.xml") if "xl/sharedStrings.xml" in names else None
+        if strings is not None:
+            shared_strings = [_text(item, "x") for item in strings.iter(f"{{{_NAMESPACES['x']}}}si")]
+
+        cell_tag, value_tag = f"{{{_NAMESPACES['x']}}}c", f"{{{_NAMESPACES['x']}}}v"
+        for name in sorted(names, key=lambda name: [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]):
+            if not re.fullmatch(r"xl/worksheets/sheet\d+\.xml", name):
+                continue
+            sheet = _read_xml(archive, name)
+            if sheet is None:
+                continue
+            rows = []
+            for row in sheet.iter(f"{{{_NAMESPACES['x']}}}row"):
+                cells = {}
+                for position, cell in enumerate(row.iter(cell_tag)):
+                    value = cell.find(value_tag)
+                    if cell.get("t") == "s" and value is not None:
+                        text = shared_strings[int(value.text)]
+                    elif cell.get("t") == "inlineStr":
+                        text = _text(cell, "x")
+                    else:
+                        text = value.text if value is not None and value.text else ""
+                    column = _column_number(cell.get("r")) if cell.get("r") else position
+                    cells[column] = text.strip()
+                rows.append([cells.get(column, "") for column in range(max(cells, default=-1) + 1)])
+            sheets[name] = rows
+    return sheets
+
+
+# Formats whose content can't tell them apart (a CSV is a text file)
+_TEXT_EXTENSIONS = {"txt", "csv"}
+
+# Macro-enabled and template variants of the OOXML formats, their content is the base format
+_OOXML_VARIANTS = {
+    "docm": "docx", "dotx": "docx", "dotm": "docx",
+    "xlsm": "xlsx", "xltx": "xlsx", "xltm": "xlsx",
+    "pptm": "pptx", "potx": "pptx", "potm": "pptx",
+}
+
+# Words of the DM-Plan's Dateiformat column: the file extensions they allow
+_FORMAT_EXTENSIONS = {
+    "word": {"docx", "docm", "doc"},
+    "excel": {"xlsx", "xlsm", "xls"},
+    "powerpoint": {"pptx", "pptm", "ppt"},
+    "text": _TEXT_EXTENSIONS,
+    "textdatei": _TEXT_EXTENSIONS,
+    **{extension: {extension} for extension in ("docx", "doc", "xlsx", "xls", "pptx", "ppt", "pdf", "txt", "csv")},
+}
+
+
+def _check_file_format(metadata, expected):
+    actual = metadata.detected_format
+    if actual == "unknown":
+        return None  # Not a format we recognize, the assistant decides
+    extension = _OOXML_VARIANTS.get(metadata.extension, metadata.extension)
+    matches_extension = actual == extension or (actual == "text" and extension in _TEXT_EXTENSIONS)
+    if not matches_extension:
+        return "n.i.O", f"Die Dateiendung .{metadata.extension} passt nicht zum Inhalt ({actual})."
+    wanted = next((value for name, value in (expected or {}).items() if name.strip().lower() == "dateiformat"), None)
+    if not wanted:
+        return None  # The expected format comes from the DM-Plan, the assistant looks it up
+    allowed = set()
+    for word in re.findall(r"[a-zäöü0-9]+", wanted.lower()):
+        allowed |= _FORMAT_EXTENSIONS.get(word, set())
+    if not allowed:
+        return None  # No format we know in the requirement, the assistant interprets it
+    if metadata.extension in allowed:
+        return "i.O", f"Dateiformat .{metadata.extension} entspricht der Vorgabe ({wanted})."
+    return "n.i.O", f"Dateiformat .{metadata.extension} entspricht nicht der Vorgabe ({wanted})."
+
+
+def _check_versions(metadata, expected):
+    versions = metadata.version_sources()
+    if len(versions) < 2:
+        return None
+    keys = {version_key(version) for version in versions.values()}
+    if None in keys:
+        return None  # Not a plain version number everywhere, the assistant compares them
+    found = ", ".join(f"{source}: {version}" for source, version in versions.items())
+    if len(keys) == 1:
+        return "i.O", f"Die Version ist überall gleich ({found})."
+    return "n.i.O", f"Die Versionsangaben widersprechen sich ({found})."
+
+
+def _check_history_completeness(metadata, expected):
+    if not metadata.change_history:
+        return None  # No table found, maybe the history is not a table
+    versions = metadata.version_sources()
+    current = versions.get("Dokumenteigenschaften") or versions.get("Kopfzeile") or versions.get("Fußzeile")
+    if version_key(current) is None:
+        return None
+    history_versions = {version_key(version) for version in metadata.history_versions()}
+    if version_key(current) in history_versions:
+        return "i.O", f"Die aktuelle Version {current} ist in der Änderungshistorie eingetragen."
+    return "n.i.O", f"Die aktuelle Version {current} fehlt in der Änderungshistorie."
+
+
+# Criteria (by name) that can be decided from the metadata alone
+LOCAL_CHECKS = {
+    "Dateiformat": _check_file_format,
+    "Änderungshistorie Vollständigkeit": _check_history_completeness,
+    "Versionsprüfung": _check_versions,
+}
+
+
+def answer_locally(criterion, metadata, expected=None):
+    """Return the Verdict for the criterion if the metadata decides it, otherwise None.
+
+    expected holds the requirements for the document's KM ID (e.g. {"Dateiformat": "docx"}) if known.
+    """
+    check = LOCAL_CHECKS.get(criterion)
+    if check is None or metadata is None:
+        return None
+    result = check(metadata, expected)
+    if result is None:
+        return None
+    status, reasoning = result
+    return Verdict(criterion=criterion, status=status, reasoning=reasoning, evidence="Lokale Auswertung der Datei")
@@ -0,0 +1,438 @@
+# Request gateway: every Azure OpenAI call is rate limited and retried here
+import asyncio
+import functools
+import itertools
+import os
+import random
+import threading
+import time
+
+import openai
+
+# Errors after which the same request may succeed (throttling, dropped connections, timeouts, 5xx)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+MAX_ATTEMPTS = 6
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 30.0
+
+# Azure enforces the per-minute quotas over short windows, so the buckets only allow a 10 second burst
+BURST_SECONDS = 10
+
+# Input tokens charged for a run before its real usage is known (the thread and the file_search results)
+RUN_TOKEN_ESTIMATE = int(os.getenv("AZURE_OPENAI_RUN_TOKEN_ESTIMATE", "3000"))
+
+RUN_CREATE_PATHS = {"beta.threads.runs.create", "beta.threads.runs.stream"}
+
+RUN_STREAM_PATH = "beta.threads.runs.stream"
+
+# Creates that _resume can find again after an attempt that may have reached the service
+RESUMABLE_PATHS = {"beta.threads.runs.create", "beta.threads.messages.create"}
+
+CHAT_COMPLETION_PATH = "chat.completions.create"
+
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None), dict, list, tuple, set)
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills with rate_per_minute."""
+
+    def __init__(self, rate_per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(rate_per_minute * burst_seconds / 60, 1)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, amount=1):
+        """Take amount tokens if they are available and return 0, else the seconds until they are."""
+        amount = min(amount, self.capacity)  # Larger requests would wait forever
+        with self._lock:
+            self._refill()
+            if self._level >= amount:
+                self._level -= amount
+                return 0
+            return (amount - self._level) / self.rate
+
+    def acquire(self, amount=1):
+        """Wait until amount tokens are available and take them."""
+        while wait := self.take(amount):
+            time.sleep(wait)
+
+    async def acquire_async(self, amount=1):
+        """Like acquire, but waits without blocking the event loop."""
+        while wait := self.take(amount):
+            await asyncio.sleep(wait)
+
+    def adjust(self, amount):
+        """Take (or with a negative amount give back) tokens without waiting, the level may go below zero."""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level - amount)
+
+
+class RateLimiter:
+    """Requests and tokens per minute of one deployment, shared by all sessions of the process.
+
+    A limit of None (or 0) is not enforced.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _pause_left(self):
+        with self._lock:
+            return max(self._paused_until - time.monotonic(), 0)
+
+    def acquire(self, tokens=0):
+        """Wait until the request (and its estimated tokens) fits into the quotas."""
+        time.sleep(self._pause_left())
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+    async def acquire_async(self, tokens=0):
+        """Like acquire, but waits without blocking the event loop."""
+        await asyncio.sleep(self._pause_left())
+        if self.requests is not None:
+            await self.requests.acquire_async(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire_async(tokens)
+
+    def settle(self, charged, actual):
+        """Correct the tokens charged for a request once its real usage is known."""
+        if self.tokens is not None:
+            self.tokens.adjust(actual - charged)
+
+    def pause(self, seconds):
+        """Hold back all requests after the service throttled one of them."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_rate_limiter():
+    """The process-wide limiter for the quotas in AZURE_OPENAI_RPM and AZURE_OPENAI_TPM."""
+    return RateLimiter(
+        requests_per_minute=int(os.getenv("AZURE_OPENAI_RPM", "0")),
+        tokens_per_minute=int(os.getenv("AZURE_OPENAI_TPM", "0"))
+    )
+
+
+def estimate_tokens(path, kwargs):
+    """Tokens to charge before a request is sent: an estimate for runs, the prompt size for chat completions."""
+    if path in RUN_CREATE_PATHS:
+        return RUN_TOKEN_ESTIMATE
+    if path == CHAT_COMPLETION_PATH:
+        characters = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+        return characters // 4 + (kwargs.get("max_tokens") or 0)  # About four characters per token
+    return 0
+
+
+def _retry_after(error):
+    """Seconds the service asked to wait (Retry-After headers), or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(response.headers[header]) / scale
+        except (KeyError, ValueError):
+            continue  # Missing, or an HTTP date, which Azure does not send
+    return None
+
+
+def is_idempotent(path):
+    """False for requests that create an object, sending them twice would create it twice."""
+    return path.rsplit(".", 1)[-1] != "create" or path in RESUMABLE_PATHS
+
+
+def _is_resumed_run(run, kwargs, started):
+    return run is not None and run.assistant_id == kwargs["assistant_id"] and run.created_at >= int(started) - 1
+
+
+def _is_resumed_message(message, kwargs, started):
+    return (
+        message is not None and message.role == kwargs["role"] and message.created_at >= int(started) - 1
+        and message.content and message.content[0].text.value == kwargs["content"]
+    )
+
+
+def _is_active_run(run, kwargs):
+    return run is not None and run.assistant_id == kwargs["assistant_id"] and run.status in ("queued", "in_progress")
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: Retry-After if given, else exponential backoff with full jitter."""
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BASE_DELAY_SECONDS)  # Don't let all waiting sessions retry at once
+    return random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+class _Proxy:
+    """Mirrors the attribute tree of the client and sends every method call through the gateway."""
+
+    def __init__(self, gateway, target, path):
+        self._gateway = gateway
+        self._target = target
+        self._path = path
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if path == RUN_STREAM_PATH:
+            # The stream request is only sent when the manager is entered
+            return functools.partial(self._gateway.stream, value)
+        if callable(value):
+            return functools.partial(self._gateway.call, path, value)
+        if isinstance(value, _PLAIN_TYPES):
+            return value
+        return _Proxy(self._gateway, value, path)
+
+
+class Gateway(_Proxy):
+    """Wraps an AzureOpenAI client: rate limiting, retries and idempotent run resumption.
+
+    Use it like the client itself, e.g. gateway.beta.threads.runs.create(...).
+    """
+
+    def __init__(self, client, limiter=None, max_attempts=MAX_ATTEMPTS):
+        super().__init__(self, client, "")
+        self.client = client
+        self.limiter = limiter or RateLimiter()
+        self.max_attempts = max_attempts
+        self._charged = {}  # Run ID -> tokens charged when the run was created
+        self._charged_lock = threading.Lock()
+
+    def call(self, path, method, *args, **kwargs):
+        """Call the client method, waiting for the quotas and retrying transient errors."""
+        tokens = estimate_tokens(path, kwargs)
+        started = time.time()
+        for attempt in itertools.count():
+            self.limiter.acquire(tokens)
+            try:
+                result = method(*args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                time.sleep(self.retry_wait(path, error, attempt, tokens))
+                # Don't create the run or message twice
+                throttled = isinstance(error, openai.RateLimitError)
+                resumed = None if throttled else self._resume(path, kwargs, started)
+                if resumed is not None:
+                    return resumed
+                continue
+            except openai.BadRequestError:
+                # The thread is busy with a run of this assistant (e.g. started by a stream that broke off),
+                # continue with that run instead of failing
+                resumed = self._active_run(kwargs) if path == "beta.threads.runs.create" else None
+                if resumed is None:
+                    raise
+                return resumed
+            self._settle(path, result, tokens)
+            return result
+
+    def stream(self, method, *args, **kwargs):
+        """runs.stream: the manager that sends the stream request through the gateway when it is entered."""
+        return _RunStream(self, functools.partial(method, *args, **kwargs), RUN_TOKEN_ESTIMATE)
+
+    def retry_wait(self, path, error, attempt, tokens=0):
+        """Seconds to wait before sending the request again after a retryable error.
+
+        Raises the error when the attempts are used up, or when the request creates an
+        object and may have reached the service: a dropped connection or a 5xx would
+        create the file, vector store or thread twice, so only throttled creates are
+        sent again. A throttled request used none of the tokens charged for it.
+        """
+        throttled = isinstance(error, openai.RateLimitError)
+        if throttled:
+            self.limiter.settle(tokens, 0)
+        if attempt + 1 >= self.max_attempts or (not throttled and not is_idempotent(path)):
+            raise error
+        delay = retry_delay(error, attempt)
+        if throttled:
+            self.limiter.pause(delay)
+        return delay
+
+    def settle_run(self, run, tokens):
+        """Settle the tokens charged for a run: now if its usage is known, else when it is retrieved."""
+        if run is None:
+            self.limiter.settle(tokens, 0)  # No run was started
+        elif getattr(run, "usage", None):
+            self.limiter.settle(tokens, run.usage.total_tokens)
+        else:
+            with self._charged_lock:
+                self._charged[run.id] = tokens
+
+    def _settle(self, path, result, tokens):
+        """Replace the estimated tokens with the real usage once it is known."""
+        if path == CHAT_COMPLETION_PATH and getattr(result, "usage", None):
+            self.limiter.settle(tokens, result.usage.total_tokens)
+        elif path == "beta.threads.runs.create":
+            self.settle_run(result, tokens)
+        elif path == "beta.threads.runs.retrieve" and getattr(result, "usage", None):
+            with self._charged_lock:
+                charged = self._charged.pop(result.id, None)
+            if charged is not None:
+                self.limiter.settle(charged, result.usage.total_tokens)
+
+    def _latest(self, resource, thread_id):
+        latest = list(resource.list(thread_id=thread_id, order="desc", limit=1))
+        return latest[0] if latest else None
+
+    def _resume(self, path, kwargs, started):
+        """Return the run or message a failed attempt created after all, or None."""
+        threads = self.client.beta.threads
+        try:
+            if path == "beta.threads.runs.create":
+                run = self._latest(threads.runs, kwargs["thread_id"])
+                if _is_resumed_run(run, kwargs, started):
+                    return run
+            elif path == "beta.threads.messages.create":
+                message = self._latest(threads.messages, kwargs["thread_id"])
+                if _is_resumed_message(message, kwargs, started):
+                    return message
+        except (openai.OpenAIError, KeyError):
+            pass  # Can't tell, send the request again
+        return None
+
+    def _active_run(self, kwargs):
+        """Return the unfinished run of the assistant on the thread, or None."""
+        try:
+            run = self._latest(self.client.beta.threads.runs, kwargs["thread_id"])
+        except (openai.OpenAIError, KeyError):
+            return None
+        return run if _is_active_run(run, kwargs) else None
+
+
+class AsyncGateway(Gateway):
+    """Wraps an AsyncAzureOpenAI client like Gateway wraps the synchronous one.
+
+    The methods are awaited as on the client, e.g. await gateway.files.create(...), and
+    wait for the quotas without blocking the event loop. Pass shared_rate_limiter(), so
+    the async and the synchronous clients of a process share the quotas.
+    """
+
+    async def call(self, path, method, *args, **kwargs):
+        """Call the client method, waiting for the quotas and retrying transient errors."""
+        tokens = estimate_tokens(path, kwargs)
+        started = time.time()
+        for attempt in itertools.count():
+            await self.limiter.acquire_async(tokens)
+            try:
+                result = await method(*args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                await asyncio.sleep(self.retry_wait(path, error, attempt, tokens))
+                throttled = isinstance(error, openai.RateLimitError)
+                resumed = None if throttled else await self._resume(path, kwargs, started)
+                if resumed is not None:
+                    return resumed
+                continue
+            except openai.BadRequestError:
+                resumed = await self._active_run(kwargs) if path == "beta.threads.runs.create" else None
+                if resumed is None:
+                    raise
+                return resumed
+            self._settle(path, result, tokens)
+            return result
+
+    def stream(self, method, *args, **kwargs):
+        """runs.stream: the async manager that sends the stream request through the gateway."""
+        return _AsyncRunStream(self, functools.partial(method, *args, **kwargs), RUN_TOKEN_ESTIMATE)
+
+    async def _latest(self, resource, thread_id):
+        page = await resource.list(thread_id=thread_id, order="desc", limit=1)
+        return page.data[0] if page.data else None
+
+    async def _resume(self, path, kwargs, started):
+        threads = self.client.beta.threads
+        try:
+            if path == "beta.threads.runs.create":
+                run = await self._latest(threads.runs, kwargs["thread_id"])
+                if _is_resumed_run(run, kwargs, started):
+                    return run
+            elif path == "beta.threads.messages.create":
+                message = await self._latest(threads.messages, kwargs["thread_id"])
+                if _is_resumed_message(message, kwargs, started):
+                    return message
+        except (openai.OpenAIError, KeyError):
+            pass  # Can't tell, send the request again
+        return None
+
+    async def _active_run(self, kwargs):
+        try:
+            run = await self._latest(self.client.beta.threads.runs, kwargs["thread_id"])
+        except (openai.OpenAIError, KeyError):
+            return None
+        return run if _is_active_run(run, kwargs) else None
+
+
+class _RunStream:
+    """Stands in for the AssistantStreamManager of runs.stream.
+
+    Entering sends the stream request through the gateway: it waits for the quotas and
+    sends it again when the service throttles it. A dropped connection or a 5xx is
+    raised, the run may exist already and the caller resumes it with runs.create. On
+    exit the run's real usage replaces the estimated tokens.
+    """
+
+    def __init__(self, gateway, create_manager, tokens):
+        self._gateway = gateway
+        self._create_manager = create_manager
+        self._tokens = tokens
+        self._manager = None
+        self._stream = None
+
+    def __enter__(self):
+        for attempt in itertools.count():
+            self._gateway.limiter.acquire(self._tokens)
+            try:
+                manager = self._create_manager()  # A manager can only be entered once
+                self._stream = manager.__enter__()
+            except openai.RateLimitError as error:
+                time.sleep(self._gateway.retry_wait(RUN_STREAM_PATH, error, attempt, self._tokens))
+                continue
+            except Exception:
+                self._gateway.settle_run(None, self._tokens)
+                raise
+            self._manager = manager
+            return self._stream
+
+    def __exit__(self, *exc_info):
+        try:
+            return self._manager.__exit__(*exc_info)
+        finally:
+            self._gateway.settle_run(getattr(self._stream, "current_run", None), self._tokens)
+
+
+class _AsyncRunStream(_RunStream):
+    """Stands in for the AsyncAssistantStreamManager of runs.stream, see _RunStream."""
+
+    async def __aenter__(self):
+        for attempt in itertools.count():
+            await self._gateway.limiter.acquire_async(self._tokens)
+            try:
+                manager = self._create_manager()
+                self._stream = await manager.__aenter__()
+            except openai.RateLimitError as error:
+                await asyncio.sleep(self._gateway.retry_wait(RUN_STREAM_PATH, error, attempt, self._tokens))
+                continue
+            except Exception:
+                self._gateway.settle_run(None, self._tokens)
+                raise
+            self._manager = manager
+            return self._stream
+
+    async def __aexit__(self, *exc_info):
+        try:
+            return await self._manager.__aexit__(*exc_info)
+        finally:
+            self._gateway.settle_run(getattr(self._stream, "current_run", None), self._tokens)
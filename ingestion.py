@@ -0,0 +1,39 @@
+# Tracking of vector store ingestion (file batches)
+import time
+
+# Batch states after which the vector store does not process the files anymore
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# Give up waiting for a batch after this many seconds
+INGESTION_TIMEOUT_SECONDS = 300
+
+
+def wait_for_file_batch(client, vector_store_id, batch, on_progress=None,
+                        initial_interval=0.25, max_interval=3.0, backoff=1.5,
+                        timeout=INGESTION_TIMEOUT_SECONDS):
+    """Poll a file batch with backoff until the vector store finished indexing its files.
+
+    on_progress(processed, total) is called after every poll. Returns the last batch
+    object, which is still 'in_progress' if the timeout was reached.
+    """
+    interval = initial_interval
+    deadline = time.monotonic() + timeout
+    while True:
+        if on_progress is not None:
+            counts = batch.file_counts
+            on_progress(counts.completed + counts.failed + counts.cancelled, counts.total)
+
+        if batch.status in BATCH_TERMINAL_STATUSES or time.monotonic() > deadline:
+            return batch
+
+        time.sleep(interval)
+        interval = min(interval * backoff, max_interval)  # Small files are ready fast, large ones cost few requests
+        batch = client.beta.vector_stores.file_batches.retrieve(
+            vector_store_id=vector_store_id,
+            batch_id=batch.id
+        )
+
+
+def batch_succeeded(batch):
+    """Check if all files of the batch were indexed."""
+    return batch.status == "completed" and batch.file_counts.failed == 0 and batch.file_counts.cancelled == 0
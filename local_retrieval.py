@@ -0,0 +1,132 @@
+"""Local chunking and BM25 retrieval for chat questions about the selected documents.
+
+A document is chunked and indexed once, a question then only sends the best matching
+chunks as context to a Chat Completions deployment instead of starting an assistant
+run with file_search. The deployment name comes from AZURE_OPENAI_CHAT_DEPLOYMENT,
+without it the local chat is not available.
+"""
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from document_metadata import document_text
+
+CHAT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
+
+# Chunks of about 200 words that overlap, so an answer spanning a chunk border is still found
+CHUNK_WORDS = 200
+CHUNK_OVERLAP_WORDS = 40
+
+# Chunks sent per question, this bounds the input tokens regardless of the document size
+TOP_K = 5
+
+# Earlier chat messages sent along, for follow-up questions
+CHAT_HISTORY_MESSAGES = 6
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SYSTEM_PROMPT = (
+    "Du bist ein Assistent für formale Dokumenten-Reviews. Beantworte die Frage nur anhand der "
+    "folgenden Auszüge aus den Review-Dokumenten und nenne das Dokument, aus dem die Antwort stammt. "
+    "Wenn die Auszüge die Antwort nicht enthalten, sage das."
+)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [token.lower() for token in _TOKEN_PATTERN.findall(text)]
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Split the text into overlapping chunks of about chunk_words words."""
+    words = text.split()
+    if not words:
+        return []
+    step = chunk_words - overlap_words
+    return [" ".join(words[start:start + chunk_words]) for start in range(0, max(len(words) - overlap_words, 1), step)]
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one document, with numpy postings per term."""
+
+    def __init__(self, chunks, source=""):
+        self.chunks = chunks
+        self.source = source
+        tokenized = [tokenize(chunk) for chunk in chunks]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(chunks) else 1.0
+        # Length normalization of every chunk, computed once instead of per query
+        self._norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average_length, 1.0))
+
+        postings = defaultdict(lambda: ([], []))
+        for chunk_id, tokens in enumerate(tokenized):
+            for term, count in Counter(tokens).items():
+                chunk_ids, counts = postings[term]
+                chunk_ids.append(chunk_id)
+                counts.append(count)
+
+        self._postings = {}
+        for term, (chunk_ids, counts) in postings.items():
+            idf = math.log(1 + (len(chunks) - len(chunk_ids) + 0.5) / (len(chunk_ids) + 0.5))
+            self._postings[term] = (np.array(chunk_ids, dtype=np.int32), np.array(counts, dtype=np.float32), idf)
+
+    def search(self, query, top_k=TOP_K):
+        """Return the best matching chunks as [(score, chunk)], best first."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            chunk_ids, counts, idf = posting
+            scores[chunk_ids] += idf * counts * (BM25_K1 + 1) / (counts + self._norms[chunk_ids])
+        best = np.argsort(-scores)[:top_k]
+        return [(float(scores[chunk_id]), self.chunks[chunk_id]) for chunk_id in best if scores[chunk_id] > 0]
+
+
+def build_index(file_name, data):
+    """Chunk and index an uploaded file, None if it has no readable text."""
+    chunks = chunk_text(document_text(file_name, data))
+    return BM25Index(chunks, source=file_name) if chunks else None
+
+
+def search_documents(indexes, question, top_k=TOP_K):
+    """The top_k chunks over all indexes as [(source, chunk)], best first."""
+    results = [
+        (score, index.source, chunk)
+        for index in indexes if index is not None
+        for score, chunk in index.search(question, top_k)
+    ]
+    results.sort(key=lambda result: result[0], reverse=True)
+    return [(source, chunk) for _, source, chunk in results[:top_k]]
+
+
+def build_messages(question, passages, history=()):
+    """Chat Completions messages with the passages as context and the latest chat history."""
+    context = "\n\n".join(f"[{source}]\n{chunk}" for source, chunk in passages) or "(keine passenden Auszüge)"
+    messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\nAuszüge:\n{context}"}]
+    messages.extend(
+        {"role": message["role"], "content": message["content"]}
+        for message in list(history)[-CHAT_HISTORY_MESSAGES:]
+        if message.get("role") in ("user", "assistant") and message.get("content")
+    )
+    messages.append({"role": "user", "content": question})
+    return messages
+
+
+def answer_question(client, question, indexes, history=(), deployment=CHAT_DEPLOYMENT, top_k=TOP_K):
+    """Answer the question from the best chunks of the indexed documents.
+
+    Returns the answer text and the completion (its usage has the same fields as a run's).
+    """
+    passages = search_documents(indexes, question, top_k)
+    completion = client.chat.completions.create(
+        model=deployment,
+        messages=build_messages(question, passages, history),
+        temperature=0
+    )
+    return completion.choices[0].message.content or "", completion
@@ -0,0 +1,66 @@
+# Chat history with constant-time duplicate checks and incremental rendering
+import hashlib
+
+
+def message_key(message):
+    """Compact fingerprint of a message's role and content."""
+    return hashlib.blake2b(f"{message['role']}\0{message['content']}".encode(), digest_size=16).digest()
+
+
+class MessageLog:
+    """The chat messages ({"role", "content"} dicts) of a session.
+
+    Behaves like the list it replaces (append, iterate, index, slice, clear), but keeps
+    a set of message fingerprints, so checking for a duplicate doesn't scan the history,
+    and remembers how many messages were rendered in the current script run.
+    """
+
+    def __init__(self):
+        self._messages = []
+        self._keys = set()
+        self._first = []  # Positions of the first occurrence of each distinct message, in order
+        self._rendered_run = None
+        self._rendered = 0  # Entries of _first rendered in _rendered_run
+
+    def __contains__(self, message):
+        return message_key(message) in self._keys
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __getitem__(self, position):
+        return self._messages[position]
+
+    def append(self, message):
+        key = message_key(message)
+        if key not in self._keys:
+            self._keys.add(key)
+            self._first.append(len(self._messages))
+        self._messages.append(message)
+
+    def add(self, message):
+        """Append the message unless the same role and content are in the log already. True if appended."""
+        if message in self:
+            return False
+        self.append(message)
+        return True
+
+    def clear(self):
+        self.__init__()
+
+    def take_unrendered(self, run_id):
+        """The distinct messages not rendered yet in the script run run_id, marked as rendered now."""
+        if run_id != self._rendered_run:
+            # A new script run starts with an empty page
+            self._rendered_run = run_id
+            self._rendered = 0
+        positions = self._first[self._rendered:]
+        self._rendered = len(self._first)
+        return [self._messages[position] for position in positions]
+
+    def mark_rendered(self, run_id):
+        """Mark all messages as rendered in the script run, e.g. after an answer was streamed onto the page."""
+        self.take_unrendered(run_id)
@@ -0,0 +1,510 @@
+"""Offline stand-in for the subset of the Azure OpenAI Assistants API used by the apps.
+
+MockAzureOpenAI mirrors the client attributes the review code calls (files, vector
+stores, file batches, threads, messages, runs, assistants, chat completions) and
+keeps everything in memory. Latencies and token usage are configurable with
+MockConfig, every API call is counted in client.calls, so reviews can be
+benchmarked without a network. AsyncMockAzureOpenAI offers the same backend with
+the awaitable methods of AsyncAzureOpenAI.
+"""
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+
+@dataclass
+class MockConfig:
+    """Latencies (seconds) and token usage of the mock backend."""
+    request_latency: float = 0.01  # Every API call
+    queue_latency: float = 0.05  # Run waits before it starts
+    run_latency: float = 0.3  # Run is in progress
+    ingestion_latency: float = 0.2  # File batch is indexed
+    completion_latency: float = 0.1  # Chat completion without file_search
+    characters_per_token: int = 4
+    retrieval_tokens: int = 800  # Extra input tokens of file_search per run
+    model: str = "gpt-4o"
+
+
+def _error(error_class, status_code, message):
+    request = httpx.Request("POST", "https://mock.openai.azure.com")
+    return error_class(message, response=httpx.Response(status_code, request=request), body=None)
+
+
+def _text_content(text):
+    return [SimpleNamespace(type="text", text=SimpleNamespace(value=text, annotations=[]))]
+
+
+def default_answer(prompt):
+    """Answer like the review assistants: JSON verdicts when asked for them, free text otherwise."""
+    if "verdicts" in prompt:
+        names = re.findall(r"^\d+\. ([^:]+):", prompt, flags=re.MULTILINE)
+        return json.dumps({
+            "verdicts": [
+                {"criterion": name, "status": "i.O", "reasoning": "Entspricht dem DM-Plan.", "evidence": "Deckblatt"}
+                for name in names
+            ],
+            "summary_table": "| Kriterium | Ergebnis |\n|---|---|\n" + "\n".join(f"| {name} | i.O |" for name in names),
+        }, ensure_ascii=False)
+    if "criterion" in prompt:
+        return json.dumps(
+            {"criterion": "", "status": "i.O", "reasoning": "Entspricht dem DM-Plan.", "evidence": "Deckblatt"},
+            ensure_ascii=False
+        )
+    return "Das Dokument entspricht den geprüften Vorgaben. " * 5
+
+
+class _Resource:
+    def __init__(self, backend, path):
+        self._backend = backend
+        self._path = path
+
+    def _call(self, name):
+        self._backend.record_call(f"{self._path}.{name}")
+
+
+class _Files(_Resource):
+    def create(self, file, purpose):
+        self._call("create")
+        name, content = file if isinstance(file, tuple) else (getattr(file, "name", "file"), file)
+        data = content.read() if hasattr(content, "read") else bytes(content)
+        return self._backend.add_object("files", "file", filename=name, bytes=len(data), purpose=purpose)
+
+    def retrieve(self, file_id):
+        self._call("retrieve")
+        return self._backend.get_object("files", file_id)
+
+    def delete(self, file_id):
+        self._call("delete")
+        self._backend.delete_object("files", file_id)
+        return SimpleNamespace(id=file_id, deleted=True)
+
+
+class _VectorStoreFiles(_Resource):
+    def retrieve(self, vector_store_id, file_id):
+        self._call("retrieve")
+        store = self._backend.get_object("vector_stores", vector_store_id)
+        if file_id not in store.file_ids:
+            raise _error(openai.NotFoundError, 404, f"No file {file_id} in {vector_store_id}")
+        return SimpleNamespace(id=file_id, vector_store_id=vector_store_id, status="completed")
+
+    def delete(self, vector_store_id, file_id):
+        self._call("delete")
+        store = self._backend.get_object("vector_stores", vector_store_id)
+        store.file_ids.discard(file_id)
+        return SimpleNamespace(id=file_id, deleted=True)
+
+
+class _FileBatches(_Resource):
+    def create(self, vector_store_id, file_ids):
+        self._call("create")
+        store = self._backend.get_object("vector_stores", vector_store_id)
+        for file_id in file_ids:
+            self._backend.get_object("files", file_id)
+        batch = self._backend.add_object(
+            "file_batches", "vsfb", vector_store_id=vector_store_id, file_ids=list(file_ids),
+            ready_at=time.monotonic() + self._backend.config.ingestion_latency
+        )
+        store.file_ids.update(file_ids)
+        return self._backend.batch_state(batch)
+
+    def retrieve(self, vector_store_id, batch_id):
+        self._call("retrieve")
+        return self._backend.batch_state(self._backend.get_object("file_batches", batch_id))
+
+    def create_and_poll(self, vector_store_id, file_ids, poll_interval_ms=None):
+        batch = self.create(vector_store_id=vector_store_id, file_ids=file_ids)
+        while batch.status == "in_progress":
+            time.sleep((poll_interval_ms or 100) / 1000)
+            batch = self.retrieve(vector_store_id=vector_store_id, batch_id=batch.id)
+        return batch
+
+
+class _VectorStores(_Resource):
+    def __init__(self, backend, path):
+        super().__init__(backend, path)
+        self.files = _VectorStoreFiles(backend, f"{path}.files")
+        self.file_batches = _FileBatches(backend, f"{path}.file_batches")
+
+    def list(self, limit=20):
+        self._call("list")
+        return list(self._backend.objects["vector_stores"].values())
+
+    def create(self, name=None, expires_after=None, file_ids=None):
+        self._call("create")
+        return self._backend.add_object("vector_stores", "vs", name=name, file_ids=set(file_ids or []))
+
+    def retrieve(self, vector_store_id):
+        self._call("retrieve")
+        return self._backend.get_object("vector_stores", vector_store_id)
+
+    def delete(self, vector_store_id):
+        self._call("delete")
+        self._backend.delete_object("vector_stores", vector_store_id)
+        return SimpleNamespace(id=vector_store_id, deleted=True)
+
+
+class _Messages(_Resource):
+    def create(self, thread_id, role, content):
+        self._call("create")
+        self._backend.ensure_no_active_run(thread_id)
+        return self._backend.add_message(thread_id, role, content)
+
+    def list(self, thread_id, run_id=None, order="desc", after=None, limit=20):
+        self._call("list")
+        thread = self._backend.get_object("threads", thread_id)
+        messages = [message for message in thread.messages if run_id is None or message.run_id == run_id]
+        if order == "desc":
+            messages.reverse()
+        if after is not None:
+            # Like the API: only the messages after the cursor in the requested order
+            ids = [message.id for message in thread.messages]
+            position = ids.index(after) if after in ids else -1
+            messages = [
+                message for message in messages
+                if (ids.index(message.id) > position if order == "asc" else ids.index(message.id) < position)
+            ]
+        return messages[:limit]
+
+
+class _MockStream:
+    """Context manager with the parts of AssistantStreamManager/AssistantEventHandler the run engine uses."""
+
+    def __init__(self, backend, run):
+        self._backend = backend
+        self._run = run
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_deltas(self):
+        run = self._backend.wait_for_run(self._run)
+        answer = self._backend.run_answer(run)
+        for start in range(0, len(answer), 20):
+            yield answer[start:start + 20]
+
+    @property
+    def current_run(self):
+        return self._backend.run_state(self._run)
+
+    def get_final_run(self):
+        return self._backend.run_state(self._backend.wait_for_run(self._run))
+
+
+class _Runs(_Resource):
+    def create(self, thread_id, assistant_id, **params):
+        self._call("create")
+        return self._backend.run_state(self._backend.start_run(thread_id, assistant_id, params))
+
+    def retrieve(self, thread_id, run_id):
+        self._call("retrieve")
+        return self._backend.run_state(self._backend.get_object("runs", run_id))
+
+    def list(self, thread_id, order="desc", limit=20):
+        self._call("list")
+        with self._backend._lock:
+            runs = [run for run in self._backend.objects["runs"].values() if run.thread_id == thread_id]
+        if order == "desc":
+            runs.reverse()
+        return [self._backend.run_state(run) for run in runs[:limit]]
+
+    def cancel(self, thread_id, run_id):
+        self._call("cancel")
+        run = self._backend.get_object("runs", run_id)
+        run.cancelled = True
+        return self._backend.run_state(run)
+
+    def stream(self, thread_id, assistant_id, **params):
+        self._call("stream")
+        return _MockStream(self._backend, self._backend.start_run(thread_id, assistant_id, params))
+
+
+class _Threads(_Resource):
+    def __init__(self, backend, path):
+        super().__init__(backend, path)
+        self.messages = _Messages(backend, f"{path}.messages")
+        self.runs = _Runs(backend, f"{path}.runs")
+
+    def create(self, messages=None, tool_resources=None):
+        self._call("create")
+        thread = self._backend.add_object("threads", "thread", messages=[], tool_resources=tool_resources)
+        for message in messages or []:
+            self._backend.add_message(thread.id, message["role"], message["content"])
+        return thread
+
+    def retrieve(self, thread_id):
+        self._call("retrieve")
+        return self._backend.get_object("threads", thread_id)
+
+    def update(self, thread_id, tool_resources=None):
+        self._call("update")
+        thread = self._backend.get_object("threads", thread_id)
+        thread.tool_resources = tool_resources
+        return thread
+
+    def delete(self, thread_id):
+        self._call("delete")
+        self._backend.delete_object("threads", thread_id)
+        return SimpleNamespace(id=thread_id, deleted=True)
+
+
+class _Assistants(_Resource):
+    def retrieve(self, assistant_id):
+        self._call("retrieve")
+        return self._backend.assistant(assistant_id)
+
+    def update(self, assistant_id, **params):
+        self._call("update")
+        assistant = self._backend.assistant(assistant_id)
+        for name, value in params.items():
+            setattr(assistant, name, value)
+        return assistant
+
+
+class _ChatCompletions(_Resource):
+    def create(self, model, messages, **params):
+        self._call("create")
+        time.sleep(self._backend.config.completion_latency)
+        answer = self._backend.answer(messages[-1]["content"])
+        characters = self._backend.config.characters_per_token
+        prompt_tokens = sum(len(str(message.get("content") or "")) for message in messages) // characters
+        completion_tokens = len(answer) // characters
+        return SimpleNamespace(
+            id=f"chatcmpl_{next(self._backend._ids)}",
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop", message=SimpleNamespace(role="assistant", content=answer))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            ),
+        )
+
+
+class MockAzureOpenAI:
+    """In-memory replacement for AzureOpenAI, see the module docstring."""
+
+    def __init__(self, config=None, answer=default_answer):
+        self.config = config or MockConfig()
+        self.answer = answer  # answer(prompt) -> text of the assistant
+        self.calls = Counter()
+        self.objects = {name: {} for name in ("files", "vector_stores", "file_batches", "threads", "runs", "assistants")}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+        self.files = _Files(self, "files")
+        self.beta = SimpleNamespace(
+            vector_stores=_VectorStores(self, "beta.vector_stores"),
+            threads=_Threads(self, "beta.threads"),
+            assistants=_Assistants(self, "beta.assistants"),
+        )
+        self.chat = SimpleNamespace(completions=_ChatCompletions(self, "chat.completions"))
+
+    # --- Bookkeeping ---
+
+    def record_call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.config.request_latency)
+
+    def add_object(self, kind, prefix, **fields):
+        with self._lock:
+            obj = SimpleNamespace(id=f"{prefix}_{next(self._ids)}", created_at=int(time.time()), **fields)
+            self.objects[kind][obj.id] = obj
+        return obj
+
+    def get_object(self, kind, object_id):
+        with self._lock:
+            obj = self.objects[kind].get(object_id)
+        if obj is None:
+            raise _error(openai.NotFoundError, 404, f"No {kind} with id {object_id}")
+        return obj
+
+    def delete_object(self, kind, object_id):
+        with self._lock:
+            if self.objects[kind].pop(object_id, None) is None:
+                raise _error(openai.NotFoundError, 404, f"No {kind} with id {object_id}")
+
+    def assistant(self, assistant_id):
+        with self._lock:
+            if assistant_id not in self.objects["assistants"]:
+                self.objects["assistants"][assistant_id] = SimpleNamespace(
+                    id=assistant_id, model=self.config.model, tool_resources=None
+                )
+            return self.objects["assistants"][assistant_id]
+
+    def batch_state(self, batch):
+        total = len(batch.file_ids)
+        done = time.monotonic() >= batch.ready_at
+        return SimpleNamespace(
+            id=batch.id,
+            vector_store_id=batch.vector_store_id,
+            status="completed" if done else "in_progress",
+            file_counts=SimpleNamespace(
+                completed=total if done else 0, in_progress=0 if done else total,
+                failed=0, cancelled=0, total=total
+            ),
+        )
+
+    # --- Threads and runs ---
+
+    def add_message(self, thread_id, role, content, run_id=None):
+        thread = self.get_object("threads", thread_id)
+        with self._lock:
+            message = SimpleNamespace(
+                id=f"msg_{next(self._ids)}", role=role, run_id=run_id,
+                content=_text_content(content), created_at=int(time.time())
+            )
+            thread.messages.append(message)
+        return message
+
+    def ensure_no_active_run(self, thread_id):
+        with self._lock:
+            for run in self.objects["runs"].values():
+                if run.thread_id == thread_id and self.run_state(run).status in ("queued", "in_progress"):
+                    raise _error(openai.BadRequestError, 400, f"Thread {thread_id} already has an active run {run.id}.")
+
+    def start_run(self, thread_id, assistant_id, params):
+        thread = self.get_object("threads", thread_id)
+        self.ensure_no_active_run(thread_id)
+        self.assistant(assistant_id)
+
+        # Input tokens: the (possibly truncated) thread history plus the file_search results
+        history = [message.content[0].text.value for message in thread.messages]
+        truncation = params.get("truncation_strategy")
+        if truncation and truncation.get("type") == "last_messages":
+            history = history[-truncation["last_messages"]:]
+        prompt_tokens = sum(len(text) for text in history) // self.config.characters_per_token
+        prompt_tokens += self.config.retrieval_tokens
+
+        now = time.monotonic()
+        return self.add_object(
+            "runs", "run", thread_id=thread_id, assistant_id=assistant_id, params=params,
+            prompt=history[-1] if history else "", prompt_tokens=prompt_tokens, cancelled=False,
+            started_at_monotonic=now + self.config.queue_latency,
+            completed_at_monotonic=now + self.config.queue_latency + self.config.run_latency,
+            answer=None,
+        )
+
+    def run_answer(self, run):
+        with self._lock:
+            if run.answer is None:
+                run.answer = self.answer(run.prompt)
+                self.add_message(run.thread_id, "assistant", run.answer, run_id=run.id)
+            return run.answer
+
+    def run_state(self, run):
+        now = time.monotonic()
+        if run.cancelled:
+            status = "cancelled"
+        elif now < run.started_at_monotonic:
+            status = "queued"
+        elif now < run.completed_at_monotonic:
+            status = "in_progress"
+        else:
+            status = "completed"
+
+        usage = None
+        if status == "completed":
+            completion_tokens = len(self.run_answer(run)) // self.config.characters_per_token
+            usage = SimpleNamespace(
+                prompt_tokens=run.prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=run.prompt_tokens + completion_tokens,
+            )
+        queue_seconds = round(self.config.queue_latency)
+        return SimpleNamespace(
+            id=run.id, thread_id=run.thread_id, assistant_id=run.assistant_id, status=status, usage=usage,
+            created_at=run.created_at,
+            started_at=run.created_at + queue_seconds if status != "queued" else None,
+        )
+
+    def wait_for_run(self, run):
+        remaining = run.completed_at_monotonic - time.monotonic()
+        if remaining > 0 and not run.cancelled:
+            time.sleep(remaining)
+        return run
+
+
+class _AsyncPage:
+    """The AsyncPaginator of a list call: awaited it is the first page, iterated it yields the items."""
+
+    def __init__(self, method, args, kwargs):
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+
+    async def _page(self):
+        return SimpleNamespace(data=await asyncio.to_thread(self._method, *self._args, **self._kwargs))
+
+    def __await__(self):
+        return self._page().__await__()
+
+    async def __aiter__(self):
+        for item in (await self._page()).data:
+            yield item
+
+
+class _AsyncMockStream:
+    """The AsyncAssistantStreamManager and AsyncAssistantEventHandler of a _MockStream."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    def current_run(self):
+        return self._stream.current_run
+
+    @property
+    async def text_deltas(self):
+        for text in await asyncio.to_thread(list, self._stream.text_deltas):
+            yield text
+
+    async def get_final_run(self):
+        return await asyncio.to_thread(self._stream.get_final_run)
+
+
+class _AsyncResource:
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if isinstance(value, (_Resource, SimpleNamespace)):
+            return _AsyncResource(value)
+        if not callable(value):
+            return value
+        if name == "list":
+            return lambda *args, **kwargs: _AsyncPage(value, args, kwargs)
+        if name == "stream":
+            return lambda *args, **kwargs: _AsyncMockStream(value(*args, **kwargs))
+
+        async def method(*args, **kwargs):
+            # The backend sleeps for the latencies, in a worker thread the event loop keeps running
+            return await asyncio.to_thread(value, *args, **kwargs)
+        return method
+
+
+class AsyncMockAzureOpenAI(_AsyncResource):
+    """In-memory replacement for AsyncAzureOpenAI on a MockAzureOpenAI backend (calls and objects are shared)."""
+
+    def __init__(self, config=None, answer=default_answer, backend=None):
+        super().__init__(backend or MockAzureOpenAI(config, answer))
+        self.backend = self._target
@@ -0,0 +1,117 @@
+"""Downloadable report of a review session, serialized only when it is requested.
+
+The chat messages are appended to a text buffer as they arrive and the verdicts are
+kept per document and criterion, so nothing is rebuilt from the whole history. A
+format is serialized on request and kept until the report changes again, a rerun
+without new results costs nothing.
+"""
+import csv
+import io
+import json
+
+# Label in the format selection: (file extension, MIME type)
+REPORT_FORMATS = {
+    "Text": ("txt", "text/plain"),
+    "Markdown": ("md", "text/markdown"),
+    "JSON": ("json", "application/json"),
+    "CSV": ("csv", "text/csv"),
+}
+
+VERDICT_COLUMNS = ("Dokument", "KM ID", "Kriterium", "Status", "Begründung", "Fundstelle")
+
+_MESSAGE_SEPARATOR = b"\n\n"
+
+
+def _markdown_cell(value):
+    return str(value).replace("|", "\\|").replace("\r", "").replace("\n", "<br>")
+
+
+class ReportBuilder:
+    """The results of a session (chat messages and verdicts) for the download."""
+
+    def __init__(self):
+        self._text = io.BytesIO()  # The messages as UTF-8 text, appended one by one
+        self._messages = []
+        self._verdicts = {}  # (document, KM ID, criterion): row, a new verdict replaces the old one
+        self._version = 0
+        self._built = {}  # Format: (version, data)
+
+    @property
+    def empty(self):
+        return not self._messages and not self._verdicts
+
+    def clear(self):
+        self.__init__()
+
+    def add_message(self, message):
+        if self._messages:
+            self._text.write(_MESSAGE_SEPARATOR)
+        self._text.write(message["content"].encode())
+        self._messages.append({"role": message["role"], "content": message["content"]})
+        self._version += 1
+
+    def sync_messages(self, messages):
+        """Append the messages added to the chat history since the last call."""
+        if len(messages) < len(self._messages):
+            # The chat was cleared, start the text over (the verdicts stay)
+            self._text = io.BytesIO()
+            self._messages = []
+            self._version += 1
+        for message in messages[len(self._messages):]:
+            self.add_message(message)
+
+    def add_verdict(self, verdict, document="", km_id=""):
+        """Add the Verdict of a criterion, replaces an earlier verdict of the same document and criterion."""
+        self._verdicts[(document, km_id, verdict.criterion)] = {
+            "Dokument": document,
+            "KM ID": km_id,
+            "Kriterium": verdict.criterion,
+            "Status": verdict.status,
+            "Begründung": verdict.reasoning,
+            "Fundstelle": verdict.evidence,
+        }
+        self._version += 1
+
+    def is_built(self, report_format):
+        """True if the format was serialized since the last change."""
+        built = self._built.get(report_format)
+        return built is not None and built[0] == self._version
+
+    def build(self, report_format):
+        """The report in the format (a key of REPORT_FORMATS) as bytes, serialized again only after a change."""
+        if not self.is_built(report_format):
+            self._built[report_format] = (self._version, self._serializers[report_format](self))
+        return self._built[report_format][1]
+
+    def _text_report(self):
+        return self._text.getvalue()
+
+    def _markdown_report(self):
+        lines = [
+            "| " + " | ".join(VERDICT_COLUMNS) + " |",
+            "|" + "---|" * len(VERDICT_COLUMNS),
+        ]
+        lines.extend(
+            "| " + " | ".join(_markdown_cell(row[column]) for column in VERDICT_COLUMNS) + " |"
+            for row in self._verdicts.values()
+        )
+        return ("\n".join(lines) + "\n").encode()
+
+    def _json_report(self):
+        report = {"verdicts": list(self._verdicts.values()), "messages": self._messages}
+        return json.dumps(report, ensure_ascii=False, indent=2).encode()
+
+    def _csv_report(self):
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=VERDICT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(self._verdicts.values())
+        # With a byte order mark, so Excel shows the umlauts correctly
+        return output.getvalue().encode("utf-8-sig")
+
+    _serializers = {
+        "Text": _text_report,
+        "Markdown": _markdown_report,
+        "JSON": _json_report,
+        "CSV": _csv_report,
+    }
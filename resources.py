@@ -0,0 +1,72 @@
+# Process-wide Azure OpenAI resources, shared by all Streamlit sessions and reruns
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from client_factory import create_client
+from dm_plan import DMPlanTable
+from local_retrieval import build_index
+from review import ReviewRunner
+from review_jobs import MAX_REVIEW_JOBS
+
+# How long a resolved vector store or assistant is reused before it is looked up again
+RESOURCE_TTL_SECONDS = 60 * 60
+
+
+@st.cache_resource(show_spinner=False)
+def get_client():
+    """Create the AzureOpenAI client once per process."""
+    return create_client()
+
+
+@st.cache_resource(ttl=RESOURCE_TTL_SECONDS, show_spinner=False)
+def get_vector_store(name):
+    """Return the vector store with the given name, create it if it doesn't exist."""
+    client = get_client()
+
+    # Iterating the list result walks through all pages, not only the first one
+    for store in client.beta.vector_stores.list(limit=100):
+        if store.name == name:
+            return store
+
+    return client.beta.vector_stores.create(name=name)
+
+
+@st.cache_resource(ttl=RESOURCE_TTL_SECONDS, show_spinner=False)
+def get_assistant(assistant_id):
+    """Retrieve the assistant object (model, instructions, tool resources)."""
+    return get_client().beta.assistants.retrieve(assistant_id=assistant_id)
+
+
+@st.cache_resource(show_spinner=False)
+def get_review_executor():
+    """Worker pool of the background reviews, it outlives reruns and is shared by all sessions."""
+    return ThreadPoolExecutor(max_workers=MAX_REVIEW_JOBS, thread_name_prefix="review")
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_document_index(file_hash, file_name, _data):
+    """Chunk and index the document once per content, shared by all sessions (None without readable text)."""
+    return build_index(file_name, _data)
+
+
+@st.cache_resource(show_spinner=False)
+def get_dm_plan():
+    """The memory-mapped DM-Plan table, it rebuilds itself when the workbook changes."""
+    return DMPlanTable()
+
+
+@st.cache_resource(show_spinner=False)
+def get_review_runner():
+    """Review runner on the shared worker pool and DM-Plan, it holds no per-session state."""
+    return ReviewRunner(get_client(), executor=get_review_executor(), dm_plan=get_dm_plan())
+
+
+def invalidate_vector_store():
+    """Forget the resolved vector stores, e.g. after one was deleted outside the app."""
+    get_vector_store.clear()
+
+
+def invalidate_assistant():
+    """Forget the cached assistants, e.g. after one was updated."""
+    get_assistant.clear()
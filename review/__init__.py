@@ -0,0 +1,45 @@
+"""The review pipeline as a library, usable without Streamlit.
+
+    from client_factory import create_client
+    from criteria import review_groups
+    from review import ReviewSession, ReviewRunner
+
+    client = create_client()
+    session = ReviewSession(client, vector_store_id)
+    session.new_thread()
+    file_id, file_hash = session.upload("QS-Plan.docx", data)
+    session.index_file(file_id, file_hash)
+    session.attach_to_thread()
+
+    runner = ReviewRunner(client)
+    job = runner.run(runner.create_job(session, review_groups[0], km_id="SUP1_001", document="QS-Plan.docx"))
+    verdicts = runner.collect(session, job)  # [(criterion index, Verdict)], session.usage holds the tokens
+
+Importing the package only loads this file. The modules behind the names (and the
+openai package) are imported on first access, and nothing talks to the network
+before a method is called, so worker processes can import it freely.
+"""
+import importlib
+
+# Public name: module that defines it
+_EXPORTS = {
+    "ReviewSession": "review.session",
+    "Usage": "review.session",
+    "calculate_cost": "review.session",
+    "ReviewRunner": "review.runner",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Later accesses don't go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,70 @@
+"""Runs the review groups of criteria on the documents of a ReviewSession."""
+from criteria_scheduler import MAX_PARALLEL_CRITERIA
+from dm_plan import DMPlanTable, dm_plan_prompt
+from review_jobs import ReviewJob, run_review_job, submit_review_job
+
+
+class ReviewRunner:
+    """Creates review jobs and runs them in the calling thread or on a worker pool.
+
+    The runner holds no per-user state, one runner can serve all sessions of a process.
+    Batch scripts create one per worker process with their own client.
+    """
+
+    def __init__(self, client, executor=None, dm_plan=None, max_parallel_criteria=MAX_PARALLEL_CRITERIA):
+        self.client = client
+        self.executor = executor  # Worker pool for submit, e.g. resources.get_review_executor()
+        self.dm_plan = dm_plan if dm_plan is not None else DMPlanTable()
+        self.max_parallel_criteria = max_parallel_criteria
+
+    def create_job(self, session, review_group, km_id, document, metadata=None, fused=False,
+                   cache_scope=None, bypass_cache=False, vector_store_ids=None, summary=True):
+        """The ReviewJob of the review group on the session's vector stores.
+
+        The DM-Plan row of the KM ID goes into the prompt, so the assistant doesn't have to
+        look it up with code_interpreter, and decides the mechanical criteria with metadata.
+        vector_store_ids replace the stores attached to the session's thread (sessions
+        without a thread), summary=False leaves out the summary table.
+        """
+        context_prompt = review_group["context_prompt"].format(km_id=km_id, document=document)
+        dm_plan_row = self.dm_plan.lookup(km_id)
+        if dm_plan_row:
+            context_prompt += " " + dm_plan_prompt(km_id, dm_plan_row)
+        return ReviewJob(
+            name=review_group["name"],
+            assistant_id=review_group["assistant_id"],
+            context_prompt=context_prompt,
+            criteria_indices=review_group["criteria"],
+            context_step=review_group["context_step"],
+            summary_prompt=review_group["summary_prompt"] if summary else None,
+            fused=fused,
+            vector_store_ids=session.vector_store_ids if vector_store_ids is None else tuple(vector_store_ids),
+            thread_id=session.thread_id,
+            cache_scope=cache_scope,
+            bypass_cache=bypass_cache,
+            document_metadata=metadata,
+            expected=dm_plan_row,
+            document=document,
+            km_id=km_id,
+            max_parallel_criteria=self.max_parallel_criteria,
+        )
+
+    def submit(self, job):
+        """Queue the job on the worker pool and return at once."""
+        return submit_review_job(self.executor, self.client, job)
+
+    def run(self, job):
+        """Run the job in the calling thread and return it finished."""
+        run_review_job(self.client, job)
+        return job
+
+    @staticmethod
+    def collect(session, job):
+        """Add the token usage of a finished job to the session, once per job.
+
+        Returns the verdicts as [(criterion index, Verdict)] in criteria order.
+        """
+        for run in job.runs():
+            session.usage.add(run)
+        verdicts = job.verdicts()
+        return [(index, verdicts[index]) for index in job.criteria_indices if index in verdicts]
@@ -0,0 +1,155 @@
+"""One review conversation: its thread, the files in its vector store and the token usage."""
+import io
+import uuid
+from dataclasses import dataclass
+
+from ingestion import wait_for_file_batch, batch_succeeded
+from run_engine import execute_run, fetch_run_messages
+from thread_manager import attach_vector_stores, create_thread, retire_thread
+from upload_cache import (
+    content_hash, upload_file, is_in_vector_store, remember_vector_store, hold_vector_store_file,
+    release_vector_store_file, schedule_eviction
+)
+
+# GPT-4o prices per token
+INPUT_TOKEN_PRICE = 2.50 / 1_000_000
+OUTPUT_TOKEN_PRICE = 7.50 / 1_000_000
+
+
+def calculate_cost(prompt_tokens, completion_tokens):
+    """Calculate the cost based on GPT-4o token usage."""
+    return prompt_tokens * INPUT_TOKEN_PRICE + completion_tokens * OUTPUT_TOKEN_PRICE
+
+
+@dataclass
+class Usage:
+    """Token usage and cost, summed over runs and chat completions."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0
+
+    def add(self, result):
+        """Add the usage of a finished run or chat completion (nothing if it has none)."""
+        usage = getattr(result, "usage", None)
+        if not usage:
+            return
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.total_tokens += usage.total_tokens
+        self.cost += calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+
+
+class ReviewSession:
+    """The thread of one user (or one batch document) and the files reviewed on it.
+
+    Creating a session doesn't send any request, the thread is created by new_thread.
+    The state is plain data, the Streamlit apps keep one session per browser session.
+    """
+
+    def __init__(self, client, vector_store_id):
+        self.client = client
+        self.vector_store_id = vector_store_id
+        self.id = uuid.uuid4().hex  # Holder of the files this session reviews in the shared vector store
+        self.thread_id = None
+        self.attached_vector_stores = {}  # Thread ID: attached vector store IDs, unchanged attachments aren't sent again
+        self.message_cursors = {}  # Thread ID: last message ID seen, only newer messages are fetched after a run
+        self.usage = Usage()
+
+    @property
+    def vector_store_ids(self):
+        """The vector stores attached to the current thread."""
+        return self.attached_vector_stores.get(self.thread_id, ())
+
+    def new_thread(self):
+        """Start a fresh thread with the vector store attached and delete the previous one.
+
+        Earlier reviews on the old thread don't count as input tokens anymore.
+        """
+        old_thread_id = self.thread_id
+        self.thread_id = create_thread(self.client, [self.vector_store_id], self.attached_vector_stores)
+        if old_thread_id is not None:
+            retire_thread(self.client, old_thread_id, self.attached_vector_stores, self.message_cursors)
+        return self.thread_id
+
+    def upload(self, file_name, data):
+        """Upload the file (bytes or an in-memory buffer) unless the same content was uploaded before.
+
+        Returns the file ID and the content hash.
+        """
+        buffer = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        file_hash = content_hash(buffer.getbuffer())
+        file_id = upload_file(
+            self.client, file_hash, file_name, buffer.getbuffer().nbytes, lambda: self._upload(file_name, buffer)
+        )
+
+        # Clean up remote files nobody used for a while, in the background
+        schedule_eviction(self.client)
+        return file_id, file_hash
+
+    def _upload(self, file_name, buffer):
+        # The request body is read directly from the buffer, the content is in memory already
+        buffer.seek(0)
+        return self.client.files.create(file=(file_name, buffer), purpose="assistants")
+
+    def is_indexed(self, file_hash):
+        """Check if the content is already indexed in the session's vector store."""
+        return is_in_vector_store(file_hash, self.vector_store_id)
+
+    def index_file(self, file_id, file_hash, on_progress=None):
+        """Add the file to the vector store and wait until it is indexed, return the last batch object.
+
+        Check the batch with ingestion.batch_succeeded, a failed batch is not remembered.
+        openai.NotFoundError means the vector store doesn't exist anymore.
+        """
+        batch = self.client.beta.vector_stores.file_batches.create(
+            vector_store_id=self.vector_store_id,
+            file_ids=[file_id]
+        )
+        batch = wait_for_file_batch(self.client, self.vector_store_id, batch, on_progress=on_progress)
+        if batch_succeeded(batch):
+            remember_vector_store(file_hash, self.vector_store_id)
+        return batch
+
+    def hold_file(self, file_id):
+        """Mark the indexed file as reviewed by this session, remove_file keeps it for the other holders."""
+        hold_vector_store_file(file_id, self.vector_store_id, self.id)
+
+    def remove_file(self, file_id):
+        """Release the file and remove it from the vector store if no other session reviews it.
+
+        The store and the uploaded files are shared, so the file stays indexed while other
+        sessions hold it. The uploaded file itself is always kept.
+        """
+        if release_vector_store_file(file_id, self.vector_store_id, self.id):
+            self.client.beta.vector_stores.files.delete(vector_store_id=self.vector_store_id, file_id=file_id)
+
+    def attach_to_thread(self):
+        """Attach the vector store to the thread (no request if it is attached already)."""
+        attach_vector_stores(self.client, self.thread_id, [self.vector_store_id], self.attached_vector_stores)
+
+    def post(self, text):
+        """Add an assistant message to the thread without a run, e.g. the results of a background review."""
+        self.client.beta.threads.messages.create(thread_id=self.thread_id, role="assistant", content=text)
+
+    def send(self, prompt_text, assistant_id, on_text=None, criterion="Chat", thread_id=None, **run_params):
+        """Send a prompt on the thread, run the assistant and add the run's usage.
+
+        on_text receives the streamed text, criterion labels the run in the telemetry and
+        run_params are passed on to the run. Returns the texts of the new assistant
+        messages (oldest first, the last one is the answer) and the finished run.
+        """
+        thread_id = thread_id or self.thread_id
+        self.client.beta.threads.messages.create(thread_id=thread_id, role="user", content=prompt_text)
+
+        # Run the assistant (streaming, or adaptive polling as fallback) until the run is finished
+        run = execute_run(
+            self.client, thread_id, assistant_id, on_text=on_text, metrics={"criterion": criterion}, **run_params
+        )
+        self.usage.add(run)
+
+        messages, self.message_cursors[thread_id] = fetch_run_messages(
+            self.client, thread_id, run.id, after=self.message_cursors.get(thread_id)
+        )
+        texts = [message.content[0].text.value if message.content else "" for message in messages]
+        return texts, run
@@ -0,0 +1,258 @@
+# Background review jobs: a review runs on a worker pool while the Streamlit script keeps serving the session
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from criteria import (
+    criteria, criterion_chains, criterion_prompt, parse_verdict, failed_verdict, VERDICT_RESPONSE_FORMAT,
+    fused_prompt, parse_fused_review, FUSED_RESPONSE_FORMAT
+)
+from criteria_scheduler import run_criteria_chain, run_criteria_parallel, run_criterion, MAX_PARALLEL_CRITERIA
+from document_metadata import answer_locally
+from thread_manager import file_search_resources, FILE_SEARCH_TOOLS
+from verdict_cache import cache_key, get_cached, put_cached
+
+# Reviews running at the same time in this process (each one checks its criteria in parallel as well)
+MAX_REVIEW_JOBS = 4
+
+JOB_ACTIVE_STATUSES = {"queued", "running"}
+
+
+@dataclass
+class ReviewJob:
+    """A review of one review group that runs in the background.
+
+    The worker fills in the verdicts, runs and summary, the Streamlit script reads them
+    with the snapshot methods on every poll. status is set last, so a finished job
+    already holds all of its results.
+    """
+    name: str
+    assistant_id: str
+    context_prompt: str
+    criteria_indices: list
+    context_step: bool = False  # The context prompt asks for a first step, the criteria threads start with its answer
+    summary_prompt: str = None
+    fused: bool = False
+    vector_store_ids: tuple = ()
+    thread_id: str = None  # Chat thread of the session that started the review, the results are posted there
+    cache_scope: tuple = None  # (document hash, model) for the verdict cache, None to skip the cache
+    bypass_cache: bool = False
+    document_metadata: object = None  # DocumentMetadata of the review document, answers the mechanical criteria
+    expected: dict = None  # DM-Plan row of the KM ID, e.g. the expected Dateiformat
+    document: str = ""  # Name and KM ID of the review document, for the report
+    km_id: str = ""
+    max_parallel_criteria: int = MAX_PARALLEL_CRITERIA  # Criteria checked at the same time in the separate mode
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued, running, done or failed
+    error: str = None
+    summary: str = None
+    context_answer: str = None  # Answer to the first step, run once when the first criterion needs it
+    submitted_at: float = field(default_factory=time.monotonic)
+    finished_at: float = None
+    _verdicts: dict = field(default_factory=dict, repr=False)
+    _runs: list = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def active(self):
+        return self.status in JOB_ACTIVE_STATUSES
+
+    @property
+    def duration(self):
+        """Seconds from the click until the job finished (or until now)."""
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+    def add_verdict(self, index, verdict):
+        with self._lock:
+            self._verdicts[index] = verdict
+
+    def add_run(self, run):
+        with self._lock:
+            self._runs.append(run)
+
+    def verdicts(self):
+        """Copy of the verdicts that arrived so far, {index: Verdict}."""
+        with self._lock:
+            return dict(self._verdicts)
+
+    def runs(self):
+        with self._lock:
+            return list(self._runs)
+
+
+def _cache_key(job, prompt):
+    if job.cache_scope is None:
+        return None
+    document_hash, model = job.cache_scope
+    return cache_key(document_hash, job.assistant_id, prompt, model)
+
+
+def _read_cache(job, key):
+    if key is None or job.bypass_cache:
+        return None
+    return get_cached(key)
+
+
+def _run_tools(job):
+    """With the DM-Plan row in the prompt the runs only need file_search, not the code_interpreter."""
+    return FILE_SEARCH_TOOLS if job.expected else None
+
+
+def _context_answer(client, job, tool_resources):
+    """The answer to the first step the context prompt asks for, or None if it asks for none.
+
+    The step is run on a thread of its own once per job, the criterion threads start with
+    the context prompt and this answer like the conversation in the chat did.
+    """
+    if not job.context_step or job.context_answer is not None:
+        return job.context_answer
+    key = _cache_key(job, job.context_prompt)
+    response = _read_cache(job, key)
+    if response is None:
+        [(response, run)] = run_criteria_chain(
+            client, job.assistant_id, [], [(job.context_prompt, {"criterion": "Start"}, None)],
+            tool_resources, tools=_run_tools(job)
+        )
+        job.add_run(run)
+        if key is not None and run.status == "completed" and response:
+            put_cached(key, response)
+    job.context_answer = response
+    return response
+
+
+def _answer_locally(job):
+    """Add the verdicts the document metadata decides and return the indexes left for the assistant."""
+    remaining = []
+    for index in job.criteria_indices:
+        verdict = answer_locally(criteria[index]["name"], job.document_metadata, job.expected)
+        if verdict is not None:
+            job.add_verdict(index, verdict)
+        else:
+            remaining.append(index)
+    return remaining
+
+
+def _run_separately(client, job, tool_resources):
+    """Check every criterion in its own run, reusing local and cached verdicts.
+
+    Independent criteria run in parallel, the criteria of a chain in order on one thread.
+    """
+    cache_keys = {}
+    known_responses = {}
+    for index in _answer_locally(job):
+        cache_keys[index] = _cache_key(job, f"{job.context_prompt}\n{criterion_prompt(index)}")
+        cached_response = _read_cache(job, cache_keys[index])
+        if cached_response is not None:
+            job.add_verdict(index, parse_verdict(criteria[index]["name"], cached_response))
+            known_responses[index] = cached_response
+    for index, verdict in job.verdicts().items():
+        known_responses.setdefault(index, verdict.to_text())  # Decided from the document metadata
+    if all(index in known_responses for index in job.criteria_indices):
+        return
+
+    for index, response, run in run_criteria_parallel(
+        client,
+        job.assistant_id,
+        job.context_prompt,
+        [(index, criterion_prompt(index)) for index in job.criteria_indices],
+        tool_resources=tool_resources,
+        response_format=VERDICT_RESPONSE_FORMAT,
+        criterion_names={index: criteria[index]["name"] for index in job.criteria_indices},
+        tools=_run_tools(job),
+        max_workers=job.max_parallel_criteria,
+        chains=criterion_chains,
+        known_responses=known_responses,
+        context_answer=_context_answer(client, job, tool_resources)
+    ):
+        if run is None:
+            job.add_verdict(index, failed_verdict(criteria[index]["name"], response))
+            continue
+        job.add_run(run)
+        job.add_verdict(index, parse_verdict(criteria[index]["name"], response))
+        if cache_keys[index] is not None and run.status == "completed":
+            put_cached(cache_keys[index], response)
+
+
+def _run_summary(client, job, tool_resources):
+    """Ask for the summary table on a fresh thread, passing the verdicts of the single runs."""
+    verdicts = job.verdicts()
+    results = "\n".join(verdicts[index].to_text() for index in job.criteria_indices)
+    prompt = f"Ergebnisse der Einzelprüfungen:\n{results}\n\n{job.summary_prompt}"
+    key = _cache_key(job, f"{job.context_prompt}\n{prompt}")
+    response = _read_cache(job, key)
+    if response is None:
+        response, run = run_criterion(
+            client,
+            job.assistant_id,
+            job.context_prompt,
+            prompt,
+            tool_resources=tool_resources,
+            metrics={"criterion": "Zusammenfassung"},
+            tools=_run_tools(job),
+            context_answer=_context_answer(client, job, tool_resources)
+        )
+        job.add_run(run)
+        if key is not None and run.status == "completed" and response:
+            put_cached(key, response)
+    job.summary = response or None
+
+
+def _run_fused(client, job, tool_resources):
+    """Check all criteria the metadata doesn't decide and write the summary table in a single run."""
+    remaining = _answer_locally(job)
+    if not remaining:
+        # Everything was decided locally, the summary table still comes from the assistant
+        if job.summary_prompt:
+            _run_summary(client, job, tool_resources)
+        return
+    verdicts = job.verdicts()
+    known_verdicts = [verdicts[index] for index in job.criteria_indices if index in verdicts]
+    prompt = fused_prompt(remaining, job.summary_prompt, known_verdicts)
+    key = _cache_key(job, f"{job.context_prompt}\n{prompt}")
+    response = _read_cache(job, key)
+    if response is None:
+        response, run = run_criterion(
+            client,
+            job.assistant_id,
+            job.context_prompt,
+            prompt,
+            tool_resources=tool_resources,
+            response_format=FUSED_RESPONSE_FORMAT,
+            metrics={"criterion": "Kombiniert"},
+            tools=_run_tools(job),
+            context_answer=_context_answer(client, job, tool_resources)
+        )
+        job.add_run(run)
+        if key is not None and run.status == "completed":
+            put_cached(key, response)
+    verdicts, summary_table = parse_fused_review(remaining, response)
+    for index in remaining:
+        job.add_verdict(index, verdicts[index])
+    job.summary = summary_table or None
+
+
+def run_review_job(client, job):
+    """Worker: run the review of the job. Never touches the Streamlit session."""
+    job.status = "running"
+    try:
+        tool_resources = file_search_resources(job.vector_store_ids)
+        if job.fused:
+            _run_fused(client, job, tool_resources)
+        else:
+            _run_separately(client, job, tool_resources)
+            if job.summary_prompt:
+                _run_summary(client, job, tool_resources)
+        status = "done"
+    except Exception as error:
+        # The session shows the error, the worker pool stays usable
+        job.error = f"{type(error).__name__}: {error}"
+        status = "failed"
+    job.finished_at = time.monotonic()
+    job.status = status
+
+
+def submit_review_job(executor, client, job):
+    """Queue the job on the worker pool and return at once."""
+    executor.submit(run_review_job, client, job)
+    return job
@@ -0,0 +1,119 @@
+# Run execution helpers for the Azure OpenAI Assistants API
+import time
+
+import httpx
+import openai
+
+from telemetry import record_run
+
+# Run states after which the assistant will not produce any more output
+TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired", "requires_action", "incomplete"}
+
+
+def poll_run(client, thread_id, run, initial_interval=0.25, max_interval=2.0, backoff=1.5, stats=None):
+    """Poll a run with adaptive backoff until it reaches a terminal status.
+
+    stats (optional dict) counts the polls in "poll_count".
+    """
+    interval = initial_interval
+    while run.status not in TERMINAL_STATUSES:
+        time.sleep(interval)
+        interval = min(interval * backoff, max_interval)  # Short runs return fast, long runs cost few requests
+        run = client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run.id
+        )
+        if stats is not None:
+            stats["poll_count"] = stats.get("poll_count", 0) + 1
+    return run
+
+
+def stream_run(client, thread_id, assistant_id, on_text=None, stats=None, **run_params):
+    """Start a run with the streaming API and pass every text delta to on_text as it arrives.
+
+    stats (optional dict) gets the seconds until the first text delta in "time_to_first_token".
+    """
+    started = time.monotonic()
+    with client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        **run_params
+    ) as stream:
+        try:
+            for text in stream.text_deltas:
+                if stats is not None and stats.get("time_to_first_token") is None:
+                    stats["time_to_first_token"] = time.monotonic() - started
+                if on_text is not None:
+                    on_text(text)
+            run = stream.get_final_run()
+        except httpx.TransportError:
+            # The connection broke off while reading (timeout, reset), the run goes on at the service
+            run = stream.current_run
+            if run is None:
+                raise  # The run wasn't created yet
+
+    # The stream can end early (e.g. dropped connection), so finish the run by polling
+    if run.status not in TERMINAL_STATUSES:
+        run = poll_run(client, thread_id, run, stats=stats)
+    return run
+
+
+def execute_run(client, thread_id, assistant_id, on_text=None, use_streaming=True, metrics=None, **run_params):
+    """Run the assistant on the thread and return the finished run object.
+
+    The streaming API is used when available, otherwise the run is created
+    normally and polled with adaptive backoff. If metrics is given (labels such as
+    {"criterion": "Geheimhaltungsstufe"}), latency and token usage of the run are
+    written to the telemetry store.
+    """
+    started = time.monotonic()
+    stats = {"poll_count": 0, "time_to_first_token": None, "streamed": False}
+
+    run = None
+    if use_streaming:
+        try:
+            run = stream_run(client, thread_id, assistant_id, on_text=on_text, stats=stats, **run_params)
+            stats["streamed"] = True
+        except openai.BadRequestError:
+            run = None  # Streaming is not supported by this deployment / API version
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError, httpx.TransportError):
+            # The stream broke off, create the run again (the gateway resumes it if it was started)
+            run = None
+
+    if run is None:
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **run_params
+        )
+        run = poll_run(client, thread_id, run, stats=stats)
+
+    # Our assistants have no function tools, so a run waiting for tool outputs would block
+    # the thread forever. Cancel it to free the thread for the next prompt.
+    if run.status == "requires_action":
+        run = client.beta.threads.runs.cancel(
+            thread_id=thread_id,
+            run_id=run.id
+        )
+        run = poll_run(client, thread_id, run, stats=stats)
+
+    if metrics is not None:
+        stats["run_seconds"] = time.monotonic() - started
+        record_run(run, assistant_id, stats, **metrics)
+    return run
+
+
+def fetch_run_messages(client, thread_id, run_id, after=None, limit=20):
+    """Fetch the assistant messages of a run that are newer than the message ID 'after'.
+
+    Returns the messages (oldest first) and the cursor to pass as 'after' on the
+    next call, so the cost does not grow with the length of the thread.
+    """
+    params = {"thread_id": thread_id, "run_id": run_id, "order": "asc", "limit": limit}
+    if after is not None:
+        params["after"] = after
+    messages = [
+        message for message in client.beta.threads.messages.list(**params) if message.role == "assistant"
+    ]
+    cursor = messages[-1].id if messages else after
+    return messages, cursor
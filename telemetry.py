@@ -0,0 +1,198 @@
+"""Per-run latency and token telemetry.
+
+Every recorded assistant run is stored in a local SQLite database. The records
+can be exported as CSV or in the Prometheus text format:
+
+    python telemetry.py --csv run_metrics.csv
+    python telemetry.py --serve 9100    # serves http://localhost:9100/metrics
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# SQLite database with one row per recorded run
+METRICS_PATH = os.getenv("METRICS_PATH", "run_metrics.sqlite3")
+
+# Upper bounds (seconds) of the run duration histogram
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120)
+
+METRIC_COLUMNS = (
+    "recorded_at", "run_id", "assistant_id", "criterion", "status", "streamed", "queue_seconds",
+    "time_to_first_token", "run_seconds", "poll_count", "prompt_tokens", "completion_tokens",
+)
+
+
+@contextmanager
+def _database():
+    """Open the metrics database, create the table if needed and commit on success."""
+    conn = sqlite3.connect(METRICS_PATH, timeout=30)
+    try:
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS run_metrics (
+                recorded_at REAL,
+                run_id TEXT,
+                assistant_id TEXT,
+                criterion TEXT,
+                status TEXT,
+                streamed INTEGER,
+                queue_seconds REAL,
+                time_to_first_token REAL,
+                run_seconds REAL,
+                poll_count INTEGER,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER
+            )""")
+            yield conn
+    finally:
+        conn.close()
+
+
+def record_run(run, assistant_id, stats, criterion=None):
+    """Store the latency (stats from the run engine) and the token usage of a finished run.
+
+    Best effort: a database that can't be written (locked, full disk, read-only) is logged
+    and the run's result is returned to the caller as usual.
+    """
+    try:
+        _insert_run(run, assistant_id, stats, criterion)
+    except (sqlite3.Error, OSError) as error:
+        logger.warning("Run %s was not recorded: %s", getattr(run, "id", None), error)
+
+
+def _insert_run(run, assistant_id, stats, criterion):
+    # created_at / started_at are unix timestamps of the service, the difference is the queue time
+    started_at = getattr(run, "started_at", None)
+    queue_seconds = started_at - run.created_at if started_at and run.created_at else None
+    usage = getattr(run, "usage", None)
+
+    with _database() as conn:
+        conn.execute(
+            f"INSERT INTO run_metrics VALUES ({', '.join('?' * len(METRIC_COLUMNS))})",
+            (
+                time.time(),
+                run.id,
+                assistant_id,
+                criterion,
+                run.status,
+                int(stats.get("streamed", False)),
+                queue_seconds,
+                stats.get("time_to_first_token"),
+                stats.get("run_seconds"),
+                stats.get("poll_count", 0),
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0,
+            )
+        )
+
+
+def load_records(limit=None):
+    """Return the recorded runs as dicts, newest first."""
+    query = f"SELECT {', '.join(METRIC_COLUMNS)} FROM run_metrics ORDER BY recorded_at DESC"
+    params = ()
+    if limit is not None:
+        query += " LIMIT ?"
+        params = (limit,)
+    with _database() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [dict(zip(METRIC_COLUMNS, row)) for row in rows]
+
+
+def to_csv(records):
+    """Format the records as CSV text."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=METRIC_COLUMNS)
+    writer.writeheader()
+    writer.writerows(records)
+    return output.getvalue()
+
+
+def _labels(**labels):
+    """Format Prometheus labels, escaping backslashes, quotes and line breaks in the values."""
+    escaped = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(records, assistant_names=None):
+    """Format the records in the Prometheus text exposition format.
+
+    assistant_names optionally maps assistant IDs to readable names (e.g. "security_bot").
+    """
+    assistant_names = assistant_names or {}
+    groups = {}
+    for record in records:
+        key = (assistant_names.get(record["assistant_id"], record["assistant_id"]), record["criterion"] or "")
+        groups.setdefault(key, []).append(record)
+
+    lines = [
+        "# HELP review_run_duration_seconds Wall time of assistant runs.",
+        "# TYPE review_run_duration_seconds histogram",
+    ]
+    for (assistant, criterion), group in sorted(groups.items()):
+        durations = [record["run_seconds"] for record in group if record["run_seconds"] is not None]
+        for bucket in LATENCY_BUCKETS:
+            count = sum(duration <= bucket for duration in durations)
+            lines.append(f"review_run_duration_seconds_bucket{_labels(assistant=assistant, criterion=criterion, le=bucket)} {count}")
+        lines.append(f"review_run_duration_seconds_bucket{_labels(assistant=assistant, criterion=criterion, le='+Inf')} {len(durations)}")
+        lines.append(f"review_run_duration_seconds_sum{_labels(assistant=assistant, criterion=criterion)} {sum(durations)}")
+        lines.append(f"review_run_duration_seconds_count{_labels(assistant=assistant, criterion=criterion)} {len(durations)}")
+
+    for metric, column, help_text in (
+        ("review_run_prompt_tokens_total", "prompt_tokens", "Input tokens of assistant runs."),
+        ("review_run_completion_tokens_total", "completion_tokens", "Output tokens of assistant runs."),
+        ("review_run_polls_total", "poll_count", "Status polls of assistant runs."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (assistant, criterion), group in sorted(groups.items()):
+            total = sum(record[column] or 0 for record in group)
+            lines.append(f"{metric}{_labels(assistant=assistant, criterion=criterion)} {total}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, assistant_names=None):
+    """Serve the metrics of all recorded runs on http://localhost:<port>/metrics."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text(load_records(), assistant_names).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("", port), MetricsHandler).serve_forever()
+
+
+def main(argv=None):
+    from criteria import assistant_names
+
+    parser = argparse.ArgumentParser(description="Export the recorded run metrics.")
+    parser.add_argument("--csv", help="write all records to this CSV file")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve the Prometheus metrics on this port")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as output:
+            output.write(to_csv(load_records()))
+    if args.serve:
+        serve(args.serve, assistant_names)
+    if not args.csv and not args.serve:
+        print(prometheus_text(load_records(), assistant_names), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetry  # noqa: E402
+import upload_cache  # noqa: E402
+import verdict_cache  # noqa: E402
+from mock_openai import MockAzureOpenAI, MockConfig, default_answer  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """Mock Azure OpenAI client without latencies, the local databases live in tmp_path.
+
+    client.prompts collects the prompts the runs answered, in order.
+    """
+    monkeypatch.setattr(telemetry, "METRICS_PATH", str(tmp_path / "metrics.sqlite3"))
+    monkeypatch.setattr(upload_cache, "UPLOAD_CACHE_PATH", str(tmp_path / "upload_cache.sqlite3"))
+    monkeypatch.setattr(verdict_cache, "VERDICT_CACHE_PATH", str(tmp_path / "verdict_cache.sqlite3"))
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        return default_answer(prompt)
+
+    client = MockAzureOpenAI(MockConfig(request_latency=0, queue_latency=0, run_latency=0, ingestion_latency=0), answer)
+    client.prompts = prompts
+    return client
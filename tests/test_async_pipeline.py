@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import async_pipeline
+from criteria import criteria, criterion_prompt, parse_verdict, review_groups
+from gateway import AsyncGateway, RateLimiter
+from mock_openai import AsyncMockAzureOpenAI
+
+
+@pytest.fixture
+def async_client(client, monkeypatch):
+    monkeypatch.setattr(async_pipeline, "_response_format_supported", True)
+    return AsyncGateway(AsyncMockAzureOpenAI(backend=client), RateLimiter())
+
+
+def test_criteria_are_checked_concurrently(async_client):
+    group = review_groups[0]
+    prompts = [(index, criterion_prompt(index)) for index in group["criteria"][:3]]
+    results = asyncio.run(async_pipeline.run_criteria_concurrently(
+        async_client, group["assistant_id"], "KM ID: SUP1_001", prompts
+    ))
+    assert [index for index, _, _ in results] == group["criteria"][:3]
+    for index, response, run in results:
+        assert run.status == "completed"
+        assert parse_verdict(criteria[index]["name"], response).status == "i.O"
+
+
+def test_failed_criterion_does_not_stop_the_others(async_client, monkeypatch):
+    original = async_pipeline.run_criterion
+
+    async def run_criterion(client, assistant_id, context_prompt, prompt, *args):
+        if prompt == "kaputt":
+            raise RuntimeError("Run abgebrochen")
+        return await original(client, assistant_id, context_prompt, prompt, *args)
+
+    monkeypatch.setattr(async_pipeline, "run_criterion", run_criterion)
+    results = asyncio.run(async_pipeline.run_criteria_concurrently(
+        async_client, "asst_1", "KM ID: SUP1_001", [(0, "kaputt"), (1, "Prüfe den Dateiformat.")]
+    ))
+    assert results[0] == (0, "RuntimeError: Run abgebrochen", None)
+    assert results[1][2].status == "completed"
@@ -0,0 +1,20 @@
+import pytest
+
+import upload_cache
+from batch_review import review_document
+from criteria import review_groups
+
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_review_document(client, tmp_path, fused):
+    path = tmp_path / "Notiz.txt"
+    path.write_bytes(b"Geheimhaltungsstufe: intern")
+    result = review_document(client, {"path": str(path), "km_id": "SUP1_001"}, [0], fused=fused)
+    assert "error" not in result
+    assert [criterion["index"] for criterion in result["criteria"]] == sorted(review_groups[0]["criteria"])
+    assert result["usage"]["total_tokens"] > 0
+    assert ("summaries" in result) == fused
+    # The document's vector store is deleted again, and forgotten in the upload index
+    assert not client.objects["vector_stores"]
+    with upload_cache._database() as conn:
+        assert not conn.execute("SELECT * FROM vector_store_files").fetchall()
@@ -0,0 +1,71 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from dm_plan import DMPlanTable, dm_plan_prompt
+
+_NAMESPACE = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def xlsx(rows):
+    """Bytes of a minimal XLSX with the rows as inline strings on the first sheet."""
+    sheet_rows = "".join(
+        f'<row r="{number}">' + "".join(
+            f'<c r="{chr(ord("A") + column)}{number}" t="inlineStr"><is><t>{value}</t></is></c>'
+            for column, value in enumerate(row) if value
+        ) + "</row>"
+        for number, row in enumerate(rows, 1)
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/workbook.xml", f"<workbook {_NAMESPACE}/>")
+        archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet {_NAMESPACE}><sheetData>{sheet_rows}</sheetData></worksheet>")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "DM-Plan.xlsx"
+    path.write_bytes(xlsx([
+        ["DM-Plan EcoRair"],
+        ["KM-ID", "Dateiformat", "Geheimhaltungsstufe"],
+        ["SUP1_002", "pdf", "vertraulich"],
+        ["SUP1_001", "docx", ""],
+    ]))
+    return path
+
+
+def test_lookup(workbook, tmp_path):
+    table = DMPlanTable(str(workbook), str(tmp_path / "cache"))
+    assert table.lookup("SUP1_002") == {"Dateiformat": "pdf", "Geheimhaltungsstufe": "vertraulich"}
+    assert table.lookup(" SUP1_001 ") == {"Dateiformat": "docx"}  # Empty values left out
+    assert table.lookup("SUP1_003") is None
+    assert table.lookup("") is None
+
+
+def test_missing_workbook(tmp_path):
+    assert DMPlanTable(str(tmp_path / "missing.xlsx"), str(tmp_path / "cache")).lookup("SUP1_001") is None
+
+
+def test_table_is_rebuilt_when_the_workbook_changes(workbook, tmp_path):
+    cache_dir = tmp_path / "cache"
+    table = DMPlanTable(str(workbook), str(cache_dir))
+    assert table.lookup("SUP1_001") == {"Dateiformat": "docx"}
+    old_files = set(os.listdir(cache_dir))
+
+    workbook.write_bytes(xlsx([["KM ID", "Dateiformat"], ["SUP1_001", "xlsx"]]))
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert table.lookup("SUP1_001") == {"Dateiformat": "xlsx"}
+    assert not old_files & set(os.listdir(cache_dir)) - {"manifest.json"}  # The old columns are removed
+
+    # Another process reuses the converted table without building it again
+    assert DMPlanTable(str(workbook), str(cache_dir)).lookup("SUP1_001") == {"Dateiformat": "xlsx"}
+
+
+def test_prompt():
+    assert dm_plan_prompt("SUP1_001", None) == ""
+    assert dm_plan_prompt("SUP1_001", {"Dateiformat": "docx"}) == "Vorgaben laut DM-Plan für KM ID SUP1_001: Dateiformat: docx."
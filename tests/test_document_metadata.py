@@ -0,0 +1,123 @@
+import io
+import zipfile
+
+import pytest
+
+from document_metadata import answer_locally, extract_metadata, version_key
+
+_NAMESPACE = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _paragraph(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _row(*cells):
+    return "<w:tr>" + "".join(f"<w:tc>{_paragraph(cell)}</w:tc>" for cell in cells) + "</w:tr>"
+
+
+def docx(header=None, history=()):
+    """Bytes of a minimal DOCX with an optional header text and change history rows (version, date)."""
+    body = _paragraph("QS-Plan")
+    if history:
+        body += "<w:tbl>" + _row("Version", "Datum", "Änderung") + "".join(
+            _row(version, date, "Änderung") for version, date in history
+        ) + "</w:tbl>"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", f"<w:document {_NAMESPACE}><w:body>{body}</w:body></w:document>")
+        if header is not None:
+            archive.writestr("word/header1.xml", f"<w:hdr {_NAMESPACE}>{_paragraph(header)}</w:hdr>")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("version, key", [("1", (1,)), ("1.0", (1,)), ("v1.0.0", (1,)), ("1.10", (1, 10)), ("1_2", (1, 2))])
+def test_version_key(version, key):
+    assert version_key(version) == key
+
+
+@pytest.mark.parametrize("version", ["Entwurf", "", None, "1.0a"])
+def test_version_key_without_version_number(version):
+    assert version_key(version) is None
+
+
+def test_versions_equal_as_numbers():
+    metadata = extract_metadata("QS-Plan_v1.docx", docx(header="Version 1.0"))
+    verdict = answer_locally("Versionsprüfung", metadata)
+    assert verdict.status == "i.O"
+
+
+def test_history_newest_first_uses_highest_version():
+    metadata = extract_metadata("QS-Plan.docx", docx(header="Version 1.1", history=[("1.1", "01.02.2024"), ("1.0", "01.01.2024")]))
+    assert metadata.latest_history_version() == "1.1"
+    assert answer_locally("Versionsprüfung", metadata).status == "i.O"
+    assert answer_locally("Änderungshistorie Vollständigkeit", metadata).status == "i.O"
+
+
+def test_contradicting_versions():
+    metadata = extract_metadata("QS-Plan_v2.docx", docx(header="Version 1.1"))
+    assert answer_locally("Versionsprüfung", metadata).status == "n.i.O"
+
+
+def test_missing_history_entry():
+    metadata = extract_metadata("QS-Plan.docx", docx(header="Version 1.2", history=[("1.0", "01.01.2024"), ("1.1", "01.02.2024")]))
+    assert answer_locally("Änderungshistorie Vollständigkeit", metadata).status == "n.i.O"
+
+
+def test_unsure_versions_go_to_the_assistant():
+    metadata = extract_metadata("QS-Plan_v1.docx", docx(header="Version Entwurf"))
+    assert answer_locally("Versionsprüfung", metadata) is None
+    assert answer_locally("Änderungshistorie Vollständigkeit", metadata) is None
+
+
+def test_version_and_status_is_left_to_the_assistant():
+    metadata = extract_metadata("QS-Plan.docx", docx(header="Version 1.0 Status: freigegeben"))
+    assert answer_locally("Version und Status", metadata) is None
+
+
+@pytest.mark.parametrize("header", ["Stand: 12.03.2024", "Version 12.03.2024"])
+def test_date_is_not_a_version(header):
+    metadata = extract_metadata("QS-Plan.docx", docx(header=header))
+    assert "Kopfzeile" not in metadata.version_sources()
+
+
+def test_revision_is_a_version():
+    metadata = extract_metadata("QS-Plan.docx", docx(header="Rev. 1.2 | Stand: 12.03.2024"))
+    assert metadata.version_sources()["Kopfzeile"] == "1.2"
+
+
+def test_cp1252_text_file():
+    metadata = extract_metadata("Notiz.txt", "Prüfung der Änderungshistorie".encode("cp1252"))
+    assert metadata.detected_format == "text"
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "txt"}).status == "i.O"
+
+
+def test_unknown_format_goes_to_the_assistant():
+    metadata = extract_metadata("Daten.bin", b"\x00\x01\x02\x03")
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "bin"}) is None
+
+
+def test_extension_contradicts_content():
+    metadata = extract_metadata("QS-Plan.pdf", docx())
+    assert answer_locally("Dateiformat", metadata).status == "n.i.O"
+
+
+def test_macro_enabled_extension_matches_content():
+    metadata = extract_metadata("Auswertung.docm", docx())
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "Word"}).status == "i.O"
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "docx"}).status == "n.i.O"
+
+
+def test_file_format_from_dm_plan():
+    metadata = extract_metadata("QS-Plan.docx", docx())
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "docx"}).status == "i.O"
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "pdf"}).status == "n.i.O"
+    assert answer_locally("Dateiformat", metadata) is None
+
+
+def test_file_format_names_from_dm_plan():
+    metadata = extract_metadata("QS-Plan.docx", docx())
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "Word"}).status == "i.O"
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "MS-Excel"}).status == "n.i.O"
+    assert answer_locally("Dateiformat", metadata, {"Dateiformat": "Originalformat"}) is None
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import gateway
+from gateway import AsyncGateway, Gateway, RateLimiter
+from mock_openai import AsyncMockAzureOpenAI
+
+REQUEST = httpx.Request("POST", "https://example.openai.azure.com")
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(gateway.time, "sleep", lambda seconds: None)
+
+
+def _fail_first(monkeypatch, obj, name, error):
+    """Let the first call of obj.name raise error, later calls go through."""
+    method = getattr(obj, name)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise error
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, failing)
+    return calls
+
+
+def _rate_limit_error():
+    return openai.RateLimitError("Too many requests", response=httpx.Response(429, request=REQUEST), body=None)
+
+
+def test_create_is_not_sent_twice_after_dropped_connection(client, monkeypatch):
+    calls = _fail_first(monkeypatch, client.files, "create", openai.APIConnectionError(request=REQUEST))
+    with pytest.raises(openai.APIConnectionError):
+        Gateway(client).files.create(file=("a.txt", b"a"), purpose="assistants")
+    assert len(calls) == 1
+
+
+def test_create_is_sent_again_when_throttled(client, monkeypatch):
+    calls = _fail_first(monkeypatch, client.files, "create", _rate_limit_error())
+    Gateway(client).files.create(file=("a.txt", b"a"), purpose="assistants")
+    assert len(calls) == 2
+
+
+def test_streamed_run_is_settled(client):
+    limiter = RateLimiter(tokens_per_minute=600_000)
+    wrapped = Gateway(client, limiter)
+    thread = wrapped.beta.threads.create()
+    wrapped.beta.threads.messages.create(thread_id=thread.id, role="user", content="Hallo")
+    with wrapped.beta.threads.runs.stream(thread_id=thread.id, assistant_id="asst_1") as stream:
+        "".join(stream.text_deltas)
+        run = stream.get_final_run()
+
+    # The estimate was replaced with the usage of the run
+    expected = limiter.tokens.capacity - run.usage.total_tokens
+    assert limiter.tokens._level == pytest.approx(expected, abs=100)
+    assert not wrapped._charged
+
+
+def test_throttled_stream_is_sent_again(client, monkeypatch):
+    calls = _fail_first(monkeypatch, client.beta.threads.runs, "stream", _rate_limit_error())
+    wrapped = Gateway(client)
+    thread = wrapped.beta.threads.create()
+    wrapped.beta.threads.messages.create(thread_id=thread.id, role="user", content="Hallo")
+    with wrapped.beta.threads.runs.stream(thread_id=thread.id, assistant_id="asst_1") as stream:
+        assert stream.get_final_run().status == "completed"
+    assert len(calls) == 2
+
+
+def test_async_create_is_not_sent_twice_after_dropped_connection(client, monkeypatch):
+    calls = _fail_first(monkeypatch, client.files, "create", openai.APIConnectionError(request=REQUEST))
+    wrapped = AsyncGateway(AsyncMockAzureOpenAI(backend=client))
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(wrapped.files.create(file=("a.txt", b"a"), purpose="assistants"))
+    assert len(calls) == 1
+
+
+def test_async_streamed_run_is_settled(client, monkeypatch):
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(gateway.asyncio, "sleep", no_sleep)
+    calls = _fail_first(monkeypatch, client.beta.threads.runs, "stream", _rate_limit_error())
+    limiter = RateLimiter(tokens_per_minute=600_000)
+    wrapped = AsyncGateway(AsyncMockAzureOpenAI(backend=client), limiter)
+
+    async def review():
+        thread = await wrapped.beta.threads.create()
+        await wrapped.beta.threads.messages.create(thread_id=thread.id, role="user", content="Hallo")
+        async with wrapped.beta.threads.runs.stream(thread_id=thread.id, assistant_id="asst_1") as stream:
+            text = "".join([delta async for delta in stream.text_deltas])
+            return text, await stream.get_final_run()
+
+    text, run = asyncio.run(review())
+    assert text
+    assert len(calls) == 2  # Throttled once, sent again
+    expected = limiter.tokens.capacity - run.usage.total_tokens
+    assert limiter.tokens._level == pytest.approx(expected, abs=100)
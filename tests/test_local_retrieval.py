@@ -0,0 +1,37 @@
+from local_retrieval import BM25Index, build_messages, chunk_text, search_documents
+
+
+def test_chunks_overlap():
+    words = [str(number) for number in range(10)]
+    chunks = chunk_text(" ".join(words), chunk_words=4, overlap_words=2)
+    assert chunks == ["0 1 2 3", "2 3 4 5", "4 5 6 7", "6 7 8 9"]
+    assert chunk_text("   ") == []
+
+
+def test_best_matching_chunk_comes_first():
+    index = BM25Index([
+        "Die Geheimhaltungsstufe ist intern.",
+        "Die Änderungshistorie listet jede Version mit Datum.",
+        "Version 1.2 ist freigegeben, die Version 1.1 ist veraltet.",
+    ])
+    results = index.search("Welche Version ist freigegeben?")
+    assert results[0][1].startswith("Version 1.2")
+    assert results == sorted(results, key=lambda result: result[0], reverse=True)
+    assert index.search("Baseline") == []
+
+
+def test_search_over_several_documents():
+    first = BM25Index(["Freigeber ist die Projektleitung."], source="a.docx")
+    second = BM25Index(["Das Dokument hat keinen Freigeber.", "Status: freigegeben"], source="b.docx")
+    results = search_documents([first, None, second], "Freigeber", top_k=2)
+    assert {source for source, _ in results} == {"a.docx", "b.docx"}
+    assert search_documents([first, second], "Freigeber", top_k=1) == [results[0]]
+
+
+def test_messages_hold_the_passages_and_the_latest_history():
+    history = [{"role": "user", "content": f"Frage {number}"} for number in range(10)] + [{"role": "system", "content": "x"}]
+    messages = build_messages("Wer gibt frei?", [("a.docx", "Freigeber ist die Projektleitung.")], history)
+    assert "[a.docx]\nFreigeber ist die Projektleitung." in messages[0]["content"]
+    # The last CHAT_HISTORY_MESSAGES (6) entries without the system message
+    assert [message["content"] for message in messages[1:-1]] == [f"Frage {number}" for number in range(5, 10)]
+    assert messages[-1] == {"role": "user", "content": "Wer gibt frei?"}
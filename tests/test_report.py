@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+
+from criteria import Verdict
+from message_log import MessageLog
+from report import ReportBuilder, VERDICT_COLUMNS
+
+
+def test_message_log_finds_duplicates():
+    log = MessageLog()
+    assert log.add({"role": "user", "content": "Hallo"})
+    assert not log.add({"role": "user", "content": "Hallo"})
+    assert {"role": "assistant", "content": "Hallo"} not in log
+    log.append({"role": "user", "content": "Hallo"})  # append keeps duplicates, like a list
+    assert len(log) == 2
+    log.clear()
+    assert len(log) == 0 and {"role": "user", "content": "Hallo"} not in log
+
+
+def test_message_log_renders_each_message_once_per_script_run():
+    log = MessageLog()
+    log.append({"role": "user", "content": "a"})
+    log.append({"role": "user", "content": "a"})
+    assert log.take_unrendered(1) == [{"role": "user", "content": "a"}]
+    log.append({"role": "assistant", "content": "b"})
+    assert log.take_unrendered(1) == [{"role": "assistant", "content": "b"}]
+    log.mark_rendered(1)
+    assert log.take_unrendered(1) == []
+    assert len(log.take_unrendered(2)) == 2  # A new script run starts with an empty page
+
+
+def test_report_text_follows_the_chat():
+    report = ReportBuilder()
+    assert report.empty
+    messages = [{"role": "user", "content": "Frage"}, {"role": "assistant", "content": "Antwort"}]
+    report.sync_messages(messages)
+    report.sync_messages(messages)  # Nothing new
+    assert report.build("Text") == "Frage\n\nAntwort".encode()
+    report.sync_messages([{"role": "user", "content": "Neu"}])  # The chat was cleared
+    assert report.build("Text") == b"Neu"
+
+
+def test_report_keeps_the_latest_verdict_per_criterion():
+    report = ReportBuilder()
+    report.add_verdict(Verdict("Dateiformat", "n.i.O", "Falsch"), document="a.docx", km_id="SUP1_001")
+    report.add_verdict(Verdict("Dateiformat", "i.O", "Passt | gut", "Deckblatt"), document="a.docx", km_id="SUP1_001")
+    [row] = json.loads(report.build("JSON"))["verdicts"]
+    assert row["Status"] == "i.O"
+    assert "Passt \\| gut" in report.build("Markdown").decode()
+    rows = list(csv.DictReader(io.StringIO(report.build("CSV").decode("utf-8-sig"))))
+    assert [rows[0][column] for column in VERDICT_COLUMNS] == ["a.docx", "SUP1_001", "Dateiformat", "i.O", "Passt | gut", "Deckblatt"]
+
+
+def test_report_is_serialized_again_only_after_a_change():
+    report = ReportBuilder()
+    report.add_message({"role": "user", "content": "Frage"})
+    assert not report.is_built("JSON")
+    report.build("JSON")
+    assert report.is_built("JSON")
+    report.add_verdict(Verdict("Dateiformat", "i.O"))
+    assert not report.is_built("JSON")
@@ -0,0 +1,112 @@
+import pytest
+
+import criteria_scheduler
+from criteria import review_groups, criterion_prompt
+from document_metadata import extract_metadata
+from dm_plan import DMPlanTable
+from review import ReviewRunner, ReviewSession
+from review_jobs import ReviewJob, run_review_job
+
+# Index of the criterion "Dateiformat", decided from the file and the DM-Plan alone
+DATEIFORMAT = 2
+
+
+def _job(criteria_indices, fused):
+    group = review_groups[0]
+    return ReviewJob(
+        name=group["name"],
+        assistant_id=group["assistant_id"],
+        context_prompt="KM ID: SUP1_001",
+        criteria_indices=criteria_indices,
+        summary_prompt=group["summary_prompt"],
+        fused=fused,
+        document_metadata=extract_metadata("Notiz.txt", b"Inhalt"),
+        expected={"Dateiformat": "txt"},
+    )
+
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_summary_when_every_criterion_is_local(client, fused):
+    job = _job([DATEIFORMAT], fused)
+    run_review_job(client, job)
+    assert job.status == "done"
+    assert job.verdicts()[DATEIFORMAT].status == "i.O"
+    assert job.summary
+    assert "Dateiformat: i.O" in client.prompts[-1]
+
+
+def test_fused_summary_includes_local_verdicts(client):
+    job = _job([0, 1, DATEIFORMAT], fused=True)
+    run_review_job(client, job)
+    assert job.status == "done"
+    assert set(job.verdicts()) == {0, 1, DATEIFORMAT}
+    # One run for the assistant's criteria, it gets the local verdict for the summary table
+    assert len(client.prompts) == 1
+    assert "Dateiformat: i.O" in client.prompts[0]
+    assert "3. Dateiformat" not in client.prompts[0]
+
+
+def test_failed_criterion_does_not_stop_the_others(client, monkeypatch):
+    run_criteria_chain = criteria_scheduler.run_criteria_chain
+
+    def failing_run_criteria_chain(client, assistant_id, messages, steps, *args):
+        if steps[-1][0] == criterion_prompt(0):
+            raise RuntimeError("Verbindung abgebrochen")
+        return run_criteria_chain(client, assistant_id, messages, steps, *args)
+
+    monkeypatch.setattr(criteria_scheduler, "run_criteria_chain", failing_run_criteria_chain)
+    job = _job([0, 1, DATEIFORMAT], fused=False)
+    run_review_job(client, job)
+    assert job.status == "done"
+    verdicts = job.verdicts()
+    assert verdicts[0].status == "unklar"
+    assert "Verbindung abgebrochen" in verdicts[0].reasoning
+    assert verdicts[1].status == "i.O"
+    assert len(job.runs()) == 2  # Criterion 1 and the summary
+
+
+def _thread_prompts(client):
+    """The messages of every thread, as (role, text) lists."""
+    return [
+        [(message.role, message.content[0].text.value) for message in thread.messages]
+        for thread in client.objects["threads"].values()
+    ]
+
+
+def test_chained_criteria_run_in_order_on_one_thread(client, monkeypatch):
+    monkeypatch.setattr(client.beta.threads, "delete", lambda thread_id: None)  # Keep the threads to look at them
+    job = _job([5, 6, 7, 8, 9, 10, 11], fused=False)
+    job.summary_prompt = None
+    run_review_job(client, job)
+    assert job.status == "done"
+    assert set(job.verdicts()) == {5, 6, 7, 8, 9, 10, 11}
+    # One thread per chain and per independent criterion
+    threads = _thread_prompts(client)
+    assert len(threads) == 4
+    chain = next(messages for messages in threads if messages[1][1] == criterion_prompt(7))
+    assert [role for role, _ in chain] == ["user", "user", "assistant", "user", "assistant", "user", "assistant"]
+    assert [text for role, text in chain if role == "user"][1:] == [criterion_prompt(index) for index in (7, 8, 9)]
+
+
+def test_criteria_start_with_the_answer_to_the_first_step(client, monkeypatch):
+    monkeypatch.setattr(client.beta.threads, "delete", lambda thread_id: None)
+    job = _job([0, 1], fused=False)
+    job.context_step = True
+    run_review_job(client, job)
+    assert job.status == "done"
+    assert client.prompts[0] == job.context_prompt  # Run once before the criteria
+    assert len(job.runs()) == 4  # First step, two criteria and the summary
+    for messages in _thread_prompts(client)[1:]:
+        assert messages[:2] == [("user", job.context_prompt), ("assistant", job.context_answer)]
+
+
+def test_results_can_be_posted_to_the_chat_thread(client, tmp_path):
+    session = ReviewSession(client, client.beta.vector_stores.create(name="dokument review").id)
+    session.new_thread()
+    runner = ReviewRunner(client, dm_plan=DMPlanTable(str(tmp_path / "missing.xlsx"), str(tmp_path)))
+    job = runner.run(runner.create_job(session, review_groups[2], "SUP1_001", "Notiz.txt", summary=False))
+    assert job.thread_id == session.thread_id
+    results = "\n".join(verdict.to_text() for _, verdict in runner.collect(session, job))
+    session.post(results)
+    messages = client.objects["threads"][session.thread_id].messages
+    assert (messages[-1].role, messages[-1].content[0].text.value) == ("assistant", results)
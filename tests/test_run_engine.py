@@ -0,0 +1,48 @@
+import httpx
+import openai
+
+import mock_openai
+from run_engine import execute_run
+from telemetry import load_records
+
+
+def _thread(client):
+    thread = client.beta.threads.create()
+    client.beta.threads.messages.create(thread_id=thread.id, role="user", content="Hallo")
+    return thread
+
+
+def test_stream_read_timeout_polls_the_started_run(client, monkeypatch):
+    def text_deltas(stream):
+        yield "Die"
+        raise httpx.ReadTimeout("timed out")
+
+    monkeypatch.setattr(mock_openai._MockStream, "text_deltas", property(text_deltas))
+    texts = []
+    run = execute_run(client, _thread(client).id, "asst_1", on_text=texts.append)
+    assert run.status == "completed"
+    assert texts == ["Die"]
+    assert len(client.objects["runs"]) == 1  # Not created a second time
+
+
+def _fail_stream(monkeypatch, client, error):
+    def stream(**params):
+        raise error
+
+    monkeypatch.setattr(client.beta.threads.runs, "stream", stream)
+
+
+def test_run_is_polled_when_streaming_is_not_supported(client, monkeypatch):
+    response = httpx.Response(400, request=httpx.Request("POST", "https://example.openai.azure.com"))
+    _fail_stream(monkeypatch, client, openai.BadRequestError("Streaming not supported", response=response, body=None))
+    run = execute_run(client, _thread(client).id, "asst_1", metrics={"criterion": "Dateiformat"})
+    assert run.status == "completed"
+    [record] = load_records()
+    assert (record["criterion"], record["streamed"]) == ("Dateiformat", 0)
+
+
+def test_run_is_created_when_the_stream_connection_fails(client, monkeypatch):
+    _fail_stream(monkeypatch, client, openai.APIConnectionError(request=httpx.Request("POST", "https://example.openai.azure.com")))
+    run = execute_run(client, _thread(client).id, "asst_1")
+    assert run.status == "completed"
+    assert client.calls["beta.threads.runs.create"] == 1
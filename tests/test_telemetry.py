@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import pytest
+
+import telemetry
+from telemetry import load_records, record_run, to_csv
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch, tmp_path):
+    monkeypatch.setattr(telemetry, "METRICS_PATH", str(tmp_path / "metrics.sqlite3"))
+
+
+def _run(run_id="run_1"):
+    usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=300, total_tokens=1500)
+    return SimpleNamespace(id=run_id, status="completed", created_at=100, started_at=102, usage=usage)
+
+
+def test_recorded_run_is_loaded():
+    record_run(_run(), "asst_1", {"streamed": True, "run_seconds": 3.5, "poll_count": 2}, criterion="Dateiformat")
+    [record] = load_records()
+    assert record["criterion"] == "Dateiformat"
+    assert record["queue_seconds"] == 2
+    assert (record["streamed"], record["poll_count"], record["prompt_tokens"]) == (1, 2, 1200)
+    assert to_csv([record]).splitlines()[0] == ",".join(telemetry.METRIC_COLUMNS)
+
+
+def test_unwritable_database_does_not_fail_the_run(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(telemetry, "METRICS_PATH", str(tmp_path / "missing" / "metrics.sqlite3"))
+    record_run(_run(), "asst_1", {})
+    assert "run_1 was not recorded" in caplog.text
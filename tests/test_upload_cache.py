@@ -0,0 +1,120 @@
+import threading
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import upload_cache
+from upload_cache import (
+    claim_file, hold_vector_store_file, is_in_vector_store, lookup_file, release_file, release_vector_store_file,
+    remember_file, remember_vector_store, upload_file
+)
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_cache, "UPLOAD_CACHE_PATH", str(tmp_path / "upload_cache.sqlite3"))
+    monkeypatch.setattr(upload_cache, "CLAIM_POLL_SECONDS", 0.01)
+
+
+class _Files:
+    def __init__(self):
+        self.files = self  # Stands in for the client as well
+        self.created = 0
+        self.deleted = []
+
+    def create(self):
+        self.created += 1
+        return SimpleNamespace(id=f"file_{self.created}")
+
+    def delete(self, file_id):
+        self.deleted.append(file_id)
+
+
+class _EvictionClient:
+    """Client whose vector store entries were already deleted outside the app."""
+
+    def __init__(self):
+        self.files = _Files()
+        self.beta = SimpleNamespace(vector_stores=SimpleNamespace(files=SimpleNamespace(delete=self._delete_entry)))
+
+    def _delete_entry(self, vector_store_id, file_id):
+        response = httpx.Response(404, request=httpx.Request("DELETE", "https://example.openai.azure.com"))
+        raise openai.NotFoundError("No such vector store", response=response, body=None)
+
+
+def test_claim_is_given_once():
+    assert claim_file("hash") is None
+    assert lookup_file("hash") is None  # Claimed, not uploaded yet
+    release_file("hash")
+    assert claim_file("hash") is None
+
+
+def test_waiting_claim_gets_the_file_id():
+    assert claim_file("hash") is None
+    result = []
+    waiting = threading.Thread(target=lambda: result.append(claim_file("hash")))
+    waiting.start()
+    remember_file("hash", "file_1", "a.txt", 1)
+    waiting.join(timeout=5)
+    assert result == ["file_1"]
+
+
+def test_concurrent_uploads_upload_once():
+    files = _Files()
+    barrier = threading.Barrier(4)
+    results = []
+
+    def upload():
+        barrier.wait()
+        results.append(upload_file(files, "hash", "a.txt", 1, files.create))
+
+    threads = [threading.Thread(target=upload) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert results == ["file_1"] * 4
+    assert files.created == 1
+
+
+def test_upload_after_timed_out_claim_is_deleted():
+    files = _Files()
+
+    def slow_upload():
+        # The claim timed out meanwhile and another process stored its upload first
+        remember_file("hash", "file_other", "a.txt", 1)
+        return files.create()
+
+    assert upload_file(files, "hash", "a.txt", 1, slow_upload) == "file_other"
+    assert files.deleted == ["file_1"]
+
+
+def test_failed_upload_releases_the_claim():
+    def fail():
+        raise RuntimeError("Upload abgebrochen")
+
+    with pytest.raises(RuntimeError):
+        upload_file(_Files(), "hash", "a.txt", 1, fail)
+    assert claim_file("hash") is None
+
+
+def test_shared_file_is_removed_by_the_last_holder():
+    remember_file("hash", "file_1", "a.txt", 1)
+    remember_vector_store("hash", "vs_1")
+    hold_vector_store_file("file_1", "vs_1", "session_a")
+    hold_vector_store_file("file_1", "vs_1", "session_b")
+    assert not release_vector_store_file("file_1", "vs_1", "session_a")
+    assert is_in_vector_store("hash", "vs_1")
+    assert release_vector_store_file("file_1", "vs_1", "session_b")
+    assert not is_in_vector_store("hash", "vs_1")
+
+
+def test_eviction_deletes_the_file_when_the_store_is_gone():
+    remember_file("hash", "file_1", "a.txt", 1)
+    remember_vector_store("hash", "vs_1")
+    client = _EvictionClient()
+    assert upload_cache._evict(client, max_unused=-1) == 1
+    assert client.files.deleted == ["file_1"]
+    assert lookup_file("hash") is None
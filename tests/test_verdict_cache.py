@@ -0,0 +1,43 @@
+import pytest
+
+import verdict_cache
+from verdict_cache import cache_key, combined_hash, get_cached, put_cached
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch, tmp_path):
+    monkeypatch.setattr(verdict_cache, "VERDICT_CACHE_PATH", str(tmp_path / "verdict_cache.sqlite3"))
+
+
+def test_cached_answer_is_returned():
+    key = cache_key("hash", "asst_1", "Jetzt nur Dateiformat prüfen.", "gpt-4o")
+    assert get_cached(key) is None
+    put_cached(key, '{"status": "i.O"}')
+    assert get_cached(key) == '{"status": "i.O"}'
+
+
+def test_key_depends_on_every_part():
+    key = cache_key("hash", "asst_1", "prompt", "gpt-4o")
+    assert key != cache_key("other", "asst_1", "prompt", "gpt-4o")
+    assert key != cache_key("hash", "asst_2", "prompt", "gpt-4o")
+    assert key != cache_key("hash", "asst_1", "prompt", "gpt-4o-mini")
+
+
+def test_combined_hash_ignores_the_order():
+    assert combined_hash(["a", "b"]) == combined_hash(["b", "a"])
+    assert combined_hash(["a", "b"]) != combined_hash(["a"])
+
+
+def test_expired_answer_is_not_used():
+    put_cached("key", "answer")
+    assert get_cached("key", ttl=-1) is None
+
+
+def test_least_recently_used_answer_is_evicted():
+    put_cached("first", "1")
+    put_cached("second", "2")
+    get_cached("first")
+    put_cached("third", "3", max_entries=2)
+    assert get_cached("first") == "1"
+    assert get_cached("second") is None
+    assert get_cached("third") == "3"
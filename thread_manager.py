@@ -0,0 +1,49 @@
+# Thread lifecycle: short-lived threads with files attached per thread instead of per assistant
+import openai
+
+# Chat runs only see the latest messages, so the input tokens don't grow with the session
+CHAT_TRUNCATION_STRATEGY = {"type": "last_messages", "last_messages": 10}
+
+
+# Tools of a run that gets the DM-Plan row in the prompt: without code_interpreter, no sandbox session is started
+FILE_SEARCH_TOOLS = [{"type": "file_search"}]
+
+
+def file_search_resources(vector_store_ids):
+    """Build the tool_resources that give the file_search tool access to the vector stores."""
+    return {"file_search": {"vector_store_ids": list(vector_store_ids)}}
+
+
+def attach_vector_stores(client, thread_id, vector_store_ids, attached):
+    """Attach the vector stores to the thread, unless exactly these are attached already.
+
+    attached maps thread IDs to the tuple of attached vector store IDs and is updated
+    in place. Returns True if an update was sent.
+    """
+    wanted = tuple(sorted(vector_store_ids))
+    if attached.get(thread_id) == wanted:
+        return False
+
+    client.beta.threads.update(
+        thread_id=thread_id,
+        tool_resources=file_search_resources(wanted)
+    )
+    attached[thread_id] = wanted
+    return True
+
+
+def create_thread(client, vector_store_ids, attached):
+    """Create a new thread with the vector stores attached and return its ID."""
+    thread = client.beta.threads.create(tool_resources=file_search_resources(vector_store_ids))
+    attached[thread.id] = tuple(sorted(vector_store_ids))
+    return thread.id
+
+
+def retire_thread(client, thread_id, *thread_maps):
+    """Delete a thread that is not used anymore and drop it from the per-thread dicts (attachments, cursors)."""
+    try:
+        client.beta.threads.delete(thread_id=thread_id)
+    except openai.NotFoundError:
+        pass  # Already deleted
+    for thread_map in thread_maps:
+        thread_map.pop(thread_id, None)
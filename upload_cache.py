@@ -0,0 +1,258 @@
+# Persistent index from file content to the uploaded OpenAI file, shared by all sessions
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import openai
+
+# SQLite database with the upload index
+UPLOAD_CACHE_PATH = os.getenv("UPLOAD_CACHE_PATH", "upload_cache.sqlite3")
+
+# Remote files nobody used for this long are deleted by evict_unused_files
+MAX_UNUSED_SECONDS = 7 * 24 * 60 * 60
+
+# Minimum time between two eviction passes in one process
+EVICTION_INTERVAL_SECONDS = 60 * 60
+
+# An upload claimed longer ago than this is considered abandoned, the next caller takes it over
+CLAIM_TIMEOUT_SECONDS = 10 * 60
+CLAIM_POLL_SECONDS = 0.5
+
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+@contextmanager
+def _database():
+    """Open the index database, create the tables if needed and commit on success."""
+    conn = sqlite3.connect(UPLOAD_CACHE_PATH, timeout=30)
+    try:
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                content_hash TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                file_name TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_used_at REAL
+            )""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS vector_store_files (
+                content_hash TEXT,
+                vector_store_id TEXT,
+                PRIMARY KEY (content_hash, vector_store_id)
+            )""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS vector_store_holders (
+                file_id TEXT,
+                vector_store_id TEXT,
+                holder TEXT,
+                PRIMARY KEY (file_id, vector_store_id, holder)
+            )""")
+            yield conn
+    finally:
+        conn.close()
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of the file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def lookup_file(file_hash):
+    """Return the OpenAI file ID for the content hash, or None if it was never uploaded."""
+    with _database() as conn:
+        row = conn.execute("SELECT file_id FROM files WHERE content_hash = ? AND file_id != ''", (file_hash,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE files SET last_used_at = ? WHERE content_hash = ?", (time.time(), file_hash))
+        return row[0]
+
+
+def claim_file(file_hash):
+    """Return the file ID for the content hash, or None if the caller has to upload it.
+
+    A None answer claims the upload (a row with an empty file ID), until remember_file or
+    release_file the other sessions and processes wait for its file ID instead of
+    uploading the same content again.
+    """
+    while True:
+        file_id = lookup_file(file_hash)
+        if file_id is not None:
+            return file_id
+        now = time.time()
+        with _database() as conn:
+            # Single statements, so two processes never both get the claim
+            cursor = conn.execute("INSERT OR IGNORE INTO files VALUES (?, '', NULL, NULL, ?, ?)", (file_hash, now, now))
+            if not cursor.rowcount:
+                # Take over a claim whose upload was abandoned
+                cursor = conn.execute(
+                    "UPDATE files SET created_at = ?, last_used_at = ? WHERE content_hash = ? AND file_id = '' AND created_at < ?",
+                    (now, now, file_hash, now - CLAIM_TIMEOUT_SECONDS)
+                )
+        if cursor.rowcount:
+            return None
+        time.sleep(CLAIM_POLL_SECONDS)  # Uploaded by someone else right now
+
+
+def remember_file(file_hash, file_id, file_name, size):
+    """Store the OpenAI file ID of a freshly uploaded file and return the file ID to use.
+
+    That is a different file ID if the claim timed out and another upload was stored
+    first, the caller deletes its own file then.
+    """
+    now = time.time()
+    with _database() as conn:
+        conn.execute("INSERT OR IGNORE INTO files VALUES (?, '', NULL, NULL, ?, ?)", (file_hash, now, now))
+        conn.execute(
+            """UPDATE files SET file_id = ?, file_name = ?, size = ?, created_at = ?, last_used_at = ?
+            WHERE content_hash = ? AND file_id = ''""",
+            (file_id, file_name, size, now, now, file_hash)
+        )
+        return conn.execute("SELECT file_id FROM files WHERE content_hash = ?", (file_hash,)).fetchone()[0]
+
+
+def release_file(file_hash):
+    """Give up the claim of a failed upload, the next caller uploads the content."""
+    with _database() as conn:
+        conn.execute("DELETE FROM files WHERE content_hash = ? AND file_id = ''", (file_hash,))
+
+
+def upload_file(client, file_hash, file_name, size, upload):
+    """Return the file ID of the content, calling upload() (which returns the new file) only if nobody uploaded it yet."""
+    file_id = claim_file(file_hash)
+    if file_id is not None:
+        return file_id
+    try:
+        uploaded_id = upload().id
+    except BaseException:
+        release_file(file_hash)
+        raise
+    file_id = remember_file(file_hash, uploaded_id, file_name, size)
+    if file_id != uploaded_id:
+        client.files.delete(uploaded_id)  # Uploaded twice after a timed out claim
+    return file_id
+
+
+def is_in_vector_store(file_hash, vector_store_id):
+    """Check if the content is already indexed in the vector store."""
+    with _database() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM vector_store_files WHERE content_hash = ? AND vector_store_id = ?",
+            (file_hash, vector_store_id)
+        ).fetchone()
+    return row is not None
+
+
+def remember_vector_store(file_hash, vector_store_id):
+    """Mark the content as indexed in the vector store."""
+    with _database() as conn:
+        conn.execute("INSERT OR IGNORE INTO vector_store_files VALUES (?, ?)", (file_hash, vector_store_id))
+
+
+def forget_vector_store(file_id, vector_store_id):
+    """Mark the file as removed from the vector store."""
+    with _database() as conn:
+        conn.execute(
+            """DELETE FROM vector_store_files WHERE vector_store_id = ?
+            AND content_hash IN (SELECT content_hash FROM files WHERE file_id = ?)""",
+            (vector_store_id, file_id)
+        )
+
+
+def hold_vector_store_file(file_id, vector_store_id, holder):
+    """Record that the holder (a review session ID) reviews the file in the shared vector store."""
+    with _database() as conn:
+        conn.execute("INSERT OR IGNORE INTO vector_store_holders VALUES (?, ?, ?)", (file_id, vector_store_id, holder))
+
+
+def release_vector_store_file(file_id, vector_store_id, holder):
+    """Drop the holder's hold on the file and return True if nobody else holds it.
+
+    The file is forgotten in the vector store then, in the same transaction, so a
+    session that comes later indexes it again instead of relying on the removed entry.
+    """
+    with _database() as conn:
+        conn.execute(
+            "DELETE FROM vector_store_holders WHERE file_id = ? AND vector_store_id = ? AND holder = ?",
+            (file_id, vector_store_id, holder)
+        )
+        held = conn.execute(
+            "SELECT 1 FROM vector_store_holders WHERE file_id = ? AND vector_store_id = ?", (file_id, vector_store_id)
+        ).fetchone()
+        if held is not None:
+            return False
+        conn.execute(
+            """DELETE FROM vector_store_files WHERE vector_store_id = ?
+            AND content_hash IN (SELECT content_hash FROM files WHERE file_id = ?)""",
+            (vector_store_id, file_id)
+        )
+        return True
+
+
+def evict_unused_files(client, max_unused=MAX_UNUSED_SECONDS):
+    """Delete remote files (and their vector store entries) nobody used for max_unused seconds.
+
+    Runs at most once per EVICTION_INTERVAL_SECONDS in a process, returns the number of evicted files.
+    """
+    if not _eviction_due():
+        return 0
+    return _evict(client, max_unused)
+
+
+def schedule_eviction(client, max_unused=MAX_UNUSED_SECONDS):
+    """Run evict_unused_files on a background thread when a pass is due, without waiting for it.
+
+    For the click path of the apps, which would otherwise wait for the delete requests.
+    """
+    if _eviction_due():
+        threading.Thread(target=_evict_quietly, args=(client, max_unused), name="upload-eviction", daemon=True).start()
+
+
+def _eviction_due():
+    global _last_eviction
+    with _eviction_lock:
+        now = time.time()
+        if now - _last_eviction < EVICTION_INTERVAL_SECONDS:
+            return False
+        _last_eviction = now
+        return True
+
+
+def _evict_quietly(client, max_unused):
+    try:
+        _evict(client, max_unused)
+    except (openai.OpenAIError, sqlite3.Error):
+        pass  # Tried again in the next interval
+
+
+def _evict(client, max_unused):
+    with _database() as conn:
+        stale_files = conn.execute(
+            "SELECT content_hash, file_id FROM files WHERE last_used_at < ? AND file_id != ''",
+            (time.time() - max_unused,)
+        ).fetchall()
+
+    for file_hash, file_id in stale_files:
+        with _database() as conn:
+            vector_store_ids = [
+                row[0] for row in conn.execute(
+                    "SELECT vector_store_id FROM vector_store_files WHERE content_hash = ?", (file_hash,)
+                )
+            ]
+        for vector_store_id in vector_store_ids:
+            try:
+                client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+            except openai.NotFoundError:
+                pass  # Store or entry already deleted outside the app
+        try:
+            client.files.delete(file_id)
+        except openai.NotFoundError:
+            pass  # Already deleted outside the app
+        with _database() as conn:
+            conn.execute("DELETE FROM vector_store_files WHERE content_hash = ?", (file_hash,))
+            conn.execute("DELETE FROM vector_store_holders WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM files WHERE content_hash = ?", (file_hash,))
+
+    return len(stale_files)
@@ -0,0 +1,71 @@
+# Local cache for answers to deterministic criterion checks, keyed by document, assistant, prompt and model
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# SQLite database with the cached answers
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "verdict_cache.sqlite3")
+
+# Cached answers older than this are not used anymore
+VERDICT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Maximum number of cached answers, the least recently used ones are evicted first
+VERDICT_CACHE_MAX_ENTRIES = 5000
+
+
+@contextmanager
+def _database():
+    """Open the cache database, create the table if needed and commit on success."""
+    conn = sqlite3.connect(VERDICT_CACHE_PATH, timeout=30)
+    try:
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS verdicts (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL,
+                last_used_at REAL
+            )""")
+            yield conn
+    finally:
+        conn.close()
+
+
+def combined_hash(content_hashes):
+    """Combine the content hashes of several documents into one, independent of their order."""
+    return hashlib.sha256("\n".join(sorted(content_hashes)).encode()).hexdigest()
+
+
+def cache_key(document_hash, assistant_id, prompt, model):
+    """Build the cache key for a prompt on a document."""
+    key_data = json.dumps([document_hash, assistant_id, prompt, model], ensure_ascii=False)
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+
+def get_cached(key, ttl=VERDICT_CACHE_TTL_SECONDS):
+    """Return the cached answer for the key, or None if there is none or it expired."""
+    now = time.time()
+    with _database() as conn:
+        row = conn.execute(
+            "SELECT response FROM verdicts WHERE cache_key = ? AND created_at >= ?", (key, now - ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE verdicts SET last_used_at = ? WHERE cache_key = ?", (now, key))
+        return row[0]
+
+
+def put_cached(key, response, ttl=VERDICT_CACHE_TTL_SECONDS, max_entries=VERDICT_CACHE_MAX_ENTRIES):
+    """Store an answer and evict expired and least recently used entries."""
+    now = time.time()
+    with _database() as conn:
+        conn.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)", (key, response, now, now))
+        conn.execute("DELETE FROM verdicts WHERE created_at < ?", (now - ttl,))
+        conn.execute(
+            """DELETE FROM verdicts WHERE cache_key NOT IN (
+                SELECT cache_key FROM verdicts ORDER BY last_used_at DESC LIMIT ?
+            )""",
+            (max_entries,)
+        )